@@ -0,0 +1,239 @@
+"""
+Acquisition bridge - receives framed three-channel DAQ blocks over a local socket
+
+Usage:
+    python acquisition_bridge.py serve --store recordings/live.exgbin --shm exg_signals
+    python acquisition_bridge.py send --from Trible_EXG_Signal1.json       # Python test sender
+    exg_stream_sender("127.0.0.1", 5555, 20)                                # MATLAB sender
+
+Frame (little-endian): b"EXGB", uint16 version (1), uint16 n_channels, uint32 n_samples,
+then n_samples rows of float64 [time, ch1, ..., chN]. Each block is appended to an
+EXG store (see exg_store.py) and, with --shm, published to the shared-memory ring that
+Signal Insights reads (EXG_SHM_NAME), so the page shows samples as they arrive.
+
+With --pipeline the socket reader only enqueues blocks into a stream_pipeline:
+publish -> filter -> features -> snapshot, each stage on its own thread behind a bounded
+queue. The recording and the ring must not lose samples, so the publish queue always uses
+the "block" policy: when it is full the reader stops reading and the sender is pushed back
+through TCP. The monitoring stages after it use --ui-policy (drop_oldest or decimate), so a
+slow feature stage never stalls storage. Stage stats and the newest features are written to
+--status every --stats-s seconds; the Signal Insights debug panel (?debug=1) shows them.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+
+from exg_store import ExgStoreWriter
+from stream_pipeline import STATUS_PATH
+
+MAGIC = b"EXGB"
+VERSION = 1
+FRAME_HEADER = struct.Struct("<4sHHI")
+MAX_SAMPLES_PER_FRAME = 1 << 20
+COLUMNS = ["time", "Signal1", "Signal2", "Signal3"]
+
+
+def encode_frame(rows):
+    """Frame a [n, 1 + n_channels] float64 block (time first)"""
+    rows = np.ascontiguousarray(rows, dtype="<f8")
+    return FRAME_HEADER.pack(MAGIC, VERSION, rows.shape[1] - 1, rows.shape[0]) + rows.tobytes()
+
+
+class BridgeServer:
+    """Appends every received block to the store and the optional shared ring"""
+
+    def __init__(self, store, ring=None, flush_interval_s=0.2):
+        self.store = store
+        self.ring = ring
+        self.flush_interval_s = flush_interval_s
+        self._last_flush = time.monotonic()
+        self.blocks = 0
+        self.pipeline = None
+
+    def start_pipeline(self, capacity, ui_policy="drop_oldest"):
+        """Persist on a pipeline thread (the store is then only touched from that thread), then
+        baseline-filter and summarise the blocks for monitoring under ui_policy"""
+        from stream_pipeline import BaselineFilter, Pipeline, Stage, block_features
+
+        self.pipeline = Pipeline([Stage("publish", self.publish_stage, policy="block"),
+                                  Stage("filter", BaselineFilter()),
+                                  Stage("features", block_features)], capacity, ui_policy).start()
+        return self.pipeline
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername") or "local"
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                magic, version, n_channels, n_samples = FRAME_HEADER.unpack(header)
+                if magic != MAGIC or version != VERSION:
+                    print(f"{peer}: bad frame header, closing", file=sys.stderr)
+                    break
+                if n_channels + 1 != len(self.store.columns) or n_samples > MAX_SAMPLES_PER_FRAME:
+                    print(f"{peer}: unexpected frame shape ({n_samples} x {n_channels}), closing", file=sys.stderr)
+                    break
+                payload = await reader.readexactly(n_samples * (n_channels + 1) * 8)
+                rows = np.frombuffer(payload, dtype="<f8").reshape(n_samples, n_channels + 1)
+                if self.pipeline is None:
+                    self.publish(rows)
+                else:
+                    # Wait off the event loop; meanwhile the socket is not read, so the sender blocks
+                    await asyncio.get_running_loop().run_in_executor(None, self.pipeline.ingest, rows)
+        finally:
+            if self.pipeline is None:
+                self.store.flush()
+            writer.close()
+
+    def publish(self, rows, caught_up=False):
+        self.store.append(rows)
+        if self.ring is not None:
+            self.ring.append(rows)
+        self.blocks += 1
+        now = time.monotonic()
+        if caught_up or now - self._last_flush >= self.flush_interval_s:
+            self.store.flush()
+            self._last_flush = now
+
+    def publish_stage(self, block):
+        """stream_pipeline stage wrapping publish(); flushes whenever its queue runs empty,
+        so the last blocks of a connection become visible without a flush from another thread"""
+        self.publish(block.rows, caught_up=len(self.pipeline.stages[0].queue) == 0)
+        return block
+
+
+async def report_stats(pipeline, interval_s, status_path=None):
+    from stream_pipeline import format_stats, write_status
+
+    seen = None
+    while True:
+        await asyncio.sleep(interval_s)
+        stats = pipeline.stats()
+        if [s["processed"] for s in stats] != seen:  # quiet while idle
+            seen = [s["processed"] for s in stats]
+            print(format_stats(stats), file=sys.stderr)
+            if status_path:
+                write_status(status_path, pipeline)
+
+
+async def serve(args):
+    store = ExgStoreWriter(args.store, COLUMNS)
+    ring = None
+    if args.shm:
+        from shared_ring import ExgRing
+
+        ring = ExgRing.create(args.shm, COLUMNS, args.shm_capacity)
+    bridge = BridgeServer(store, ring)
+    # SIGTERM cancels this task, so shutdown runs the finally block below on the loop thread
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    reporter = None
+    if args.pipeline:
+        bridge.start_pipeline(args.queue_blocks, args.ui_policy)
+        if args.stats_s > 0:
+            reporter = asyncio.create_task(report_stats(bridge.pipeline, args.stats_s, args.status))
+    if args.unix:
+        server = await asyncio.start_unix_server(bridge.handle, path=args.unix)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(bridge.handle, host=args.host, port=args.port)
+        where = f"{args.host}:{args.port}"
+    print(f"listening on {where}, writing {args.store}" + (f", publishing to '{args.shm}'" if ring else ""))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        if bridge.pipeline is not None:
+            from stream_pipeline import format_stats, write_status
+
+            bridge.pipeline.close()
+            print(format_stats(bridge.pipeline.stats()), file=sys.stderr)
+            if args.status:
+                write_status(args.status, bridge.pipeline)
+        store.close()
+        if ring is not None:
+            ring.close()
+            ring.unlink()
+
+
+def send(args):
+    """Test sender: replay a Trible_EXG JSON file (or a synthetic signal) in real-time blocks"""
+    if args.source:
+        with open(args.source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rows = np.column_stack([np.asarray(data[c], dtype=float) for c in ["Time"] + COLUMNS[1:]])
+    else:
+        from signal_data import generate_signal
+
+        t, ecg = generate_signal(args.rate, args.duration, 1.2, 0.01)
+        _, eog = generate_signal(args.rate, args.duration, 0.5, 0.3)
+        _, emg = generate_signal(args.rate, args.duration, 60.0, 0.5)
+        rows = np.column_stack([t, ecg, eog, emg])
+    if args.unix:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(args.unix)
+    else:
+        sock = socket.create_connection((args.host, args.port))
+    block_s = args.block / args.rate
+    start = time.monotonic()
+    with sock:
+        for i, offset in enumerate(range(0, rows.shape[0], args.block)):
+            if not args.no_pace:
+                # Absolute schedule, so pacing error does not accumulate across blocks
+                delay = start + i * block_s - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            sock.sendall(encode_frame(rows[offset:offset + args.block]))
+    print(f"sent {rows.shape[0]} samples in {time.monotonic() - start:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream DAQ blocks into a binary store and the live page")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for p in (sub.add_parser("serve", help="Receive blocks"), sub.add_parser("send", help="Send test blocks")):
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=5555)
+        p.add_argument("--unix", default=None, help="Use a Unix socket path instead of TCP")
+    serve_p, send_p = sub.choices["serve"], sub.choices["send"]
+    serve_p.add_argument("--store", default=os.path.join("recordings", "live.exgbin"), help="EXG store path")
+    serve_p.add_argument("--shm", default=None, help="Also publish to this shared ring (EXG_SHM_NAME)")
+    serve_p.add_argument("--shm-capacity", type=int, default=1_000_000)
+    serve_p.add_argument("--pipeline", action="store_true",
+                         help="Store, filter and summarise blocks on pipeline threads behind bounded queues")
+    serve_p.add_argument("--queue-blocks", type=int, default=64, help="Pipeline queue capacity in blocks")
+    serve_p.add_argument("--ui-policy", choices=("drop_oldest", "decimate"), default="drop_oldest",
+                         help="Overflow policy of the monitoring stages after publish")
+    serve_p.add_argument("--stats-s", type=float, default=5.0, help="Print pipeline stats every N seconds (0: off)")
+    serve_p.add_argument("--status", default=STATUS_PATH,
+                         help="Pipeline stats/features JSON for the page's debug panel ('' to disable)")
+    send_p.add_argument("--from", dest="source", default=None, help="Trible_EXG JSON file to send")
+    send_p.add_argument("--rate", type=int, default=1000, help="Sample rate in Hz (pacing and synthetic data)")
+    send_p.add_argument("--duration", type=float, default=20.0, help="Synthetic signal length in seconds")
+    send_p.add_argument("--block", type=int, default=100, help="Samples per frame (MATLAB uses d.Rate/10)")
+    send_p.add_argument("--no-pace", action="store_true", help="Send as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == "send":
+        send(args)
+        return
+    os.makedirs(os.path.dirname(args.store) or ".", exist_ok=True)
+    try:
+        asyncio.run(serve(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
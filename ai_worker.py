@@ -0,0 +1,112 @@
+"""
+AI worker module - runs AIHandler requests on a shared background pool so pages never block on the LLM
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on LLM calls in flight across all sessions of this server process
+MAX_INFLIGHT = int(os.getenv('AI_MAX_INFLIGHT', '4'))
+# Upper bound on requests waiting for a worker; submissions past it are rejected, not queued
+MAX_PENDING = int(os.getenv('AI_MAX_PENDING', '16'))
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()   # jobs submitted but not started or cancelled yet
+_pending_lock = threading.Lock()
+
+
+def _get_executor():
+    """Create the process-wide executor lazily (shared by every Streamlit session)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_INFLIGHT, thread_name_prefix='ai-worker')
+        return _executor
+
+
+class AIJob:
+    """Handle for one background AI request; text chunks accumulate as they stream in"""
+
+    def __init__(self):
+        self._chunks = []
+        self._lock = threading.Lock()
+        self._started = threading.Event()
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self._future = None
+        self.error = None
+
+    def _run(self, handler, messages):
+        _release(self)
+        if self._cancelled.is_set():
+            self._done.set()
+            return
+        self._started.set()
+        try:
+            for chunk in handler.iter_response(messages):
+                if self._cancelled.is_set():
+                    break
+                if chunk:
+                    with self._lock:
+                        self._chunks.append(chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def status(self):
+        """One of 'queued', 'running', 'cancelled', 'error' or 'done'"""
+        if self._cancelled.is_set():
+            return 'cancelled'
+        if not self._started.is_set():
+            return 'queued'
+        if not self._done.is_set():
+            return 'running'
+        return 'error' if self.error is not None else 'done'
+
+    def done(self):
+        return self._done.is_set() or self._cancelled.is_set()
+
+    def text(self):
+        """Text received so far"""
+        with self._lock:
+            return "".join(self._chunks)
+
+    def cancel(self):
+        """Stop consuming the response; a queued job is dropped from the executor queue"""
+        self._cancelled.set()
+        if self._future is not None and self._future.cancel():
+            _release(self)
+
+    def _reject(self, error):
+        self.error = error
+        self._started.set()
+        self._done.set()
+
+
+def _release(job):
+    with _pending_lock:
+        _pending.discard(job)
+
+
+def submit_ai_request(handler, messages):
+    """Queue an AI request and return its AIJob handle immediately.
+
+    The handler's iter_response() runs on a worker thread, so it must not call Streamlit;
+    the page polls job.text() on each rerun and renders it into a placeholder. Callers
+    cancel the job they replace, so each session holds at most one pending request; past
+    MAX_PENDING across all sessions the returned job has already failed (status 'error').
+    """
+    job = AIJob()
+    with _pending_lock:
+        if len(_pending) >= MAX_PENDING:
+            job._reject(RuntimeError(f"{len(_pending)} AI requests are already waiting; please try again shortly"))
+            return job
+        _pending.add(job)
+    # Carry the caller's context (e.g. per-session profiling) onto the worker thread
+    job._future = _get_executor().submit(contextvars.copy_context().run, job._run, handler, messages)
+    return job
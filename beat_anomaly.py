@@ -0,0 +1,394 @@
+"""
+Beat anomaly module - flags abnormal ECG beats by template matching and RR-interval deviation
+
+Usage:
+    python beat_anomaly.py scan Trible_EXG_Signal1.json
+    python beat_anomaly.py scan recordings/day.exga --channel Signal1
+    python beat_anomaly.py query Trible_EXG_Signal1.json --kind morphology
+
+R peaks are detected per WINDOW_S window on the baseline-free signal (threshold mean +
+PEAK_STD std; signal_summary's mean + 0.5 std is too loose once wander is removed).
+Every beat (BEAT_BEFORE_S before to BEAT_AFTER_S after its R peak) is cut out of the same
+baseline-free signal with one fancy-indexing gather. Beats are then scored against a median
+template in blocks of TEMPLATE_BEATS: block k is compared with the median of the newest
+TEMPLATE_HISTORY normal beats of the blocks before it, and its own normal beats join them. All beats in a block are scored with a
+single matrix-vector product of normalised rows (normalised cross-correlation at zero lag).
+Each RR interval is compared with the median of the RR_CONTEXT intervals before it.
+
+Consecutive flagged beats become intervals in an SQLite table (ANOMALY_DB_PATH), keyed by
+recording and file version. The Signal Insights page and the AI context read that table
+instead of rescanning.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+
+from signal_summary import WINDOW_S, estimate_sample_rate, find_peaks
+
+BEAT_BEFORE_S = 0.2
+BEAT_AFTER_S = 0.4
+TEMPLATE_BEATS = 32
+# Normal beats the running median template is taken over (the newest ones)
+TEMPLATE_HISTORY = 4 * TEMPLATE_BEATS
+RR_CONTEXT = 8
+# Moving-average length removed before peak detection (longer than a QRS complex)
+BASELINE_S = 0.25
+# Peak threshold: window mean + PEAK_STD std of the baseline-free signal
+PEAK_STD = 2.0
+# A beat is abnormal below this correlation with the template ...
+NCC_THRESHOLD = 0.85
+# ... or when its RR interval differs from the local median by more than this fraction
+RR_DEVIATION = 0.2
+# No beat for this long inside a recording is flagged as a pause / signal dropout
+PAUSE_S = 2.0
+DB_PATH = os.getenv("ANOMALY_DB_PATH", os.path.join(".cache", "anomalies.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS anomalies (
+    recording TEXT NOT NULL,
+    version TEXT NOT NULL,
+    t_start REAL NOT NULL,
+    t_end REAL NOT NULL,
+    kind TEXT NOT NULL,
+    beats INTEGER NOT NULL,
+    ncc_min REAL,
+    rr_dev_max REAL
+);
+CREATE INDEX IF NOT EXISTS anomalies_by_time ON anomalies (recording, t_start);
+CREATE TABLE IF NOT EXISTS scans (
+    recording TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    summary TEXT NOT NULL
+);
+"""
+
+
+def _remove_baseline(x: np.ndarray, win: int) -> np.ndarray:
+    """x minus its centred moving average (cumulative sums), removing wander but not QRS"""
+    win = max(1, min(win, x.size))
+    c = np.concatenate(([0.0], np.cumsum(x)))
+    mean = (c[win:] - c[:-win]) / win
+    pad = win - 1
+    mean = np.concatenate((np.full(pad // 2, mean[0]), mean, np.full(pad - pad // 2, mean[-1])))
+    return x - mean
+
+
+def remove_wander(ecg, sample_rate_hz: float) -> np.ndarray:
+    """The ECG with its baseline (BASELINE_S moving average) removed, as used for peaks and beats"""
+    return _remove_baseline(np.asarray(ecg, dtype=np.float64), int(BASELINE_S * sample_rate_hz))
+
+
+def detect_r_peaks(ecg, sample_rate_hz: float, window_s: float = WINDOW_S) -> np.ndarray:
+    """R-peak sample indices over a recording of any length, thresholded per window"""
+    return _find_r_peaks(remove_wander(ecg, sample_rate_hz), sample_rate_hz, window_s)
+
+
+def _find_r_peaks(x: np.ndarray, sample_rate_hz: float, window_s: float) -> np.ndarray:
+    window = max(int(round(window_s * sample_rate_hz)), 8)
+    min_distance = int(0.33 * sample_rate_hz)
+    peaks = []
+    for start in range(0, x.size, window):
+        seg = x[start:start + window]
+        if seg.size < 3:
+            break
+        peaks.append(find_peaks(seg, float(np.mean(seg) + PEAK_STD * np.std(seg)), min_distance) + start)
+    peaks = np.concatenate(peaks) if peaks else np.empty(0, dtype=np.int64)
+    if peaks.size < 2:
+        return peaks
+    # Peaks found on both sides of a window boundary: keep the taller one
+    close = np.flatnonzero(np.diff(peaks) < min_distance)
+    if close.size:
+        drop = np.where(x[peaks[close]] >= x[peaks[close + 1]], close + 1, close)
+        peaks = np.delete(peaks, drop)
+    return peaks
+
+
+def beat_matrix(ecg, peaks, sample_rate_hz: float):
+    """(beats [k, L] float32 zero-mean unit-norm rows, indices of the peaks that fit).
+
+    Pass the baseline-free signal (remove_wander): cut from the raw ECG, the correlation of
+    two beats mostly measures how the wander runs through them.
+    """
+    x = np.asarray(ecg, dtype=np.float32)
+    before, after = int(round(BEAT_BEFORE_S * sample_rate_hz)), int(round(BEAT_AFTER_S * sample_rate_hz))
+    fits = np.flatnonzero((peaks >= before) & (peaks + after <= x.size))
+    beats = x[peaks[fits, None] + np.arange(-before, after)[None, :]]
+    beats -= beats.mean(axis=1, keepdims=True)
+    beats /= np.maximum(np.linalg.norm(beats, axis=1, keepdims=True), 1e-12)
+    return beats, fits
+
+
+def rr_deviation(peaks, sample_rate_hz: float, context: int = RR_CONTEXT):
+    """(rr [k] s, rr / median of the previous `context` rr - 1); NaN until enough history"""
+    rr = np.diff(peaks) / sample_rate_hz
+    deviation = np.full(peaks.size, np.nan)
+    if rr.size > context:
+        reference = np.median(np.lib.stride_tricks.sliding_window_view(rr[:-1], context), axis=1)
+        # rr[i] (ending at beat i + 1) against rr[i - context:i]
+        deviation[context + 1:] = rr[context:] / reference - 1.0
+    return np.concatenate(([np.nan], rr)), deviation
+
+
+def score_beats(beats, template_beats: int = TEMPLATE_BEATS, ncc_threshold: float = NCC_THRESHOLD,
+                history: int = TEMPLATE_HISTORY):
+    """NCC of each beat with the running median template of earlier normal beats"""
+    ncc = np.full(beats.shape[0], np.nan, dtype=np.float32)
+    template = None
+    normal_beats = np.empty((0, beats.shape[1]), dtype=beats.dtype)
+    for start in range(0, beats.shape[0], template_beats):
+        block = beats[start:start + template_beats]
+        if template is None:
+            # The first block seeds the template (most beats in it are normal)
+            template = _normalise(np.median(block, axis=0))
+        ncc[start:start + len(block)] = block @ template
+        normal = block[ncc[start:start + len(block)] >= ncc_threshold]
+        if len(normal):
+            # Median of the newest `history` normal beats, this block's included, for the next block
+            normal_beats = np.concatenate((normal_beats, normal))[-history:]
+            if len(normal_beats) >= max(3, template_beats // 4):
+                template = _normalise(np.median(normal_beats, axis=0))
+    return ncc
+
+
+def _normalise(v):
+    v = v - v.mean()
+    return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def analyze_ecg(time, ecg, sample_rate_hz: float | None = None) -> dict:
+    """Beat-level scores and the flagged intervals of an ECG recording"""
+    t = np.asarray(time, dtype=np.float64)
+    x = np.asarray(ecg, dtype=np.float64)
+    fs = sample_rate_hz or estimate_sample_rate(t)
+    clean = remove_wander(x, fs)
+    peaks = _find_r_peaks(clean, fs, WINDOW_S)
+    beats, fits = beat_matrix(clean, peaks, fs)
+    ncc = np.full(peaks.size, np.nan, dtype=np.float32)
+    ncc[fits] = score_beats(beats)
+    rr, deviation = rr_deviation(peaks, fs)
+
+    morphology = ncc < NCC_THRESHOLD
+    irregular = np.abs(deviation) > RR_DEVIATION
+    kinds = np.where(morphology & irregular, "ectopic", np.where(morphology, "morphology",
+                     np.where(deviation < 0, "premature", "pause")))
+    flagged = morphology | irregular
+    intervals = _merge(t, peaks, flagged, kinds, ncc, deviation, fs)
+
+    # Long stretches without any beat (asystole, electrode off, dropped samples)
+    beat_times = t[peaks] if peaks.size else np.empty(0)
+    edges = np.concatenate(([t[0]], beat_times, [t[-1]])) if t.size else np.empty(0)
+    for i in np.flatnonzero(np.diff(edges) > PAUSE_S):
+        intervals.append({"t_start": float(edges[i]), "t_end": float(edges[i + 1]), "kind": "no_beats",
+                          "beats": 0, "ncc_min": None, "rr_dev_max": None})
+    intervals.sort(key=lambda r: r["t_start"])
+
+    scored = ~np.isnan(ncc)
+    return {
+        "samples": int(x.size),
+        "duration_s": round(float(t[-1] - t[0]), 3) if t.size else 0.0,
+        "sample_rate_hz": round(fs, 3),
+        "beats": int(peaks.size),
+        "flagged_beats": int(np.count_nonzero(flagged)),
+        "ncc_median": round(float(np.median(ncc[scored])), 4) if scored.any() else None,
+        "intervals": intervals,
+    }
+
+
+def _merge(t, peaks, flagged, kinds, ncc, deviation, fs):
+    """Runs of consecutive flagged beats of one kind -> interval rows"""
+    idx = np.flatnonzero(flagged)
+    if idx.size == 0:
+        return []
+    new_run = np.concatenate(([True], (np.diff(idx) > 1) | (kinds[idx[1:]] != kinds[idx[:-1]])))
+    starts = np.flatnonzero(new_run)
+    ends = np.concatenate((starts[1:], [idx.size]))
+    half = BEAT_BEFORE_S
+    intervals = []
+    for a, b in zip(starts.tolist(), ends.tolist()):
+        run = idx[a:b]
+        run_ncc = ncc[run][~np.isnan(ncc[run])]
+        run_dev = np.abs(deviation[run])[~np.isnan(deviation[run])]
+        intervals.append({
+            "t_start": float(t[peaks[run[0]]] - half),
+            "t_end": float(t[min(peaks[run[-1]] + int(BEAT_AFTER_S * fs), t.size - 1)]),
+            "kind": str(kinds[run[0]]),
+            "beats": int(run.size),
+            "ncc_min": round(float(run_ncc.min()), 4) if run_ncc.size else None,
+            "rr_dev_max": round(float(run_dev.max()), 4) if run_dev.size else None,
+        })
+    return intervals
+
+
+def _connect(db_path: str = DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def save_scan(recording: str, version, result: dict, db_path: str = DB_PATH) -> None:
+    """Replace the stored intervals of a recording with this scan's"""
+    summary = {k: v for k, v in result.items() if k != "intervals"}
+    with _connect(db_path) as conn:
+        conn.execute("DELETE FROM anomalies WHERE recording = ?", (recording,))
+        conn.executemany(
+            "INSERT INTO anomalies VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(recording, json.dumps(version), r["t_start"], r["t_end"], r["kind"], r["beats"],
+              r["ncc_min"], r["rr_dev_max"]) for r in result["intervals"]],
+        )
+        conn.execute("INSERT OR REPLACE INTO scans VALUES (?, ?, ?)",
+                     (recording, json.dumps(version), json.dumps(summary)))
+    conn.close()
+
+
+def load_scan(recording: str, version, db_path: str = DB_PATH) -> dict | None:
+    """Stored scan of exactly this version of the recording, or None"""
+    if not os.path.exists(db_path):
+        return None
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT summary FROM scans WHERE recording = ? AND version = ?",
+                           (recording, json.dumps(version))).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        result["intervals"] = query_anomalies(recording, db_path=db_path, conn=conn)
+        return result
+    finally:
+        conn.close()
+
+
+def query_anomalies(recording: str, t0: float | None = None, t1: float | None = None, kind: str | None = None,
+                    db_path: str = DB_PATH, conn=None) -> list[dict]:
+    """Stored intervals overlapping [t0, t1], optionally of one kind, in time order"""
+    own = conn is None
+    if own:
+        if not os.path.exists(db_path):
+            return []
+        conn = _connect(db_path)
+    try:
+        sql = "SELECT t_start, t_end, kind, beats, ncc_min, rr_dev_max FROM anomalies WHERE recording = ?"
+        params: list = [recording]
+        if t0 is not None:
+            sql += " AND t_end >= ?"
+            params.append(float(t0))
+        if t1 is not None:
+            sql += " AND t_start <= ?"
+            params.append(float(t1))
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        rows = conn.execute(sql + " ORDER BY t_start", params).fetchall()
+    finally:
+        if own:
+            conn.close()
+    keys = ("t_start", "t_end", "kind", "beats", "ncc_min", "rr_dev_max")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+# Scan cache, keyed by recording path and invalidated by (mtime, size)
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def get_anomalies(filepath: str, time, ecg, version=None) -> dict:
+    """analyze_ecg result for a recording, from memory, the table, or a fresh scan.
+
+    Same caching contract as signal_summary.get_exg_digest: `version` defaults to the
+    file's (mtime, size); pass an explicit version for sources that are not files. Only
+    file-versioned scans are stored in the table (live rings change every rerun).
+    """
+    persist = version is None
+    if version is None:
+        try:
+            st_ = os.stat(filepath)
+            version = [st_.st_mtime_ns, st_.st_size]
+        except OSError:
+            version, persist = None, False
+    version = list(version) if version is not None else None
+    with _cache_lock:
+        entry = _cache.get(filepath)
+        if entry is not None and version is not None and entry[0] == version:
+            return entry[1]
+    result = None
+    if persist:
+        try:
+            result = load_scan(os.path.abspath(filepath), version)
+        except sqlite3.Error:
+            result = None
+    if result is None:
+        result = analyze_ecg(time, ecg)
+        if persist:
+            try:
+                save_scan(os.path.abspath(filepath), version, result)
+            except (sqlite3.Error, OSError):
+                pass  # read-only checkout: the in-process cache still works
+    with _cache_lock:
+        _cache[filepath] = (version, result)
+    return result
+
+
+def format_anomalies(result: dict, max_listed: int = 5) -> str:
+    """Compact summary for captions and LLM context (size bounded by max_listed)"""
+    if not result or not result.get("beats"):
+        return "ECG anomalies: no beats detected"
+    intervals = result["intervals"]
+    counts: dict = {}
+    for r in intervals:
+        counts[r["kind"]] = counts.get(r["kind"], 0) + 1
+    text = (f"ECG anomalies: {result['flagged_beats']} of {result['beats']} beats flagged "
+            f"(template correlation median {result['ncc_median']})")
+    if not intervals:
+        return text + ", no abnormal intervals"
+    text += "; " + ", ".join(f"{n} {kind}" for kind, n in sorted(counts.items()))
+    worst = sorted(intervals, key=lambda r: (r["ncc_min"] if r["ncc_min"] is not None else 1.0))[:max_listed]
+    listed = "; ".join(f"{r['kind']} at {r['t_start']:.2f}-{r['t_end']:.2f} s"
+                       + (f" (ncc {r['ncc_min']})" if r["ncc_min"] is not None else "")
+                       for r in sorted(worst, key=lambda r: r["t_start"]))
+    return f"{text}. Most atypical: {listed}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag abnormal ECG beats and store them in SQLite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    scan_p = sub.add_parser("scan", help="Scan a recording (.json, .jsonl, .exgbin, .exga)")
+    scan_p.add_argument("recording")
+    scan_p.add_argument("--channel", default="Signal1", help="ECG channel (default Signal1)")
+    query_p = sub.add_parser("query", help="List stored intervals")
+    query_p.add_argument("recording")
+    query_p.add_argument("--from", dest="t0", type=float, default=None)
+    query_p.add_argument("--to", dest="t1", type=float, default=None)
+    query_p.add_argument("--kind", default=None)
+    args = parser.parse_args()
+
+    if args.command == "query":
+        for row in query_anomalies(os.path.abspath(args.recording), args.t0, args.t1, args.kind):
+            print(json.dumps(row))
+        return 0
+
+    import time as clock
+
+    from exg_archive import load_rows
+
+    columns, rows = load_rows(args.recording)
+    channel = args.channel if args.channel in columns else columns[1]
+    start = clock.perf_counter()
+    result = analyze_ecg(rows[:, 0], rows[:, columns.index(channel)])
+    elapsed = clock.perf_counter() - start
+    st_ = os.stat(args.recording)
+    save_scan(os.path.abspath(args.recording), [st_.st_mtime_ns, st_.st_size], result)
+    print(format_anomalies(result))
+    print(f"{result['duration_s']:.0f} s of ECG scanned in {elapsed:.2f} s "
+          f"({result['duration_s'] / max(elapsed, 1e-9):,.0f}x real time); "
+          f"{len(result['intervals'])} intervals stored in {DB_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+Benchmark suite - times the signal loaders, metrics and the Signal Insights rerun on synthetic recordings
+
+Usage:
+    python benchmark.py run --sizes 10k,100k,1m --out benchmarks/current.json
+    python benchmark.py compare benchmarks/baseline.json benchmarks/current.json --threshold 0.15
+    python benchmark.py startup --budget-ms 1500
+
+Each case runs in a fresh child process, so peak RSS is per case and imports/caches from
+one case never leak into another. Recordings are generated from a fixed seed and reused
+from the cache directory, so two runs on the same machine time identical inputs.
+"""
+
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+SEED = 1234
+CACHE_DIR = os.path.join("benchmarks", "data")
+PAGE_PATH = os.path.join("pages", "1_Signal_Insights.py")
+CASES = (
+    "load_last_n_jsonl",
+    "load_first_n_jsonl",
+    "load_jsonl_arrays",
+    "load_signal1_from_json",
+    "load_signal2_from_json",
+    "load_signal3_from_json",
+    "load_exg_archive",
+    "compute_metrics",
+    "signal_insights_rerun",
+)
+# Rows written per chunk when generating recordings (keeps generation memory flat)
+GEN_CHUNK = 1_000_000
+# On-disk caches the page writes (env var, file name under the case's scratch dir). The rerun
+# case points them at a temporary directory, so it neither reads state left by earlier runs nor
+# writes into the working tree's .cache/
+PAGE_CACHE_ENV = (
+    ("ANOMALY_DB_PATH", "anomalies.sqlite"),
+    ("SPECTROGRAM_CACHE_DIR", "spectrograms"),
+    ("FEATURE_INDEX_PATH", "feature_index.npz"),
+    ("CHAT_INDEX_PATH", "chat_retrieval.jsonl"),
+    ("SIGNAL_TIMINGS_DIR", "timings"),
+)
+# Modules that must stay out of the page's cold start (loaded on first AI request instead)
+LAZY_MODULES = ("google.generativeai", "dotenv", "requests")
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10_000, '1m' -> 1_000_000, '100M' -> 100_000_000"""
+    text = text.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000, "g": 1_000_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def make_jsonl_recording(path: str, n: int, interval_s: float = 0.05) -> None:
+    """simulation.py --stream model: 5 Hz sine + 0.2 noise, one ISO-timestamped record per line"""
+    rng = np.random.default_rng(SEED)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    two_pi = 2.0 * np.pi
+    with open(path, "w", encoding="utf-8") as fp:
+        for offset in range(0, n, GEN_CHUNK):
+            idx = np.arange(offset, min(offset + GEN_CHUNK, n))
+            values = np.sin(two_pi * 5.0 * interval_s * idx) + 0.2 * rng.standard_normal(idx.size)
+            ms = (idx * interval_s * 1000.0).astype(np.int64)
+            stamps = (start + timedelta(milliseconds=int(m)) for m in ms)
+            fp.writelines(
+                f'{{"timestamp": "{ts.isoformat(timespec="milliseconds").replace("+00:00", "Z")}", "value": {v!r}}}\n'
+                for ts, v in zip(stamps, values.tolist())
+            )
+
+
+def make_exg_json_recording(path: str, n: int, sample_rate_hz: int = 1000) -> None:
+    """Trible_EXG_Signal-shaped file built from signal_data.generate_signal, one channel at a time"""
+    from signal_data import generate_signal
+
+    np.random.seed(SEED)
+    duration_s = n / sample_rate_hz
+    # (frequency, noise, baseline) loosely matching the ECG/EOG/EMG ranges in the real recording
+    channels = {"Signal1": (1.2, 0.002, 2.42), "Signal2": (0.5, 0.3, 2.17), "Signal3": (60.0, 0.5, 1.39)}
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write('{"Segment":1,"Message":"synthetic benchmark recording"')
+        t = None
+        for key, (freq_hz, noise_std, baseline) in channels.items():
+            t, signal = generate_signal(sample_rate_hz, duration_s, freq_hz, noise_std)
+            _write_json_array(fp, key, signal + baseline)
+        _write_json_array(fp, "Time", t)
+        fp.write("}")
+
+
+def _write_json_array(fp, key: str, values: np.ndarray) -> None:
+    fp.write(f',"{key}":[')
+    for offset in range(0, values.size, GEN_CHUNK):
+        if offset:
+            fp.write(",")
+        fp.write(",".join(map(repr, values[offset:offset + GEN_CHUNK].tolist())))
+    fp.write("]")
+
+
+def recording_paths(n: int) -> tuple[str, str]:
+    """Generate (or reuse) the JSONL and EXG JSON recordings for n samples"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    jsonl_path = os.path.join(CACHE_DIR, f"stream_{n}_{SEED}.jsonl")
+    json_path = os.path.join(CACHE_DIR, f"exg_{n}_{SEED}.json")
+    if not os.path.exists(jsonl_path):
+        make_jsonl_recording(jsonl_path + ".tmp", n)
+        os.replace(jsonl_path + ".tmp", jsonl_path)
+    if not os.path.exists(json_path):
+        make_exg_json_recording(json_path + ".tmp", n)
+        os.replace(json_path + ".tmp", json_path)
+    return jsonl_path, json_path
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _case_callable(case: str, n: int, jsonl_path: str, json_path: str, scratch_dir: str):
+    """Return a zero-argument callable running one iteration of the case"""
+    if case == "signal_insights_rerun":
+        os.environ["EXG_DATA_PATH"] = json_path
+        os.environ["SIGNAL_STREAM_PATH"] = jsonl_path
+        os.environ["SIGNAL_INSIGHTS_REFRESH_S"] = "0"
+        # Set before the page's modules are imported: they read these once, at import time
+        for env, name in PAGE_CACHE_ENV:
+            os.environ[env] = os.path.join(scratch_dir, name)
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(PAGE_PATH, default_timeout=3600)
+
+        def rerun():
+            app.run()
+            if app.exception:
+                raise RuntimeError(app.exception[0].message)
+        return rerun
+
+    import signal_data
+
+    if case == "load_last_n_jsonl":
+        # Same call as the page: the tail is small but the whole file is scanned
+        return lambda: signal_data.load_last_n_jsonl(jsonl_path, n=100)
+    if case == "load_first_n_jsonl":
+        return lambda: signal_data.load_first_n_jsonl(jsonl_path, n=n)
+    if case == "load_jsonl_arrays":
+        from jsonl_decode import load_jsonl_arrays
+
+        return lambda: load_jsonl_arrays(jsonl_path)
+    if case == "load_exg_archive":
+        # All three channels from the compressed archive, vs. one JSON parse per channel above
+        from exg_archive import ExgArchive, pack
+
+        archive_path = os.path.splitext(json_path)[0] + ".exga"
+        if not os.path.exists(archive_path):
+            pack(json_path, archive_path)
+
+        def load_archive():
+            with ExgArchive(archive_path) as archive:
+                return archive.read_all()
+        return load_archive
+    if case == "compute_metrics":
+        _, signal = signal_data.generate_signal(1000, n / 1000, 5.0, 0.2)
+        return lambda: signal_data.compute_metrics(signal, 1000)
+    fn = getattr(signal_data, case)
+    return lambda: fn(json_path)
+
+
+def _run_case(case: str, n: int, jsonl_path: str, json_path: str, repeat: int, warmup: int) -> dict:
+    """Child-process entry point: time one case and report its peak RSS"""
+    with tempfile.TemporaryDirectory(prefix="signal_bench_") as scratch_dir:
+        run = _case_callable(case, n, jsonl_path, json_path, scratch_dir)
+        for _ in range(warmup):
+            run()
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            durations.append(time.perf_counter() - start)
+    median = statistics.median(durations)
+    return {
+        "case": case,
+        "n": n,
+        "repeat": repeat,
+        "seconds_median": median,
+        "seconds_min": min(durations),
+        "seconds_max": max(durations),
+        "samples_per_s": n / median if median > 0 else float("inf"),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def run_suite(sizes: list[int], cases: list[str], repeat: int, warmup: int) -> dict:
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for n in sizes:
+        print(f"preparing recordings for n={n:,}", file=sys.stderr)
+        jsonl_path, json_path = recording_paths(n)
+        for case in cases:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                try:
+                    result = pool.submit(_run_case, case, n, jsonl_path, json_path, repeat, warmup).result()
+                except Exception as e:
+                    print(f"  {case}[{n}] failed: {e}", file=sys.stderr)
+                    continue
+            key = f"{case}[{n}]"
+            results[key] = result
+            print(f"  {key:40s} {result['seconds_median'] * 1000:10.2f} ms  "
+                  f"{result['samples_per_s']:14,.0f} samples/s  {result['peak_rss_mb']:8.1f} MB", file=sys.stderr)
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": SEED,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Print a comparison table and return the keys that regressed beyond threshold or went missing"""
+    regressions = []
+    print(f"{'case':40s} {'baseline ms':>12s} {'current ms':>12s} {'ratio':>7s} {'rss ratio':>9s}")
+    for key, cur in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:40s} {'-':>12s} {cur['seconds_median'] * 1000:12.2f}   (new)")
+            continue
+        ratio = cur["seconds_median"] / base["seconds_median"] if base["seconds_median"] > 0 else 1.0
+        rss_ratio = cur["peak_rss_mb"] / base["peak_rss_mb"] if base["peak_rss_mb"] > 0 else 1.0
+        flag = ""
+        if ratio > 1.0 + threshold or rss_ratio > 1.0 + threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:40s} {base['seconds_median'] * 1000:12.2f} {cur['seconds_median'] * 1000:12.2f} "
+              f"{ratio:7.2f} {rss_ratio:9.2f}{flag}")
+    for key, base in baseline["results"].items():
+        if key not in current["results"]:
+            # A case that crashed (run_suite skips it) or was dropped must not pass as "no regression"
+            regressions.append(key)
+            print(f"{key:40s} {base['seconds_median'] * 1000:12.2f} {'-':>12s}   MISSING")
+    return regressions
+
+
+def page_imports(page_path: str = PAGE_PATH) -> list[str]:
+    """Top-level modules the page imports at module scope"""
+    with open(page_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=page_path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure_startup(modules: list[str]) -> dict:
+    """Import the modules in a fresh interpreter under -X importtime and summarise the tree"""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall_s = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    imported, top_level = {}, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        module = name.strip()
+        imported[module] = int(cumulative) / 1000.0
+        if name.startswith(" ") and not name.startswith("  "):
+            top_level[module] = imported[module]
+    return {"wall_ms": wall_s * 1000.0, "import_ms": sum(top_level.values()),
+            "top_level_ms": top_level, "imported": imported}
+
+
+def startup_report(budget_ms: float, repeat: int) -> int:
+    """Print the page's cold-import cost per module; exit 1 over budget or if a lazy module leaked in"""
+    modules = page_imports()
+    runs = [measure_startup(modules) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["import_ms"])
+    print(f"{'module':40s} {'cumulative ms':>14s}")
+    for module, ms in sorted(best["top_level_ms"].items(), key=lambda kv: -kv[1])[:15]:
+        print(f"{module:40s} {ms:14.1f}")
+    print(f"{'total import time':40s} {best['import_ms']:14.1f}  (interpreter wall {best['wall_ms']:.0f} ms, "
+          f"best of {repeat})")
+    leaked = [m for m in LAZY_MODULES if m in best["imported"]]
+    failed = False
+    if leaked:
+        print(f"imported at startup but should be lazy: {', '.join(leaked)}")
+        failed = True
+    if best["import_ms"] > budget_ms:
+        print(f"over the startup budget: {best['import_ms']:.0f} ms > {budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"within the startup budget ({budget_ms:.0f} ms)")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loaders, metrics and the Signal Insights rerun path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Run the suite and write a JSON result file")
+    run_p.add_argument("--sizes", default="10k,100k,1m", help="Comma-separated sample counts, e.g. 10k,1m,100m")
+    run_p.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of cases")
+    run_p.add_argument("--repeat", type=int, default=5, help="Timed iterations per case")
+    run_p.add_argument("--warmup", type=int, default=1, help="Untimed iterations per case")
+    run_p.add_argument("--out", default=os.path.join("benchmarks", "current.json"), help="Result JSON path")
+
+    cmp_p = sub.add_parser("compare", help="Compare two result files; exit 1 on regressions")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown/RSS growth (0.15 = 15%%)")
+
+    start_p = sub.add_parser("startup", help="Import-time report for the Signal Insights page; exit 1 over budget")
+    start_p.add_argument("--budget-ms", type=float, default=1500.0, help="Allowed total import time")
+    start_p.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to measure (best is kept)")
+
+    args = parser.parse_args()
+    if args.command == "startup":
+        return startup_report(args.budget_ms, args.repeat)
+    if args.command == "run":
+        cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+        unknown = sorted(set(cases) - set(CASES))
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(unknown)}")
+        report = run_suite([parse_size(s) for s in args.sizes.split(",")], cases, args.repeat, args.warmup)
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved results to {args.out}")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} or missing: {', '.join(regressions)}")
+        return 1
+    print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Chat log - append-only per-chat JSONL persistence with periodic compaction
+
+    append_chat("Morning run", messages)              # called from save_chat_history each turn
+    meta, messages = load_chat(path)                  # whole chat, e.g. to continue it
+    meta, recent = load_chat(path, last_n=20)         # only the newest messages, for display
+
+chat_history/chat_<name>.jsonl starts with a header ({"t": "meta", "name", "created"}), followed by
+one {"t": "msg", "i", "role", "content"} record per message. A save appends only the messages
+after the last persisted one, and it writes them with a single O_APPEND write. The cost of a
+turn therefore does not depend on the length of the chat. The process remembers how many
+messages each log holds and the fingerprint of the last one. The log is read once, the first
+time a chat is saved in a process, and a torn last line left by a crash is cut off then.
+
+If the history was rewritten (shortened, or a message was replaced), a {"t": "truncate", "keep"}
+record is appended before the new messages. The log is compacted (tmp + os.replace) once the
+records it carries that are no longer live outnumber the live ones. load_chat(last_n=...) reads
+the file backwards, so showing the end of a long chat does not parse all of it.
+
+Old chat_<name>.json files are still read and are migrated on their next save.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from file_tail import tail_lines
+
+CHAT_DIR = 'chat_history'
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+# path -> [messages persisted, fingerprint of the last one, live records, dead records]
+_state: dict[str, list] = {}
+_state_lock = threading.Lock()
+
+
+def chat_path(chat_name: str, directory: str = CHAT_DIR) -> str:
+    return os.path.join(directory, f"chat_{chat_name}.jsonl")
+
+
+def message_fingerprint(message) -> str:
+    """Short hex digest of a message's role and content (shared with chat_retrieval and context_packer)"""
+    return hashlib.blake2b(f"{message['role']}\0{message['content']}".encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _encode(records) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode('utf-8')
+
+
+def _append_bytes(path: str, data: bytes) -> None:
+    """One write on an O_APPEND descriptor: a record batch lands whole or (on a crash) as a torn tail"""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _replay(lines):
+    """(meta, live messages, dead record count) from log lines in file order"""
+    meta, messages, dead = {}, [], 0
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        kind = record.get('t')
+        if kind == 'meta':
+            meta = record
+        elif kind == 'msg':
+            messages.append({'role': record['role'], 'content': record['content']})
+        elif kind == 'truncate':
+            dead += len(messages) - record['keep'] + 1
+            del messages[record['keep']:]
+    return meta, messages, dead
+
+
+def _recover(path: str):
+    """Read a log once per process; cut off a torn last line so later appends stay parseable"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data and not data.endswith(b"\n"):
+        data = data[:data.rfind(b"\n") + 1]
+        with open(path, 'r+b') as f:
+            f.truncate(len(data))
+    meta, messages, dead = _replay(data.splitlines())
+    return meta, messages, dead
+
+
+def _write_log(path: str, meta: dict, messages) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_encode([meta] + [{'t': 'msg', 'i': i, 'role': m['role'], 'content': m['content']}
+                                  for i, m in enumerate(messages)]))
+    os.replace(tmp, path)
+
+
+def _read_legacy(path: str):
+    """(meta, messages) from an old whole-file chat_<name>.json"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return ({'t': 'meta', 'name': data.get('name', 'Untitled Chat'), 'created': data.get('timestamp', '')},
+            data.get('messages', []))
+
+
+def append_chat(chat_name: str, messages, directory: str = CHAT_DIR) -> str:
+    """Persist messages for a chat, writing only what changed since the last save; returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    path = chat_path(chat_name, directory)
+    legacy = os.path.splitext(path)[0] + ".json"
+    with _state_lock:
+        state = _state.get(path)
+        if state is None:
+            if os.path.exists(path):
+                _, persisted, dead = _recover(path)
+                state = [len(persisted), message_fingerprint(persisted[-1]) if persisted else None,
+                         len(persisted) + 1, dead]
+            else:
+                meta = {'t': 'meta', 'name': chat_name, 'created': datetime.now().strftime(TIMESTAMP_FORMAT)}
+                if os.path.exists(legacy):
+                    meta, old = _read_legacy(legacy)
+                    meta['name'] = chat_name
+                else:
+                    old = []
+                _write_log(path, meta, old)
+                if old:
+                    os.remove(legacy)
+                state = [len(old), message_fingerprint(old[-1]) if old else None, len(old) + 1, 0]
+            _state[path] = state
+
+        count, last_fp, live, dead = state
+        records = []
+        if count > len(messages) or (count and message_fingerprint(messages[count - 1]) != last_fp):
+            # History was rewritten; finding the common prefix would cost O(n), so start over
+            records.append({'t': 'truncate', 'keep': 0})
+            dead += count + 1
+            live -= count
+            count = 0
+        records.extend({'t': 'msg', 'i': i, 'role': m['role'], 'content': m['content']}
+                       for i, m in enumerate(messages[count:], start=count))
+        if records:
+            _append_bytes(path, _encode(records))
+            live += len(messages) - count
+        count = len(messages)
+        last_fp = message_fingerprint(messages[-1]) if messages else None
+
+        if dead > live:
+            meta, persisted, _ = _recover(path)
+            _write_log(path, meta, persisted)
+            live, dead = len(persisted) + 1, 0
+        _state[path] = [count, last_fp, live, dead]
+    return path
+
+
+def read_meta(path: str) -> dict:
+    """Header of a chat log (name, created) without reading the messages"""
+    if path.endswith('.json'):
+        return _read_legacy(path)[0]
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            return json.loads(f.readline())
+        except json.JSONDecodeError:
+            return {}
+
+
+def load_chat(path: str, last_n: int | None = None):
+    """(meta, messages) of a chat log; with last_n, only the newest last_n messages (read from the end)"""
+    if path.endswith('.json'):
+        meta, messages = _read_legacy(path)
+        return meta, messages[-last_n:] if last_n else messages
+    if not last_n:
+        with open(path, 'rb') as f:
+            meta, messages, _ = _replay(f.read().splitlines())
+        return meta, messages
+    meta = read_meta(path)
+    want = last_n + 1
+    while True:
+        lines = tail_lines(path, want)
+        found = _newest_messages(lines, last_n)
+        if found is not None or len(lines) < want:
+            break
+        want *= 4
+    if found is None:
+        # Reached the start of the file: a full replay is exact and no more expensive now
+        _, messages, _ = _replay(lines)
+        found = messages[-last_n:]
+    return meta, found
+
+
+def _newest_messages(lines, last_n: int):
+    """Newest last_n live messages from the tail of a log, or None if the tail is not enough"""
+    total, limit, picked = None, None, {}
+    for line in reversed(lines):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        kind = record.get('t')
+        if kind == 'truncate':
+            limit = record['keep'] if limit is None else min(limit, record['keep'])
+            if total is None:
+                total = record['keep']
+        elif kind == 'msg':
+            i = record['i']
+            if total is None:
+                total = i + 1
+            if (limit is None or i < limit) and i >= total - last_n and i not in picked:
+                picked[i] = {'role': record['role'], 'content': record['content']}
+        elif kind == 'meta':
+            total = 0 if total is None else total
+        if total is not None and len(picked) >= min(last_n, total):
+            return [picked[i] for i in sorted(picked)]
+    return None
+
+
+def list_chats(directory: str = CHAT_DIR):
+    """Saved chats as dicts (path, filename, name, updated), newest first, without loading messages"""
+    chats, seen = [], set()
+    if not os.path.isdir(directory):
+        return chats
+    for file in sorted(os.listdir(directory), key=lambda f: not f.endswith('.jsonl')):
+        stem, ext = os.path.splitext(file)
+        if not file.startswith('chat_') or ext not in ('.jsonl', '.json') or stem in seen:
+            continue
+        path = os.path.join(directory, file)
+        try:
+            meta = read_meta(path)
+            if ext == '.json':
+                updated = datetime.strptime(meta.get('created', ''), TIMESTAMP_FORMAT)
+            else:
+                updated = datetime.fromtimestamp(os.path.getmtime(path))
+        except (OSError, ValueError, json.JSONDecodeError):
+            continue
+        seen.add(stem)
+        chats.append({'path': path, 'filename': file, 'name': meta.get('name', 'Untitled Chat'), 'updated': updated})
+    return sorted(chats, key=lambda c: c['updated'], reverse=True)
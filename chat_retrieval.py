@@ -0,0 +1,223 @@
+"""
+Chat retrieval - BM25 (TF-IDF family) index over saved chat messages, so prompts carry the relevant past turns
+
+    index = get_chat_index()
+    index.index_chat("Morning run", messages)      # called from save_chat_history
+    hits = index.search("why is my heart rate high after running", k=4)
+
+Each saved message is one document. The index is kept in memory as postings (term -> doc ids
+and term counts) plus document lengths. On disk it is an append-only JSONL log at
+CHAT_INDEX_PATH: saving a chat appends only the messages not yet indexed, so the cost of an
+update does not depend on how much history exists. A chat whose history was edited or
+shortened is dropped and indexed again. The log is compacted once dropped records outweigh
+live ones. On first use, saved chats in chat_history that the log does not cover yet are
+indexed too, so history written before the index existed is searchable. Scores are BM25,
+which needs no re-normalisation when document frequencies change, so the index stays exact
+under incremental updates.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from chat_log import CHAT_DIR, list_chats, load_chat, message_fingerprint
+
+INDEX_PATH = os.getenv("CHAT_INDEX_PATH", os.path.join(".cache", "chat_retrieval.jsonl"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Very short or generic messages ("ok", "thanks") are not worth retrieving
+MIN_TERMS = 3
+MAX_STORED_CHARS = 2000
+
+_TOKEN = re.compile(r"[a-z0-9]+|[一-鿿]")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in is it me my no not of on or so that the "
+    "this to was we what when which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-case words and single CJK characters, stopwords removed"""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class ChatIndex:
+    """BM25 over chat messages, updated incrementally and persisted as an append-only log"""
+
+    def __init__(self, path: str | None = INDEX_PATH):
+        self.path = path
+        self.docs: list[dict | None] = []      # None = dropped
+        self.lengths: list[int] = []
+        self.postings: dict[str, tuple[list, list]] = {}
+        self.chats: dict[str, list[int]] = {}  # chat name -> doc ids in message order
+        self.dropped = 0
+        self._arrays = None                    # (lengths, live) arrays, rebuilt after updates
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    # -- log ---------------------------------------------------------------
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue   # torn last line after a crash
+                if "drop" in record:
+                    self._drop(record["drop"])
+                else:
+                    self._add(record)
+
+    def _append(self, records) -> None:
+        if not self.path or not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+    def compact(self) -> None:
+        """Rewrite the log with live documents only (tmp + os.replace)"""
+        live = [d for d in self.docs if d is not None]
+        if self.path:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in live))
+            os.replace(tmp, self.path)
+        self.docs, self.lengths, self.postings, self.chats = [], [], {}, {}
+        self.dropped = 0
+        for d in live:
+            self._add(d)
+
+    # -- in-memory index -----------------------------------------------------
+    def _add(self, record: dict) -> None:
+        doc_id = len(self.docs)
+        terms = Counter(tokenize(record["text"]))
+        self.docs.append(record)
+        self.lengths.append(sum(terms.values()))
+        for term, count in terms.items():
+            ids, tfs = self.postings.setdefault(term, ([], []))
+            ids.append(doc_id)
+            tfs.append(count)
+        self.chats.setdefault(record["chat"], []).append(doc_id)
+        self._arrays = None
+
+    def _drop(self, chat: str) -> None:
+        for doc_id in self.chats.pop(chat, []):
+            if self.docs[doc_id] is not None:
+                self.docs[doc_id] = None
+                self.dropped += 1
+        self._arrays = None
+
+    def index_chat(self, chat: str, messages) -> int:
+        """Index messages not seen yet for this chat; returns the number added"""
+        with self._lock:
+            known_prints = [self.docs[i]["fp"] for i in self.chats.get(chat, [])]
+            worthy, seen = [], set()
+            for position, message in enumerate(messages):
+                fp = message_fingerprint(message)
+                if fp not in seen and self._worth(message):
+                    seen.add(fp)
+                    worthy.append((position, message, fp))
+            records = []
+            if known_prints != [fp for _, _, fp in worthy[:len(known_prints)]]:
+                # History was edited or shortened: start this chat over
+                self._drop(chat)
+                records.append({"drop": chat})
+                known_prints = []
+            for position, message, fp in worthy[len(known_prints):]:
+                record = {"chat": chat, "position": position, "role": message["role"], "fp": fp,
+                          "text": message["content"][:MAX_STORED_CHARS]}
+                self._add(record)
+                records.append(record)
+            self._append(records)
+            if self.dropped > len(self.docs) - self.dropped:
+                self.compact()
+            return sum(1 for r in records if "drop" not in r)
+
+    def index_saved_chats(self, directory: str = CHAT_DIR) -> int:
+        """Index chats saved (or changed) since the log was last written; returns the number added.
+
+        Chats written before the index existed, or by a process that did not index them, are
+        picked up here. Chats already indexed and not touched since are skipped unread.
+        """
+        indexed_at = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+        added = 0
+        for chat in list_chats(directory):
+            if chat["name"] in self.chats and indexed_at is not None and chat["updated"].timestamp() <= indexed_at:
+                continue
+            try:
+                _, messages = load_chat(chat["path"])
+            except (OSError, ValueError):
+                continue
+            added += self.index_chat(chat["name"], messages)
+        return added
+
+    @staticmethod
+    def _worth(message) -> bool:
+        return message.get("role") in ("user", "assistant") and len(tokenize(message.get("content", ""))) >= MIN_TERMS
+
+    def _doc_arrays(self):
+        """(lengths, live mask) as arrays, rebuilt only after the documents changed"""
+        if self._arrays is None:
+            self._arrays = (np.asarray(self.lengths, dtype=np.float64),
+                            np.array([d is not None for d in self.docs], dtype=bool))
+        return self._arrays
+
+    def search(self, query: str, k: int = 4, exclude=()) -> list[dict]:
+        """Top-k documents for the query: dicts with chat, position, role, text and score.
+
+        exclude: message fingerprints to skip (e.g. turns already in the prompt).
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self.docs:
+                return []
+            lengths, live = self._doc_arrays()
+            n_live = max(int(live.sum()), 1)
+            avg_len = max(float(lengths[live].mean()), 1.0) if live.any() else 1.0
+            scores = np.zeros(len(self.docs))
+            for term in terms:
+                if term not in self.postings:
+                    continue
+                ids, tfs = (np.asarray(a) for a in self.postings[term])
+                tfs = tfs.astype(np.float64)
+                df = int(live[ids].sum())
+                idf = math.log(1.0 + (n_live - df + 0.5) / (df + 0.5))
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[ids] / avg_len)
+                scores[ids] += idf * tfs * (BM25_K1 + 1.0) / (tfs + norm)
+            scores[~live] = 0.0
+            candidates = np.flatnonzero(scores > 0)
+            if candidates.size == 0:
+                return []
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+            hits = []
+            exclude = set(exclude)
+            for doc_id in order.tolist():
+                doc = self.docs[doc_id]
+                if doc["fp"] in exclude:
+                    continue
+                hits.append(dict(doc, score=round(float(scores[doc_id]), 4)))
+                if len(hits) >= k:
+                    break
+            return hits
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_chat_index() -> ChatIndex:
+    """Process-wide index (loaded from CHAT_INDEX_PATH and caught up with chat_history on first use)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = ChatIndex()
+            index.index_saved_chats()
+            _index = index
+        return _index
@@ -1,10 +1,10 @@
-import json
 import streamlit as st
-import os
 import base64
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from ai_handler import get_ai_handler  # Import AI handler module
+from chat_log import append_chat, list_chats, load_chat
+from chat_retrieval import get_chat_index
 
 # # Redirect to Signal Insights as homepage if available
 # try:
@@ -15,6 +15,9 @@ from ai_handler import get_ai_handler  # Import AI handler module
 
 load_dotenv()
 
+# An opened chat shows only its newest messages (read from the end of the log)
+DISPLAY_MESSAGES = 50
+
 # Function to convert image to base64
 def get_base64_of_bin_file(bin_file):
     with open(bin_file, 'rb') as f:
@@ -224,52 +227,35 @@ if 'chat_name' not in st.session_state:
     st.session_state['chat_name'] = 'Untitled Chat'
 # Save chat history with a name
 def save_chat_history(messages, chat_name):
-    if not os.path.exists('chat_history'):
-        os.makedirs('chat_history')
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"chat_history/chat_{chat_name}.json"
-    
-    # Save chat history with name and timestamp
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump({
-            "name": chat_name,
-            "messages": messages,
-            "timestamp": timestamp
-        }, f, ensure_ascii=False, indent=2)
-    
+    # Appends only the new turns to chat_history/chat_<name>.jsonl
+    filename = append_chat(chat_name, messages)
+
+    # Only turns not indexed yet are appended, so this stays cheap as the history grows
+    get_chat_index().index_chat(chat_name, messages)
     return filename
-# Load chat histories
+# Load chat histories (names and times only; messages are read when a chat is opened)
 def load_chat_histories():
-    histories = []
-    if os.path.exists('chat_history'):
-        for file in os.listdir('chat_history'):
-            if file.startswith('chat_') and file.endswith('.json'):
-                with open(f'chat_history/{file}', 'r', encoding='utf-8') as f:
-                    try:
-                        data = json.load(f)
-                        # Use timestamp field from JSON file
-                        timestamp = data.get('timestamp', '')
-                        if timestamp:
-                            try:
-                                # Convert timestamp string to datetime
-                                creation_time = datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
-                            except ValueError:
-                                # Skip this file if timestamp format is invalid
-                                continue
-                        else:
-                            # Skip if timestamp field is missing
-                            continue
-                        
-                        histories.append({
-                            'filename': file,
-                            'name': data.get('name', 'Untitled Chat'),
-                            'messages': data.get('messages', []),
-                            'creation_time': creation_time
-                        })
-                    except (json.JSONDecodeError, OSError):
-                        continue
-    return sorted(histories, key=lambda x: x['creation_time'], reverse=True)
+    return [{
+        'filename': chat['filename'],
+        'path': chat['path'],
+        'name': chat['name'],
+        'creation_time': chat['updated']
+    } for chat in list_chats()]
+
+def open_chat_history(history):
+    _, messages = load_chat(history['path'], last_n=DISPLAY_MESSAGES)
+    st.session_state['messages'] = messages
+    st.session_state['chat_name'] = history['name']
+    # Only the tail was read; load_full_history() reads the rest before the chat is continued or saved
+    st.session_state['chat_path'] = history['path'] if len(messages) == DISPLAY_MESSAGES else None
+    st.rerun()
+
+def load_full_history():
+    """Replace the displayed tail of an opened chat with its whole history"""
+    path = st.session_state.pop('chat_path', None)
+    if path:
+        _, st.session_state['messages'] = load_chat(path)
+    return st.session_state['messages']
 
 def categorize_histories_by_time(histories):
     """Categorize histories by time"""
@@ -300,6 +286,7 @@ def categorize_histories_by_time(histories):
 #     st.session_state['chat_name'] = 'Untitled Chat'
 # if st.sidebar.button('+ New Chat', key='new_chat', use_container_width=True,type="primary"):
 #     if st.session_state['messages']:
+#         load_full_history()
 #         chat_name = st.session_state.get('chat_name', 'Untitled Chat')
 #         saved_file = save_chat_history(st.session_state['messages'], chat_name)
 #     st.session_state['messages'] = []
@@ -323,9 +310,7 @@ if today_histories:
             type="tertiary", 
             use_container_width=True,
         ):
-            st.session_state['messages'] = history['messages']
-            st.session_state['chat_name'] = history['name']
-            st.rerun()
+            open_chat_history(history)
 
 # This week
 if week_histories:
@@ -343,9 +328,7 @@ if week_histories:
             type="tertiary", 
             use_container_width=True,
         ):
-            st.session_state['messages'] = history['messages']
-            st.session_state['chat_name'] = history['name']
-            st.rerun()
+            open_chat_history(history)
 
 # Older
 if older_histories:
@@ -363,9 +346,7 @@ if older_histories:
             type="tertiary", 
             use_container_width=True,
         ):
-            st.session_state['messages'] = history['messages']
-            st.session_state['chat_name'] = history['name']
-            st.rerun()
+            open_chat_history(history)
 
 # Add Get Started button in the center when no messages
 if not st.session_state.get('messages', []):
@@ -383,7 +364,7 @@ if not st.session_state.get('messages', []):
             st.switch_page("pages/1_Signal_Insights.py")
 
 # update the interface with the previous messages
-for message in st.session_state['messages']:
+for message in st.session_state['messages'][-DISPLAY_MESSAGES:]:
     with st.chat_message(message['role']):
         st.markdown(message['content'])
 
@@ -391,6 +372,7 @@ for message in st.session_state['messages']:
 # if prompt := st.chat_input("You can continue asking..."):
 #     # Get AI handler
 #     ai_handler = get_ai_handler()
+#     load_full_history()
     
 #     # Process user input
 #     processed_prompt = ai_handler.process_user_input(prompt)
@@ -410,7 +392,7 @@ for message in st.session_state['messages']:
 #     # Get AI response
 #     with st.chat_message('assistant'):
 #         # Use AI handler to get response
-#         response = ai_handler.get_ai_response(st.session_state['messages'])
+#         response = ai_handler.get_ai_response(st.session_state['messages'], retrieve=True)
         
 #         # Post-process AI output
 #         processed_response = ai_handler.process_ai_output(response)
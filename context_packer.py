@@ -0,0 +1,220 @@
+"""
+Context packer - fits chat history into a token budget before it is sent to the LLM
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from chat_log import message_fingerprint
+from chat_retrieval import get_chat_index
+
+# Prompt budget for the packed history (override via env)
+DEFAULT_TOKEN_BUDGET = int(os.getenv('AI_CONTEXT_TOKENS', '3000'))
+# Past turns (saved chats and older turns of this one) retrieved by relevance for calls made
+# with retrieve=True; 0 disables
+DEFAULT_RETRIEVAL_K = int(os.getenv('AI_RETRIEVAL_K', '4'))
+SUMMARY_HEADER = "Summary of earlier conversation:"
+RETRIEVAL_HEADER = "Relevant earlier messages:"
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def message_tokens(message):
+    # +4 covers the role prefix and separator added by render_prompt()
+    return estimate_tokens(message['content']) + 4
+
+
+def render_prompt(messages):
+    """Join messages into the single "role: content" prompt string the handlers send"""
+    return "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+
+
+def _summary_line(message, max_chars):
+    """One-line extract of an older turn (whitespace collapsed, truncated)"""
+    text = " ".join(message['content'].split())
+    if len(text) > max_chars:
+        text = text[:max_chars - 3].rstrip() + "..."
+    return f"- {message['role']}: {text}"
+
+
+class _PackedPrefix:
+    """Cached summary of the older part of one conversation"""
+
+    def __init__(self):
+        self.covered = 0          # number of older messages already summarised
+        self.last_fingerprint = None
+        self.lines = []
+        self.line_tokens = []
+        self.key = None           # (covered, head fingerprints, summary budget) of the cached render
+        self.messages = []        # head + summary message
+        self.prompt = ""          # render_prompt(self.messages)
+
+
+class ContextPacker:
+    """Pack chat history into a token budget.
+
+    Leading system messages are always kept, the most recent turns are kept verbatim
+    and anything older is replaced by a short extractive summary. The summary (and the
+    rendered prompt prefix) is cached per conversation and extended incrementally, so a
+    new turn only summarises the messages that just fell out of the recent window.
+
+    With retrieve=True (chat conversations; prompts such as Signal Insights' carry their own
+    context and leave it off), the top-k saved messages most relevant to the latest user turn
+    (chat_retrieval's BM25 index) are added within retrieval_ratio of the budget, so the
+    prompt stays the same size however long the history grows. If nothing relevant is
+    found, that share of the budget goes back to the history.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, min_recent=2, summary_ratio=0.25,
+                 summary_line_chars=160, max_conversations=32, retrieval_k=DEFAULT_RETRIEVAL_K,
+                 retrieval_ratio=0.2, retriever=None):
+        self.token_budget = token_budget
+        self.min_recent = min_recent
+        self.summary_ratio = summary_ratio
+        self.summary_line_chars = summary_line_chars
+        self.max_conversations = max_conversations
+        self.retrieval_k = retrieval_k
+        self.retrieval_ratio = retrieval_ratio
+        self.retriever = retriever   # anything with search(query, k, exclude); default: chat_retrieval index
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pack(self, messages, conversation_id=None, token_budget=None, retrieve=False):
+        """Return the messages to send: system prompt, optional summary, retrieved turns, recent turns"""
+        head, summary, retrieved, recent = self._pack(messages, conversation_id, token_budget, retrieve)
+        return (summary.messages if summary is not None else head) + retrieved + recent
+
+    def build_prompt(self, messages, conversation_id=None, token_budget=None, retrieve=False):
+        """Packed history rendered as one prompt string (cached prefix + recent turns)"""
+        head, summary, retrieved, recent = self._pack(messages, conversation_id, token_budget, retrieve)
+        if summary is None:
+            return render_prompt(head + retrieved + recent)
+        if not retrieved and not recent:
+            return summary.prompt
+        return summary.prompt + "\n" + render_prompt(retrieved + recent)
+
+    def clear(self, conversation_id=None):
+        with self._lock:
+            if conversation_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(conversation_id, None)
+
+    def _pack(self, messages, conversation_id, token_budget, retrieve):
+        budget = self.token_budget if token_budget is None else token_budget
+        n_head = 0
+        while n_head < len(messages) and messages[n_head]['role'] == 'system':
+            n_head += 1
+        head, body = list(messages[:n_head]), messages[n_head:]
+
+        budget = max(budget - sum(message_tokens(m) for m in head), 0)
+        retrieval_budget = int(budget * self.retrieval_ratio) if retrieve and self.retrieval_k and body else 0
+        split, recent_budget, summary_budget = self._split(body, budget - retrieval_budget)
+        retrieved = self._retrieve(body, body[split:], retrieval_budget) if retrieval_budget else []
+        if retrieval_budget and not retrieved:
+            # Nothing relevant (or an empty index): the reserve goes back to the history
+            split, recent_budget, summary_budget = self._split(body, budget)
+        older, recent = body[:split], self._clip(body[split:], recent_budget)
+        if not older:
+            return head, None, retrieved, recent
+
+        if conversation_id is None:
+            # The first turn identifies the conversation well enough for caching
+            conversation_id = message_fingerprint(body[0])
+        with self._lock:
+            summary = self._summary(conversation_id, head, older, summary_budget)
+        return head, summary, retrieved, recent
+
+    def _split(self, body, budget):
+        """(index of the first recent turn, recent budget, summary budget) for a history budget"""
+        summary_budget = int(budget * self.summary_ratio)
+        recent_budget = budget - summary_budget
+
+        # Walk back from the newest turn until the recent budget is spent
+        split = len(body)
+        used = 0
+        for i in range(len(body) - 1, -1, -1):
+            cost = message_tokens(body[i])
+            if used + cost > recent_budget and len(body) - split >= self.min_recent:
+                break
+            used += cost
+            split = i
+        return split, recent_budget, summary_budget
+
+    def _retrieve(self, body, recent, retrieval_budget):
+        """System message with the saved turns most relevant to the latest user turn"""
+        query = next((m['content'] for m in reversed(body) if m['role'] == 'user'), "")
+        if not query:
+            return []
+        retriever = self.retriever if self.retriever is not None else get_chat_index()
+        try:
+            hits = retriever.search(query, self.retrieval_k, exclude={message_fingerprint(m) for m in recent})
+        except Exception:
+            return []  # retrieval is best effort; the prompt works without it
+        lines, used = [], estimate_tokens(RETRIEVAL_HEADER)
+        for hit in hits:
+            line = _summary_line({'role': f"{hit['role']} ({hit['chat']})", 'content': hit['text']},
+                                 max(retrieval_budget * 4 // max(len(hits), 1), 40))
+            cost = estimate_tokens(line) + 1
+            if used + cost > retrieval_budget:
+                break
+            lines.append(line)
+            used += cost
+        if not lines:
+            return []
+        return [{'role': 'system', 'content': "\n".join([RETRIEVAL_HEADER] + lines)}]
+
+    def _clip(self, recent, recent_budget):
+        """Truncate oversize turns so a single huge message can't blow the budget"""
+        max_chars = max(recent_budget, 1) * 4
+        clipped = []
+        for m in recent:
+            if len(m['content']) > max_chars:
+                m = dict(m, content=m['content'][:max_chars] + " [truncated]")
+            clipped.append(m)
+        return clipped
+
+    def _summary(self, conversation_id, head, older, summary_budget):
+        state = self._cache.get(conversation_id)
+        if state is None:
+            state = _PackedPrefix()
+            self._cache[conversation_id] = state
+            while len(self._cache) > self.max_conversations:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(conversation_id)
+
+        # Reuse the cached lines only if the conversation still starts the same way
+        if state.covered > len(older) or (
+                state.covered and message_fingerprint(older[state.covered - 1]) != state.last_fingerprint):
+            state = _PackedPrefix()
+            self._cache[conversation_id] = state
+        for m in older[state.covered:]:
+            line = _summary_line(m, self.summary_line_chars)
+            state.lines.append(line)
+            state.line_tokens.append(estimate_tokens(line) + 1)
+        if len(older) > state.covered:
+            state.covered = len(older)
+            state.last_fingerprint = message_fingerprint(older[-1])
+
+        key = (state.covered, tuple(message_fingerprint(m) for m in head), summary_budget)
+        if key != state.key:
+            # Keep the newest summary lines that fit the summary budget
+            used = estimate_tokens(SUMMARY_HEADER)
+            start = len(state.lines)
+            while start > 0 and used + state.line_tokens[start - 1] <= summary_budget:
+                start -= 1
+                used += state.line_tokens[start]
+            omitted = start
+            lines = state.lines[start:]
+            if omitted:
+                lines = [f"- ({omitted} earlier messages omitted)"] + lines
+            summary_message = {"role": "system", "content": "\n".join([SUMMARY_HEADER] + lines)}
+            state.messages = head + [summary_message]
+            state.prompt = render_prompt(state.messages)
+            state.key = key
+        return state
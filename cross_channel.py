@@ -0,0 +1,289 @@
+"""
+Cross-channel module - streaming cross-correlation / coherence between EXG channels and ECG artifact removal
+
+Usage:
+    python cross_channel.py Trible_EXG_Signal1.json
+    python cross_channel.py recordings/day.exga --clean recordings/day_clean.exga
+
+With the three-lead wiring of GirlHacks_ECG_EMG_EOG.m, the heart shows up in the EMG lead
+and muscle activity leaks into the EOG lead. For each channel pair, every window of WINDOW_S
+is cross-correlated over lags within +-MAX_LAG_S. This is overlap-save: the second channel's
+segment is extended by the lag range on both sides, and one circular correlation of FFT size
+>= window + 2 * lags gives every valid lag without wrap-around. All complete windows are
+transformed in one batched rfft. The FFT sizes, Hann windows and band masks are cached per
+(window, lag, rate), since NumPy's FFT takes no explicit plan. Magnitude-squared coherence
+(Welch, COHERENCE_NPERSEG segments) gives the coupling per frequency band.
+"""
+
+import argparse
+import functools
+import os
+import sys
+import threading
+import time as clock
+from collections import deque
+
+import numpy as np
+
+from signal_summary import CHANNEL_ROLES, SourceGuard, estimate_sample_rate
+
+WINDOW_S = 2.0
+MAX_LAG_S = 0.1
+COHERENCE_NPERSEG = 256
+MAX_WINDOWS = 1800   # per pair (an hour at 2 s windows)
+# (reference, target, band Hz) - ECG bleeding into EMG, EMG contaminating EOG
+PAIRS = (("Signal1", "Signal3", (1.0, 40.0)), ("Signal3", "Signal2", (20.0, 150.0)))
+# Template subtraction: samples around each R peak, beats per template block
+ARTIFACT_BEFORE_S = 0.25
+ARTIFACT_AFTER_S = 0.45
+ARTIFACT_TEMPLATE_BEATS = 16
+
+
+def _fast_len(n: int) -> int:
+    """Smallest 2^a 3^b 5^c >= n (sizes pocketfft handles fastest)"""
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            size = p35
+            while size < n:
+                size *= 2
+            best = min(best, size)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+@functools.lru_cache(maxsize=32)
+def _plan(window: int, max_lag: int, sample_rate_hz: float, band: tuple, nperseg: int):
+    """FFT size for the overlap-save correlation plus the Welch window and band mask"""
+    n_fft = _fast_len(window + 2 * max_lag)
+    hann = np.hanning(nperseg).astype(np.float64)
+    freqs = np.fft.rfftfreq(nperseg, d=1.0 / sample_rate_hz)
+    mask = (freqs >= band[0]) & (freqs <= band[1])
+    return n_fft, hann, mask
+
+
+def correlate_windows(x, y, window: int, max_lag: int, n_fft: int):
+    """Normalised cross-correlation of x windows with y over lags -max_lag..max_lag.
+
+    x: [w, window], y: [w, window + 2 * max_lag] (each x window plus max_lag on both
+    sides). Returns [w, 2 * max_lag + 1], lag k meaning y is k samples later than x.
+    """
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    spectrum = np.conj(np.fft.rfft(x, n_fft, axis=1)) * np.fft.rfft(y, n_fft, axis=1)
+    corr = np.fft.irfft(spectrum, n_fft, axis=1)[:, :2 * max_lag + 1]
+    # Energy of the y samples under x at each lag (sliding sums via cumsum)
+    c = np.concatenate((np.zeros((y.shape[0], 1)), np.cumsum(np.square(y), axis=1)), axis=1)
+    y_energy = c[:, window:window + 2 * max_lag + 1] - c[:, :2 * max_lag + 1]
+    norm = np.sqrt(np.sum(np.square(x), axis=1, keepdims=True) * y_energy)
+    return corr / np.maximum(norm, 1e-12)
+
+
+def band_coherence(x, y, hann, mask, nperseg: int) -> np.ndarray:
+    """Mean magnitude-squared coherence inside the band mask, per window (Welch, 50 % overlap)"""
+    hop = nperseg // 2
+    xs = np.lib.stride_tricks.sliding_window_view(x, nperseg, axis=1)[:, ::hop]
+    ys = np.lib.stride_tricks.sliding_window_view(y, nperseg, axis=1)[:, ::hop]
+    fx = np.fft.rfft((xs - xs.mean(axis=2, keepdims=True)) * hann, axis=2)[..., mask]
+    fy = np.fft.rfft((ys - ys.mean(axis=2, keepdims=True)) * hann, axis=2)[..., mask]
+    sxy = np.mean(np.conj(fx) * fy, axis=1)
+    sxx = np.mean(np.square(np.abs(fx)), axis=1)
+    syy = np.mean(np.square(np.abs(fy)), axis=1)
+    coherence = np.square(np.abs(sxy)) / np.maximum(sxx * syy, 1e-30)
+    return coherence.mean(axis=1) if coherence.shape[1] else np.zeros(coherence.shape[0])
+
+
+class StreamingCoupling:
+    """Per-window lag / correlation / coherence for one channel pair, updated incrementally"""
+
+    def __init__(self, sample_rate_hz: float, band=(1.0, 40.0), window_s: float = WINDOW_S,
+                 max_lag_s: float = MAX_LAG_S, max_windows: int = MAX_WINDOWS):
+        self.sample_rate_hz = float(sample_rate_hz)
+        self.window = max(int(round(window_s * self.sample_rate_hz)), COHERENCE_NPERSEG)
+        self.max_lag = max(1, int(round(max_lag_s * self.sample_rate_hz)))
+        self.band = tuple(band)
+        self.windows = deque(maxlen=max_windows)
+        self.cursor = 0   # absolute sample index of the next window start
+
+    def update(self, x, y, start_index: int = 0) -> int:
+        """Score all windows that became complete (y needs max_lag samples beyond a window)"""
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        n = min(x.size, y.size)
+        end = start_index + n
+        if self.cursor < start_index + self.max_lag:
+            # Older samples were dropped: restart on the first window with lag history
+            self.cursor = start_index + self.max_lag
+        count = (end - self.max_lag - self.cursor) // self.window
+        if count <= 0:
+            return 0
+        n_fft, hann, mask = _plan(self.window, self.max_lag, self.sample_rate_hz, self.band, COHERENCE_NPERSEG)
+        first = self.cursor - start_index
+        starts = first + np.arange(count) * self.window
+        xw = x[starts[:, None] + np.arange(self.window)]
+        yw = y[starts[:, None] - self.max_lag + np.arange(self.window + 2 * self.max_lag)]
+        corr = correlate_windows(xw, yw, self.window, self.max_lag, n_fft)
+        best = np.argmax(np.abs(corr), axis=1)
+        peak = corr[np.arange(count), best]
+        coherence = band_coherence(xw, yw[:, self.max_lag:self.max_lag + self.window], hann, mask, COHERENCE_NPERSEG)
+        for i in range(count):
+            self.windows.append({
+                "start_s": (self.cursor + i * self.window) / self.sample_rate_hz,
+                "lag_ms": (best[i] - self.max_lag) / self.sample_rate_hz * 1000.0,
+                "correlation": float(peak[i]),
+                "coherence": float(coherence[i]),
+            })
+        self.cursor += count * self.window
+        return count
+
+    def summary(self) -> dict:
+        if not self.windows:
+            return {"windows": 0}
+        corr = np.array([w["correlation"] for w in self.windows])
+        lags = np.array([w["lag_ms"] for w in self.windows])
+        coherence = np.array([w["coherence"] for w in self.windows])
+        strong = np.abs(corr) >= 0.3
+        return {
+            "windows": len(self.windows),
+            "correlation_median": round(float(np.median(np.abs(corr))), 3),
+            "correlation_max": round(float(np.max(np.abs(corr))), 3),
+            "lag_ms_median": round(float(np.median(lags[strong] if strong.any() else lags)), 1),
+            "coherence_median": round(float(np.median(coherence)), 3),
+            "band_hz": list(self.band),
+            "coupled_fraction": round(float(np.mean(strong)), 3),
+        }
+
+
+def subtract_ecg_template(ecg, emg, sample_rate_hz: float, peaks=None) -> np.ndarray:
+    """EMG with the ECG artifact removed: per-beat least-squares scaled median template.
+
+    Templates are medians of the EMG around the R peaks of the previous
+    ARTIFACT_TEMPLATE_BEATS beats (the first block uses its own), so muscle bursts, which are
+    not time-locked to the heart, average out of the template and are kept in the output.
+    """
+    from beat_anomaly import detect_r_peaks
+
+    emg = np.asarray(emg, dtype=np.float64)
+    fs = float(sample_rate_hz)
+    if peaks is None:
+        peaks = detect_r_peaks(ecg, fs)
+    before, after = int(round(ARTIFACT_BEFORE_S * fs)), int(round(ARTIFACT_AFTER_S * fs))
+    peaks = peaks[(peaks >= before) & (peaks + after <= emg.size)]
+    if peaks.size == 0:
+        return emg.copy()
+    offsets = np.arange(-before, after)
+    idx = peaks[:, None] + offsets[None, :]
+    segments = emg[idx]
+    segments = segments - np.median(segments, axis=1, keepdims=True)
+    k = ARTIFACT_TEMPLATE_BEATS
+    n_blocks = -(-peaks.size // k)
+    templates = np.empty((n_blocks, offsets.size))
+    for b in range(n_blocks):
+        source = segments[max(0, (b - 1) * k):b * k] if b else segments[:k]
+        templates[b] = np.median(source, axis=0)
+    per_beat = templates[np.arange(peaks.size) // k]
+    # Fade the template in and out so the subtraction leaves no steps at its edges
+    per_beat = per_beat * np.hanning(offsets.size + 2)[1:-1] ** 0.25
+    scale = np.sum(segments * per_beat, axis=1) / np.maximum(np.sum(per_beat * per_beat, axis=1), 1e-12)
+    cleaned = emg.copy()
+    np.subtract.at(cleaned, idx.ravel(), (scale[:, None] * per_beat).ravel())
+    return cleaned
+
+
+def analyze_coupling(time, channels: dict, pairs=PAIRS, sample_rate_hz: float | None = None) -> dict:
+    """{"Signal1->Signal3": summary, ...} over a whole recording"""
+    fs = sample_rate_hz or estimate_sample_rate(time)
+    result = {}
+    for ref, target, band in pairs:
+        if ref not in channels or target not in channels:
+            continue
+        engine = StreamingCoupling(fs, band)
+        engine.update(channels[ref], channels[target])
+        result[f"{ref}->{target}"] = engine.summary()
+    return result
+
+
+# Coupling cache, keyed by recording path; engines continue from their cursor as data grows
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def get_coupling(filepath: str, time, channels: dict, version=None, start_index: int = 0) -> dict:
+    """Cached per-pair coupling summaries (same version contract as get_exg_digest)"""
+    if version is None:
+        try:
+            st_ = os.stat(filepath)
+            version = (st_.st_mtime_ns, st_.st_size)
+        except OSError:
+            version = None
+    fs = estimate_sample_rate(time)
+    with _cache_lock:
+        entry = _cache.get(filepath)
+        if entry is not None and version is not None and entry["version"] == version:
+            return entry["summary"]
+        arrays = tuple(channels.values())
+        if entry is None or abs(entry["sample_rate_hz"] - fs) > 1e-6 * fs or \
+                not entry["guard"].appended(arrays, start_index):
+            # New, resampled, or rewritten rather than appended to: start over
+            entry = {"engines": {f"{r}->{t}": (r, t, StreamingCoupling(fs, band)) for r, t, band in PAIRS
+                                 if r in channels and t in channels},
+                     "sample_rate_hz": fs, "guard": SourceGuard()}
+            _cache[filepath] = entry
+        for ref, target, engine in entry["engines"].values():
+            engine.update(channels[ref], channels[target], start_index)
+        entry["guard"].remember(arrays, start_index)
+        entry["summary"] = {name: engine.summary() for name, (_, _, engine) in entry["engines"].items()}
+        entry["version"] = version
+        return entry["summary"]
+
+
+def format_coupling(summary: dict) -> str:
+    """One line per pair for captions and LLM context"""
+    lines = []
+    for name, s in summary.items():
+        if not s.get("windows"):
+            continue
+        ref, target = (CHANNEL_ROLES.get(c, c) for c in name.split("->"))
+        lines.append(
+            f"{ref}->{target} coupling: |r| median {s['correlation_median']} (max {s['correlation_max']}), "
+            f"lag {s['lag_ms_median']:+g} ms, coherence {s['coherence_median']} in {s['band_hz'][0]:g}-"
+            f"{s['band_hz'][1]:g} Hz, {round(s['coupled_fraction'] * 100)}% of {s['windows']} windows coupled")
+    return "\n".join(lines) if lines else "Cross-channel coupling: not enough data"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-channel coupling report and ECG artifact removal")
+    parser.add_argument("recording", help=".json (Trible_EXG), .exgbin or .exga with three channels")
+    parser.add_argument("--clean", default=None, help="Write an .exga copy with the ECG removed from Signal3")
+    args = parser.parse_args()
+
+    from exg_archive import ExgArchiveWriter, load_rows
+
+    columns, rows = load_rows(args.recording)
+    channels = {name: rows[:, i] for i, name in enumerate(columns) if i}
+    duration = float(rows[-1, 0] - rows[0, 0]) if len(rows) else 0.0
+    start = clock.perf_counter()
+    summary = analyze_coupling(rows[:, 0], channels)
+    elapsed = clock.perf_counter() - start
+    print(format_coupling(summary))
+    print(f"{duration:.1f} s analysed in {elapsed * 1000:.1f} ms ({duration / max(elapsed, 1e-9):,.0f}x real time)")
+    if args.clean and "Signal1" in channels and "Signal3" in channels:
+        fs = estimate_sample_rate(rows[:, 0])
+        start = clock.perf_counter()
+        cleaned = subtract_ecg_template(channels["Signal1"], channels["Signal3"], fs)
+        elapsed = clock.perf_counter() - start
+        out = rows.copy()
+        out[:, columns.index("Signal3")] = cleaned
+        with ExgArchiveWriter(args.clean, columns) as writer:
+            writer.append(out)
+        after = analyze_coupling(rows[:, 0], {"Signal1": channels["Signal1"], "Signal3": cleaned},
+                                 pairs=PAIRS[:1])
+        print(f"ECG template subtracted from Signal3 in {elapsed * 1000:.1f} ms -> {args.clean}")
+        print("after: " + format_coupling(after))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
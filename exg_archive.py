@@ -0,0 +1,314 @@
+"""
+EXG archive - compressed, chunked long-term storage for recorded sessions
+
+Usage:
+    python exg_archive.py pack Trible_EXG_Signal1.json recordings/session1.exga
+    python exg_archive.py pack output.jsonl recordings/stream.exga --codec zstd --values int16
+    python exg_archive.py info recordings/session1.exga
+
+    with ExgArchive("recordings/session1.exga") as archive:
+        times, values = archive.read_range(2.0, 4.5, channels=["Signal1"])
+
+Layout (little-endian):
+    b"EXGA", uint16 version, uint16 0, uint32 meta length, JSON meta
+    chunk payloads, each compressed on its own
+    chunk table: per chunk float64 t_first, t_last, uint64 offset, uint32 bytes, uint32 rows
+    trailer: uint64 table offset, uint32 chunk count, b"EXGA"
+
+Inside a chunk, timestamps are stored as int32 deltas in ticks of `time_tick_s` (1 us by
+default, so a uniformly sampled recording compresses to almost nothing) and each channel
+as a contiguous block of float32, or uint16 quantised per chunk ("int16", ~4.6 decimal
+digits of the chunk's range) and delta-coded. Value blocks are byte-shuffled before
+compression, which lets zlib/zstd/lz4 find the repeating high bytes of slowly varying
+signals. Only the chunks overlapping a requested time range are read and inflated.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+MAGIC = b"EXGA"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+CHUNK_ENTRY = np.dtype([("t_first", "<f8"), ("t_last", "<f8"), ("offset", "<u8"),
+                        ("nbytes", "<u4"), ("rows", "<u4")])
+TRAILER = struct.Struct("<QI4s")
+DEFAULT_CHUNK_ROWS = 8192
+DEFAULT_TIME_TICK_S = 1e-6
+VALUE_ENCODINGS = ("float32", "int16")
+CODECS = ("zlib", "zstd", "lz4")
+
+
+def _codec(name, level=None):
+    """(compress, decompress) for a codec name; zstd and lz4 are optional dependencies"""
+    if name == "zlib":
+        lvl = 6 if level is None else level
+        return (lambda b: zlib.compress(b, lvl)), zlib.decompress
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("codec 'zstd' needs the zstandard package (pip install zstandard)") from e
+        cctx = zstandard.ZstdCompressor(level=3 if level is None else level)
+        dctx = zstandard.ZstdDecompressor()
+        return cctx.compress, dctx.decompress
+    if name == "lz4":
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ImportError("codec 'lz4' needs the lz4 package (pip install lz4)") from e
+        return (lambda b: lz4.frame.compress(b, compression_level=0 if level is None else level)), \
+            lz4.frame.decompress
+    raise ValueError(f"unknown codec {name!r}; expected one of {CODECS}")
+
+
+def _shuffle(arr):
+    """Group byte i of every element together (arr is 1-D, fixed width)"""
+    return np.ascontiguousarray(arr.view(np.uint8).reshape(-1, arr.itemsize).T).tobytes()
+
+
+def _unshuffle(buf, dtype, n):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(buf, dtype=np.uint8, count=n * dtype.itemsize).reshape(dtype.itemsize, n)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(n)
+
+
+def _encode_chunk(rows, values, time_tick_s):
+    """Serialise one [n, 1 + n_channels] block (before compression)"""
+    t = rows[:, 0]
+    ticks = np.rint((t - t[0]) / time_tick_s).astype(np.int64)
+    deltas = np.diff(ticks, prepend=0)
+    if deltas.size and (deltas.min() < np.iinfo(np.int32).min or deltas.max() > np.iinfo(np.int32).max):
+        raise ValueError("time step too large for the time tick; use a larger time_tick_s")
+    parts = [_shuffle(deltas.astype("<i4"))]
+    data = rows[:, 1:]
+    if values == "float32":
+        parts.extend(_shuffle(data[:, c].astype("<f4")) for c in range(data.shape[1]))
+    else:
+        lo, hi = data.min(axis=0), data.max(axis=0)
+        scale = np.where(hi > lo, (hi - lo) / 65535.0, 1.0)
+        parts.insert(0, np.column_stack([lo, scale]).astype("<f8").tobytes())
+        q = np.rint((data - lo) / scale).astype(np.uint16)
+        for c in range(data.shape[1]):
+            parts.append(_shuffle(np.diff(q[:, c], prepend=np.uint16(0)).astype("<u2")))
+    return b"".join(parts)
+
+
+def _decode_chunk(buf, n, n_channels, t_first, values, time_tick_s):
+    pos = 0
+    if values == "int16":
+        params = np.frombuffer(buf, dtype="<f8", count=2 * n_channels).reshape(n_channels, 2)
+        pos = params.nbytes
+    out = np.empty((n, 1 + n_channels), dtype=np.float64)
+    deltas = _unshuffle(buf[pos:pos + 4 * n], "<i4", n)
+    pos += 4 * n
+    out[:, 0] = t_first + np.cumsum(deltas, dtype=np.int64) * time_tick_s
+    width = 4 if values == "float32" else 2
+    for c in range(n_channels):
+        block = buf[pos:pos + width * n]
+        pos += width * n
+        if values == "float32":
+            out[:, 1 + c] = _unshuffle(block, "<f4", n)
+        else:
+            q = np.cumsum(_unshuffle(block, "<u2", n), dtype=np.uint16)
+            out[:, 1 + c] = params[c, 0] + q * params[c, 1]
+    return out
+
+
+class ExgArchiveWriter:
+    """Buffers rows and writes them as compressed chunks; the file appears on close()"""
+
+    def __init__(self, path, columns, codec="zlib", values="float32",
+                 chunk_rows=DEFAULT_CHUNK_ROWS, time_tick_s=DEFAULT_TIME_TICK_S, level=None):
+        if values not in VALUE_ENCODINGS:
+            raise ValueError(f"unknown value encoding {values!r}; expected one of {VALUE_ENCODINGS}")
+        self.path = path
+        self.columns = list(columns)
+        self.values = values
+        self.chunk_rows = chunk_rows
+        self.time_tick_s = time_tick_s
+        self._compress, _ = _codec(codec, level)
+        self._tmp = path + ".tmp"
+        self._file = open(self._tmp, "wb")
+        meta = json.dumps({"columns": self.columns, "codec": codec, "values": values,
+                           "chunk_rows": chunk_rows, "time_tick_s": time_tick_s}).encode("utf-8")
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, len(meta)) + meta)
+        self._pending = []
+        self._pending_rows = 0
+        self._table = []
+        self.rows = 0
+
+    def append(self, rows):
+        """Append a [k, n_columns] block (time first, non-decreasing)"""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != len(self.columns):
+            raise ValueError(f"expected rows of {len(self.columns)} columns, got shape {rows.shape}")
+        self._pending.append(rows)
+        self._pending_rows += rows.shape[0]
+        if self._pending_rows >= self.chunk_rows:
+            buffered = np.concatenate(self._pending)
+            full = buffered.shape[0] - buffered.shape[0] % self.chunk_rows
+            for offset in range(0, full, self.chunk_rows):
+                self._write_chunk(buffered[offset:offset + self.chunk_rows])
+            self._pending = [buffered[full:]]
+            self._pending_rows = buffered.shape[0] - full
+
+    def _write_chunk(self, rows):
+        payload = self._compress(_encode_chunk(rows, self.values, self.time_tick_s))
+        self._table.append((rows[0, 0], rows[-1, 0], self._file.tell(), len(payload), rows.shape[0]))
+        self._file.write(payload)
+        self.rows += rows.shape[0]
+
+    def close(self):
+        if self._pending_rows:
+            self._write_chunk(np.concatenate(self._pending))
+        self._pending, self._pending_rows = [], 0
+        table_offset = self._file.tell()
+        self._file.write(np.array(self._table, dtype=CHUNK_ENTRY).tobytes())
+        self._file.write(TRAILER.pack(table_offset, len(self._table), MAGIC))
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp)
+
+
+class ExgArchive:
+    """Random-access reader: the chunk table is loaded up front, chunks on demand"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        magic, version, _, meta_len = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an EXG archive (version {VERSION})")
+        meta = json.loads(self._file.read(meta_len))
+        self.columns = meta["columns"]
+        self.codec = meta["codec"]
+        self.values = meta["values"]
+        self.time_tick_s = meta["time_tick_s"]
+        _, self._decompress = _codec(self.codec)
+        self._file.seek(-TRAILER.size, os.SEEK_END)
+        table_offset, n_chunks, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is truncated (no chunk table)")
+        self._file.seek(table_offset)
+        self.chunks = np.frombuffer(self._file.read(n_chunks * CHUNK_ENTRY.itemsize), dtype=CHUNK_ENTRY)
+        self.rows = int(self.chunks["rows"].sum())
+
+    def chunk(self, i):
+        """Decode chunk i into a [rows, n_columns] float64 array"""
+        entry = self.chunks[i]
+        self._file.seek(int(entry["offset"]))
+        buf = self._decompress(self._file.read(int(entry["nbytes"])))
+        return _decode_chunk(buf, int(entry["rows"]), len(self.columns) - 1,
+                             float(entry["t_first"]), self.values, self.time_tick_s)
+
+    def read_all(self, channels=None):
+        """(times, values) for the whole recording"""
+        return self._split(np.concatenate([self.chunk(i) for i in range(len(self.chunks))])
+                           if len(self.chunks) else np.empty((0, len(self.columns))), channels)
+
+    def read_range(self, t0, t1, channels=None):
+        """(times, values) with t0 <= time <= t1, inflating only the overlapping chunks"""
+        first = int(np.searchsorted(self.chunks["t_last"], t0, side="left"))
+        last = int(np.searchsorted(self.chunks["t_first"], t1, side="right"))
+        if first >= last:
+            return self._split(np.empty((0, len(self.columns))), channels)
+        rows = np.concatenate([self.chunk(i) for i in range(first, last)])
+        t = rows[:, 0]
+        i, j = int(np.searchsorted(t, t0, side="left")), int(np.searchsorted(t, t1, side="right"))
+        return self._split(rows[i:j], channels)
+
+    def _split(self, rows, channels):
+        from recording_index import _channel_indices
+
+        return rows[:, 0], rows[:, _channel_indices(self.columns, channels)]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_rows(path):
+    """Read any supported recording (.exgbin, .exga, .jsonl, Trible_EXG JSON) into (columns, [n, n_columns] rows)"""
+    if path.endswith(".exga"):
+        with ExgArchive(path) as archive:
+            times, values = archive.read_all()
+            return archive.columns, np.column_stack([times, values])
+    if path.endswith(".exgbin"):
+        from exg_store import open_store
+
+        columns, rows = open_store(path)
+        return columns, np.asarray(rows)
+    if path.endswith(".jsonl"):
+        from jsonl_decode import load_jsonl_arrays
+
+        return ["time", "value"], np.column_stack(load_jsonl_arrays(path))
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    channels = [k for k in ("Signal1", "Signal2", "Signal3") if k in data]
+    arrays = [np.asarray(data[k], dtype=np.float64) for k in channels]
+    n = min(a.size for a in arrays)
+    times = data.get("Time")
+    t = np.asarray(times, dtype=np.float64)[:n] if isinstance(times, list) and len(times) >= n \
+        else np.arange(n, dtype=np.float64)
+    return ["time"] + channels, np.column_stack([t] + [a[:n] for a in arrays])
+
+
+def pack(src, dst, codec="zlib", values="float32", chunk_rows=DEFAULT_CHUNK_ROWS):
+    columns, rows = load_rows(src)
+    with ExgArchiveWriter(dst, columns, codec=codec, values=values, chunk_rows=chunk_rows) as writer:
+        writer.append(rows)
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack recordings into compressed chunked archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_p = sub.add_parser("pack", help="Archive a Trible_EXG JSON, JSONL or .exgbin recording")
+    pack_p.add_argument("src")
+    pack_p.add_argument("dst")
+    pack_p.add_argument("--codec", choices=CODECS, default="zlib")
+    pack_p.add_argument("--values", choices=VALUE_ENCODINGS, default="float32",
+                        help="float32, or int16 = uint16 quantised to each chunk's range")
+    pack_p.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    info_p = sub.add_parser("info", help="Describe an archive")
+    info_p.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        os.makedirs(os.path.dirname(args.dst) or ".", exist_ok=True)
+        rows = pack(args.src, args.dst, args.codec, args.values, args.chunk_rows)
+        src_size, dst_size = os.path.getsize(args.src), os.path.getsize(args.dst)
+        print(f"{rows:,} rows: {src_size:,} -> {dst_size:,} bytes ({src_size / max(dst_size, 1):.1f}x smaller, "
+              f"{dst_size / max(rows, 1):.2f} bytes/row)")
+        return 0
+    with ExgArchive(args.path) as archive:
+        size = os.path.getsize(args.path)
+        print(f"{args.path}: {archive.rows:,} rows x {archive.columns}, {len(archive.chunks)} chunks, "
+              f"{archive.codec}/{archive.values}, {size:,} bytes ({size / max(archive.rows, 1):.2f} bytes/row)")
+        if archive.rows:
+            print(f"time {archive.chunks['t_first'][0]:.6f} .. {archive.chunks['t_last'][-1]:.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
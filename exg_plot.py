@@ -0,0 +1,76 @@
+"""
+EXG plot - canvas time-series component for dense multi-channel traces
+
+    from exg_plot import exg_plot
+    view = exg_plot(time, {"Signal1": ecg, "Signal2": eog, "Signal3": emg}, key="exg")
+
+Samples go to the browser as raw little-endian buffers (float64 time relative to the first
+sample, float32 channels) rather than as a JSON/Vega dataset. The frontend
+(components/exg_plot/index.html, plain JS on a 2D canvas, bundled - no build step or
+network access) reduces each visible pixel column to its min/max, so drawing cost depends on
+the plot width, not the sample count. Wheel zoom, drag pan and the crosshair are linked
+across the channels; double-click goes back to following the newest data.
+"""
+
+import os
+
+import numpy as np
+import streamlit.components.v1 as components
+
+_COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "exg_plot")
+_component = components.declare_component("exg_plot", path=_COMPONENT_DIR)
+
+
+def minmax_decimate(time, values, max_points: int):
+    """Reduce [n] time and [n, channels] values to <= max_points rows, keeping each bucket's extremes.
+
+    Buckets of equal sample count each become two rows: the bucket's min and max per
+    channel (in time order), stamped with the bucket's first and last times.
+    """
+    t = np.asarray(time, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64).reshape(t.size, -1)
+    buckets = max_points // 2
+    if buckets < 1 or t.size <= max_points:
+        return t, v
+    size = -(-t.size // buckets)
+    n_full = t.size // size
+    full = v[:n_full * size].reshape(n_full, size, v.shape[1])
+    lo, hi = full.argmin(axis=1), full.argmax(axis=1)
+    first, second = np.minimum(lo, hi), np.maximum(lo, hi)
+    rows = np.arange(n_full)[:, None]
+    out_v = np.stack([full[rows, first, np.arange(v.shape[1])], full[rows, second, np.arange(v.shape[1])]], axis=1)
+    starts = np.arange(n_full) * size
+    out_t = np.column_stack([t[starts], t[starts + size - 1]])
+    out_t, out_v = out_t.reshape(-1), out_v.reshape(-1, v.shape[1])
+    if n_full * size < t.size:
+        tail_t, tail_v = t[n_full * size:], v[n_full * size:]
+        out_t = np.concatenate((out_t, tail_t[[0, -1]]))
+        out_v = np.concatenate((out_v, np.stack([tail_v.min(axis=0), tail_v.max(axis=0)])))
+    return out_t, out_v
+
+
+def exg_plot(time, channels: dict, height: int = 220, colors=None, y_domains=None,
+             max_points: int | None = None, key: str | None = None):
+    """Stacked, linked canvas plots of channels (name -> samples) against time.
+
+    max_points bounds what is sent to the browser per channel via min/max decimation
+    (None sends every sample; the browser decimates per pixel either way). Returns the
+    zoomed [t0, t1] window in the caller's time units, or None while following the data.
+    """
+    names = list(channels)
+    n = min([len(time)] + [len(channels[name]) for name in names])
+    t = np.asarray(time[:n], dtype=np.float64)
+    v = np.column_stack([np.asarray(channels[name][:n], dtype=np.float64) for name in names]) \
+        if names else np.empty((n, 0))
+    if max_points is not None:
+        t, v = minmax_decimate(t, v, max_points)
+    t0 = float(t[0]) if t.size else 0.0
+    time_bytes = (t - t0).astype("<f8").tobytes()
+    values_bytes = np.ascontiguousarray(v.T, dtype="<f4").tobytes()
+    # Lets the frontend skip re-decoding when a rerun sends the same samples again
+    data_key = f"{t.size}:{t0!r}:{float(t[-1]) if t.size else 0.0!r}:{hash(values_bytes[-4096:])}"
+    return _component(
+        time=time_bytes, values=values_bytes, n=int(t.size), t0=t0, names=names,
+        colors=list(colors) if colors else None, domains=list(y_domains) if y_domains else None,
+        height=height, data_key=data_key, key=key, default=None,
+    )
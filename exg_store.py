@@ -0,0 +1,92 @@
+"""
+EXG store - append-only binary recording (float64 rows: time + channels) with a JSON sidecar
+
+    recording.exgbin       raw little-endian float64 rows, preallocated ahead of the writer
+    recording.exgbin.json  {"columns": [...], "rows": N, "dtype": "<f8"} - rows actually written
+
+The data file grows in doubling steps (ftruncate), so appending n rows costs O(n) total
+instead of the O(n^2) copy of `Dev2_1 = [Dev2_1; data]` in the MATLAB script. Readers
+trust the sidecar's row count, never the file size, so they never see the zero padding.
+"""
+
+import json
+import os
+
+import numpy as np
+
+DTYPE = np.dtype("<f8")
+SIDECAR_SUFFIX = ".json"
+
+
+def _sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+
+def read_sidecar(path):
+    with open(_sidecar_path(path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_sidecar(path, meta):
+    tmp = _sidecar_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _sidecar_path(path))
+
+
+class ExgStoreWriter:
+    """Appends rows to a store, resuming an existing one with the same columns"""
+
+    def __init__(self, path, columns, initial_rows=1 << 16):
+        self.path = path
+        self.columns = list(columns)
+        self.row_bytes = len(self.columns) * DTYPE.itemsize
+        self.rows = 0
+        if os.path.exists(path) and os.path.exists(_sidecar_path(path)):
+            meta = read_sidecar(path)
+            if meta["columns"] != self.columns:
+                raise ValueError(f"{path} has columns {meta['columns']}, expected {self.columns}")
+            self.rows = int(meta["rows"])
+            self._file = open(path, "r+b")
+        else:
+            self._file = open(path, "w+b")
+        self.capacity = max(os.fstat(self._file.fileno()).st_size // self.row_bytes, self.rows)
+        self._reserve(max(initial_rows, self.rows))
+        self.flush()
+
+    def _reserve(self, rows_needed):
+        if rows_needed <= self.capacity:
+            return
+        capacity = max(self.capacity, 1)
+        while capacity < rows_needed:
+            capacity *= 2
+        self._file.truncate(capacity * self.row_bytes)
+        self.capacity = capacity
+
+    def append(self, rows):
+        """Append a [k, n_columns] block"""
+        rows = np.ascontiguousarray(rows, dtype=DTYPE)
+        if rows.ndim != 2 or rows.shape[1] != len(self.columns):
+            raise ValueError(f"expected rows of {len(self.columns)} columns, got shape {rows.shape}")
+        self._reserve(self.rows + rows.shape[0])
+        self._file.seek(self.rows * self.row_bytes)
+        self._file.write(rows.tobytes())
+        self.rows += rows.shape[0]
+
+    def flush(self):
+        """Make appended rows visible to readers"""
+        self._file.flush()
+        _write_sidecar(self.path, {"columns": self.columns, "rows": self.rows, "dtype": DTYPE.str})
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def open_store(path):
+    """Return (columns, rows) where rows is a read-only memmap of the committed rows"""
+    meta = read_sidecar(path)
+    n_rows, columns = int(meta["rows"]), meta["columns"]
+    if n_rows == 0:
+        return columns, np.empty((0, len(columns)), dtype=DTYPE)
+    return columns, np.memmap(path, dtype=DTYPE, mode="r", shape=(n_rows, len(columns)))
@@ -0,0 +1,35 @@
+function exg_stream_sender(host, port, duration_s)
+% Stream ECG/EOG/EMG blocks from the NI DAQ to acquisition_bridge.py
+%   exg_stream_sender("127.0.0.1", 5555, 20)
+% Same wiring as GirlHacks_ECG_EMG_EOG.m (Dev2 ai0 = ECG, ai1 = EOG, ai2 = EMG), but each
+% block is sent as one frame instead of being appended to a growing table and replotted.
+% Frame: "EXGB", uint16 version 1, uint16 channels, uint32 samples, then double rows
+% [time ch1 ch2 ch3] (little-endian).
+
+if nargin < 1, host = "127.0.0.1"; end
+if nargin < 2, port = 5555; end
+if nargin < 3, duration_s = 20; end
+
+d = daq("ni");
+addinput(d,"Dev2","ai0","Voltage");
+addinput(d,"Dev2","ai1","Voltage");
+addinput(d,"Dev2","ai2","Voltage");
+n = ceil(d.Rate/10);
+
+client = tcpclient(host, port);
+cleanup = onCleanup(@() stop(d));
+
+t = tic;
+start(d,"continuous")
+while toc(t) < duration_s
+    data = read(d,n);
+    rows = [seconds(data.Time), data.Dev2_ai0, data.Dev2_ai1, data.Dev2_ai2];
+    write(client, uint8('EXGB'));
+    write(client, typecast(uint16([1 3]), 'uint8'));
+    write(client, typecast(uint32(size(rows,1)), 'uint8'));
+    % Row-major: transpose so each sample's [time ch1 ch2 ch3] is contiguous
+    write(client, typecast(reshape(rows.', 1, []), 'uint8'));
+end
+stop(d)
+clear client
+end
@@ -0,0 +1,363 @@
+"""
+Feature index - persistent vector index of per-window EXG features for "find similar sessions" queries
+
+Usage:
+    python feature_index.py add Trible_EXG_Signal1.json recordings/*.exga
+    python feature_index.py similar Trible_EXG_Signal1.json --k 5        # sessions
+    python feature_index.py windows Trible_EXG_Signal1.json --at 10 --k 10
+    python feature_index.py bench --rows 200000
+
+Every WINDOW_S window of a recording becomes one vector: the signal_summary window features
+(HR, blink and EMG activation rates, EMG RMS, relative band powers) plus compute_metrics
+std/RMS/dominant frequency of each channel. Vectors are z-scored with index-wide statistics.
+A session is the mean and std of its windows.
+
+Search is exact (one matrix product plus argpartition) below IVF_MIN_ROWS rows. Above that,
+an IVF index is used: k-means centroids (about sqrt(n) lists) trained in NumPy, with rows
+stored grouped by list. A query scans only the rows of its `nprobe` nearest lists and re-ranks
+them exactly; rows added since training are kept in a tail that is always scanned.
+Everything is saved to FEATURE_INDEX_PATH (one .npz, replaced atomically).
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time as clock
+
+import numpy as np
+
+from signal_data import compute_metrics
+from signal_summary import BANDS_HZ, CHANNEL_ROLES, ExgSummarizer, estimate_sample_rate
+
+INDEX_PATH = os.getenv("FEATURE_INDEX_PATH", os.path.join(".cache", "feature_index.npz"))
+IVF_MIN_ROWS = 20_000
+NPROBE = 8
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE = 50_000
+# Retrain the IVF lists once this fraction of rows was added after training
+RETRAIN_FRACTION = 0.2
+
+FEATURE_NAMES = (
+    ["hr_bpm", "blink_rate", "activation_rate", "emg_rms", "emg_rms_max"]
+    + [f"{role}_band_{lo:g}_{hi:g}" for role in CHANNEL_ROLES.values() for lo, hi in BANDS_HZ]
+    + [f"{role}_{m}" for role in CHANNEL_ROLES.values() for m in ("std", "rms", "dominant_freq_hz")]
+)
+
+
+def window_features(time, ecg, eog, emg) -> tuple[np.ndarray, np.ndarray]:
+    """(vectors [windows, len(FEATURE_NAMES)] float32, window start times)"""
+    t = np.asarray(time, dtype=np.float64)
+    fs = estimate_sample_rate(t)
+    summarizer = ExgSummarizer(fs)
+    summarizer.update(ecg, eog, emg)
+    rows, starts = [], []
+    channels = [np.asarray(a, dtype=np.float64) for a in (ecg, eog, emg)]
+    for w in summarizer.windows:
+        minutes = w["n"] / fs / 60.0
+        s = slice(w["start"], w["start"] + w["n"])
+        metrics = [compute_metrics(c[s] - np.mean(c[s]), fs) for c in channels]
+        rows.append(
+            [w["hr_bpm"], w["blink_rate"], w["activations"] / minutes if minutes else 0.0, w["emg_rms"], w["emg_rms_max"]]
+            + [float(v) for role in CHANNEL_ROLES.values() for v in w["bands"][role]]
+            + [m[k] for m in metrics for k in ("std", "rms", "dominant_freq_hz")]
+        )
+        starts.append(t[w["start"]] if w["start"] < t.size else 0.0)
+    return np.asarray(rows, dtype=np.float32).reshape(-1, len(FEATURE_NAMES)), np.asarray(starts, dtype=np.float64)
+
+
+def _squared_distances(x, q, x_norms=None):
+    """[n, m] squared L2 distances between rows of x and of q"""
+    if x_norms is None:
+        x_norms = np.einsum("ij,ij->i", x, x)
+    return np.maximum(x_norms[:, None] - 2.0 * (x @ q.T) + np.einsum("ij,ij->i", q, q)[None, :], 0.0)
+
+
+def _top_k(distances, k):
+    """Indices of the k smallest entries per column, sorted"""
+    k = min(k, distances.shape[0])
+    part = np.argpartition(distances, k - 1, axis=0)[:k]
+    order = np.take_along_axis(distances, part, axis=0).argsort(axis=0)
+    return np.take_along_axis(part, order, axis=0)
+
+
+def _group_sums(labels, x, n_groups: int) -> np.ndarray:
+    """[n_groups, d] per-label column sums (one bincount per column, much faster than np.add.at)"""
+    return np.stack([np.bincount(labels, weights=x[:, j], minlength=n_groups) for j in range(x.shape[1])], axis=1)
+
+
+def kmeans(x, n_clusters: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0, chunk: int = 65_536):
+    """Lloyd's k-means seeded on random distinct rows; returns the centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(x.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.concatenate([_squared_distances(centroids, x[i:i + chunk]).argmin(axis=0)
+                                 for i in range(0, x.shape[0], chunk)])
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = _group_sums(labels, x, n_clusters)
+        empty = counts == 0
+        centroids[~empty] = (sums[~empty] / counts[~empty, None]).astype(centroids.dtype)
+        # Re-seed empty clusters on random rows so every list stays useful
+        centroids[empty] = x[rng.choice(x.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+class FeatureIndex:
+    """Window vectors of many sessions with exact and IVF k-NN search"""
+
+    def __init__(self, path: str | None = INDEX_PATH):
+        self.path = path
+        self.raw = np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+        self.sessions = np.empty(0, dtype=np.int32)     # session number per row
+        self.starts = np.empty(0, dtype=np.float64)     # window start time per row
+        self.session_names: list[str] = []
+        self.session_versions: list = []
+        self._reset_derived()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _reset_derived(self):
+        self.mean = self.scale = None
+        self.vectors = None          # z-scored rows
+        self.norms = None
+        self.centroids = None
+        self.list_offsets = None     # CSR over rows sorted by list: rows list_rows[o[i]:o[i+1]]
+        self.list_rows = None
+        self.trained_rows = 0
+
+    # -- persistence -------------------------------------------------------
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as z:
+            self.raw, self.sessions, self.starts = z["raw"], z["sessions"], z["starts"]
+            meta = json.loads(str(z["meta"]))
+            if "centroids" in z.files:
+                self.centroids, self.list_offsets, self.list_rows = z["centroids"], z["list_offsets"], z["list_rows"]
+                self.trained_rows = int(meta["trained_rows"])
+                self.mean, self.scale = z["mean"], z["scale"]
+        self.session_names, self.session_versions = meta["sessions"], meta["versions"]
+        if self.mean is None:
+            self._standardise()
+        else:
+            self.vectors = (self.raw - self.mean) / self.scale
+            self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        arrays = {"raw": self.raw, "sessions": self.sessions, "starts": self.starts,
+                  "meta": np.array(json.dumps({"sessions": self.session_names, "versions": self.session_versions,
+                                               "trained_rows": self.trained_rows, "features": FEATURE_NAMES}))}
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows,
+                          mean=self.mean, scale=self.scale)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self.path)
+
+    # -- building ----------------------------------------------------------
+    def _standardise(self):
+        if self.raw.shape[0] == 0:
+            self.vectors = self.raw.copy()
+            self.norms = np.empty(0, dtype=np.float32)
+            return
+        self.mean = self.raw.mean(axis=0)
+        self.scale = np.where(self.raw.std(axis=0) > 1e-9, self.raw.std(axis=0), 1.0).astype(np.float32)
+        self.vectors = ((self.raw - self.mean) / self.scale).astype(np.float32)
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    def add(self, name: str, vectors, starts, version=None) -> None:
+        """Add (or replace) one session's window vectors"""
+        with self._lock:
+            if name in self.session_names:
+                self._remove(self.session_names.index(name))
+            self.session_names.append(name)
+            self.session_versions.append(version)
+            number = len(self.session_names) - 1
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, len(FEATURE_NAMES))
+            self.raw = np.concatenate((self.raw, vectors))
+            self.sessions = np.concatenate((self.sessions, np.full(len(vectors), number, dtype=np.int32)))
+            self.starts = np.concatenate((self.starts, np.asarray(starts, dtype=np.float64)))
+            if self.centroids is None:
+                self._standardise()
+            else:
+                # Keep the trained scaling; new rows go to the IVF tail until the next retrain
+                new = ((vectors - self.mean) / self.scale).astype(np.float32)
+                self.vectors = np.concatenate((self.vectors, new))
+                self.norms = np.concatenate((self.norms, np.einsum("ij,ij->i", new, new)))
+
+    def _remove(self, number: int) -> None:
+        keep = self.sessions != number
+        self.raw, self.sessions, self.starts = self.raw[keep], self.sessions[keep], self.starts[keep]
+        self.sessions[self.sessions > number] -= 1
+        del self.session_names[number]
+        del self.session_versions[number]
+        self._reset_derived()
+        self._standardise()
+
+    def train(self, n_lists: int | None = None) -> None:
+        """(Re)build the IVF lists over all rows"""
+        with self._lock:
+            self._standardise()
+            n = self.vectors.shape[0]
+            if n < 2:
+                return
+            n_lists = n_lists or max(1, int(np.sqrt(n)))
+            rng = np.random.default_rng(0)
+            sample = self.vectors[rng.choice(n, min(n, KMEANS_SAMPLE), replace=False)]
+            self.centroids = kmeans(sample, min(n_lists, sample.shape[0]))
+            labels = np.concatenate([_squared_distances(self.centroids, self.vectors[i:i + 65_536]).argmin(axis=0)
+                                     for i in range(0, n, 65_536)])
+            self.list_rows = np.argsort(labels, kind="stable").astype(np.int64)
+            self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=len(self.centroids)))))
+            self.trained_rows = n
+
+    @property
+    def rows(self) -> int:
+        return int(self.raw.shape[0])
+
+    # -- search ------------------------------------------------------------
+    def _prepare(self, queries):
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return ((q - self.mean) / self.scale).astype(np.float32) if self.mean is not None else q
+
+    def search(self, queries, k: int = 10, exact: bool | None = None, nprobe: int = NPROBE):
+        """(row indices [m, k], squared distances [m, k]) of the nearest windows to raw query vectors"""
+        q = self._prepare(queries)
+        n = self.rows
+        if n == 0:
+            return np.empty((q.shape[0], 0), dtype=np.int64), np.empty((q.shape[0], 0))
+        if exact is None:
+            exact = n < IVF_MIN_ROWS
+        if not exact and (self.centroids is None or n - self.trained_rows > RETRAIN_FRACTION * max(self.trained_rows, 1)):
+            self.train()
+            q = self._prepare(queries)
+        if exact:
+            d = _squared_distances(self.vectors, q, self.norms)
+            top = _top_k(d, k)
+            return top.T, np.take_along_axis(d, top, axis=0).T
+        probes = _top_k(_squared_distances(self.centroids, q), nprobe).T
+        tail = np.arange(self.trained_rows, n)
+        out_idx = np.empty((q.shape[0], min(k, n)), dtype=np.int64)
+        out_d = np.empty(out_idx.shape)
+        for j in range(q.shape[0]):
+            candidates = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes[j]]
+                                        + [tail])
+            d = _squared_distances(self.vectors[candidates], q[j:j + 1], self.norms[candidates])[:, 0]
+            kk = min(k, d.size)
+            best = np.argpartition(d, kk - 1)[:kk] if kk else np.empty(0, dtype=np.int64)
+            best = best[np.argsort(d[best])]
+            out_idx[j, :kk], out_d[j, :kk] = candidates[best], d[best]
+            out_idx[j, kk:], out_d[j, kk:] = -1, np.inf
+        return out_idx, out_d
+
+    def session_vectors(self):
+        """(names, [sessions, 2 * features]) mean and std of each session's z-scored windows"""
+        counts = np.bincount(self.sessions, minlength=len(self.session_names)).astype(np.float64)
+        sums = _group_sums(self.sessions, self.vectors, len(self.session_names))
+        squares = _group_sums(self.sessions, np.square(self.vectors, dtype=np.float64), len(self.session_names))
+        safe = np.maximum(counts, 1.0)[:, None]
+        mean = sums / safe
+        std = np.sqrt(np.maximum(squares / safe - mean ** 2, 0.0))
+        return list(self.session_names), np.hstack([mean, std]).astype(np.float32)
+
+    def similar_sessions(self, name: str, k: int = 5) -> list[tuple[str, float]]:
+        """Sessions closest to an indexed session (exact; there are few sessions)"""
+        names, vectors = self.session_vectors()
+        if name not in names:
+            raise KeyError(f"session {name!r} is not indexed")
+        i = names.index(name)
+        d = _squared_distances(vectors, vectors[i:i + 1])[:, 0]
+        d[i] = np.inf
+        order = np.argsort(d)[:k]
+        return [(names[j], float(np.sqrt(d[j]))) for j in order if np.isfinite(d[j])]
+
+    def describe(self, rows) -> list[dict]:
+        return [{"session": self.session_names[self.sessions[r]], "start_s": round(float(self.starts[r]), 3)}
+                for r in np.asarray(rows).ravel() if r >= 0]
+
+
+def index_recording(path: str, index: FeatureIndex) -> int:
+    """Add a recording's windows unless the same version is already indexed; returns windows added"""
+    from exg_archive import load_rows
+
+    name = os.path.abspath(path)
+    st_ = os.stat(path)
+    version = [st_.st_mtime_ns, st_.st_size]
+    if name in index.session_names and index.session_versions[index.session_names.index(name)] == version:
+        return 0
+    columns, rows = load_rows(path)
+    channels = [rows[:, columns.index(c)] if c in columns else np.zeros(len(rows)) for c in CHANNEL_ROLES]
+    vectors, starts = window_features(rows[:, 0], *channels)
+    index.add(name, vectors, starts, version)
+    return len(vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index EXG window features and find similar sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add_p = sub.add_parser("add", help="Index recordings (.json, .exgbin, .exga)")
+    add_p.add_argument("recordings", nargs="+")
+    sim_p = sub.add_parser("similar", help="Sessions most similar to an indexed recording")
+    sim_p.add_argument("recording")
+    sim_p.add_argument("--k", type=int, default=5)
+    win_p = sub.add_parser("windows", help="Windows most similar to one window of a recording")
+    win_p.add_argument("recording")
+    win_p.add_argument("--at", type=float, default=0.0, help="Window start time of the query window")
+    win_p.add_argument("--k", type=int, default=10)
+    bench_p = sub.add_parser("bench", help="Time exact vs IVF queries on synthetic vectors")
+    bench_p.add_argument("--rows", type=int, default=100_000)
+    bench_p.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        rng = np.random.default_rng(0)
+        centres = rng.normal(0, 3, (200, len(FEATURE_NAMES)))
+        data = centres[rng.integers(0, 200, args.rows)] + rng.normal(0, 1, (args.rows, len(FEATURE_NAMES)))
+        index = FeatureIndex(path=None)
+        index.add("synthetic", data, np.arange(args.rows, dtype=float))
+        start = clock.perf_counter()
+        index.train()
+        print(f"trained {len(index.centroids)} lists over {args.rows:,} rows in {clock.perf_counter() - start:.2f} s")
+        queries = data[rng.integers(0, args.rows, args.queries)] + rng.normal(0, 0.1, (args.queries, data.shape[1]))
+        results = {}
+        for exact in (True, False):
+            start = clock.perf_counter()
+            results[exact] = np.vstack([index.search(q, 10, exact=exact)[0] for q in queries])
+            per_query = (clock.perf_counter() - start) / args.queries * 1000.0
+            print(f"{'exact' if exact else 'ivf':>5}: {per_query:.2f} ms per query")
+        recall = np.mean([len(set(a) & set(b)) / 10.0 for a, b in zip(results[True], results[False])])
+        print(f"ivf recall@10 vs exact: {recall:.3f}")
+        return 0
+
+    index = FeatureIndex()
+    if args.command == "add":
+        for path in args.recordings:
+            added = index_recording(path, index)
+            print(f"{path}: {added} windows" if added else f"{path}: already indexed")
+        index.save()
+        print(f"{index.rows:,} windows from {len(index.session_names)} sessions in {INDEX_PATH}")
+        return 0
+    if index_recording(args.recording, index):
+        index.save()
+    name = os.path.abspath(args.recording)
+    if args.command == "similar":
+        for other, distance in index.similar_sessions(name, args.k):
+            print(f"{distance:8.3f}  {other}")
+        return 0
+    own = np.flatnonzero(index.sessions == index.session_names.index(name))
+    if own.size == 0:
+        print("recording has no complete window")
+        return 1
+    row = own[np.argmin(np.abs(index.starts[own] - args.at))]
+    rows, distances = index.search(index.raw[row], args.k + 1)
+    for r, d in zip(rows[0], distances[0]):
+        if r != row and r >= 0:
+            print(f"{np.sqrt(d):8.3f}  {json.dumps(index.describe([r])[0])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
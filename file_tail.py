@@ -0,0 +1,39 @@
+"""
+File tail - the last complete lines of a file, read backwards so the cost does not grow with its size
+
+    lines = tail_lines("output.jsonl", 100)     # [b'{"timestamp": ...}', ...] oldest first
+
+Used by segmented_output (stream tails, sealing segments) and chat_log (newest chat messages).
+"""
+
+import os
+
+# Bytes read per step when scanning backwards
+TAIL_BLOCK = 64 * 1024
+
+
+def tail_lines(path: str, n: int) -> list[bytes]:
+    """Last n complete, non-blank lines of a file (fewer if it is shorter; [] if unreadable).
+
+    A last line without its newline is still being written (or was torn by a crash) and is
+    left out.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return []
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        buf = b""
+        pos = end
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.split(b"\n")
+    # Drop a partially written last line; a partial first line is only kept at file start
+    lines = lines[:-1]
+    if pos > 0:
+        lines = lines[1:]
+    return [line for line in lines if line.strip()][-n:]
@@ -0,0 +1,194 @@
+"""
+Instrumentation module - per-stage timings (p50/p95/p99) for the Streamlit pages
+
+Turn it on for the whole process with SIGNAL_PROFILE=1, or for one page run with
+`with profiling(True):` (the page does this for ?debug=1). When off, timed() wrappers cost
+a global and a context-variable lookup and stage() returns a shared no-op context manager.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+ENABLED = os.getenv('SIGNAL_PROFILE', '').lower() not in ('', '0', 'false', 'no')
+# Most recent samples kept per stage (percentiles are computed over this window)
+MAX_SAMPLES = 2048
+TIMINGS_DIR = os.getenv('SIGNAL_TIMINGS_DIR', '.cache')
+
+# Profiling switched on for the current context only (one Streamlit script run and the
+# work it hands to threads with contextvars.copy_context())
+_context_enabled = contextvars.ContextVar('instrumentation_enabled', default=False)
+
+_samples = {}
+_counts = {}
+_lock = threading.Lock()
+
+
+def enable(on=True):
+    """Switch profiling on or off for the whole process"""
+    global ENABLED
+    ENABLED = bool(on)
+
+
+def is_enabled():
+    return ENABLED or _context_enabled.get()
+
+
+@contextlib.contextmanager
+def profiling(on=True):
+    """Profile the enclosed block (e.g. one page run) without touching other sessions"""
+    token = _context_enabled.set(bool(on))
+    try:
+        yield
+    finally:
+        _context_enabled.reset(token)
+
+
+def record(stage_name, seconds):
+    """Add one duration sample for a stage"""
+    with _lock:
+        buf = _samples.get(stage_name)
+        if buf is None:
+            buf = _samples[stage_name] = deque(maxlen=MAX_SAMPLES)
+            _counts[stage_name] = 0
+        buf.append(seconds)
+        _counts[stage_name] += 1
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    """Context manager timing a block: `with stage("chart.signal1"): ...`"""
+    return _Timer(name) if ENABLED or _context_enabled.get() else _NULL_TIMER
+
+
+def timed(name=None):
+    """Decorator timing every call of a function under `name` (default: its qualified name).
+
+    Generator functions are timed over the whole iteration, and the delay until the first
+    item is recorded separately as `<name>.first_chunk` (time-to-first-token for LLM streams).
+    """
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                if not (ENABLED or _context_enabled.get()):
+                    return (yield from fn(*args, **kwargs))
+                start = time.perf_counter()
+                first = True
+                try:
+                    for item in fn(*args, **kwargs):
+                        if first:
+                            record(label + '.first_chunk', time.perf_counter() - start)
+                            first = False
+                        yield item
+                finally:
+                    record(label, time.perf_counter() - start)
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not (ENABLED or _context_enabled.get()):
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Per-stage statistics in milliseconds, slowest total first"""
+    with _lock:
+        items = [(k, np.fromiter(v, dtype=float, count=len(v)), _counts[k]) for k, v in _samples.items()]
+    rows = []
+    for stage_name, values, count in items:
+        if values.size == 0:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000.0
+        rows.append({
+            "stage": stage_name,
+            "count": count,
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(values.max()) * 1000.0, 3),
+            "mean_ms": round(float(values.mean()) * 1000.0, 3),
+        })
+    rows.sort(key=lambda r: r["mean_ms"] * r["count"], reverse=True)
+    return rows
+
+
+def export(filepath):
+    """Write the current statistics to a JSON file and return its path"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(timespec='seconds'),
+            "max_samples_per_stage": MAX_SAMPLES,
+            "stages": snapshot(),
+        }, f, ensure_ascii=False, indent=2)
+    return filepath
+
+
+def render_debug_panel():
+    """Sidebar panel with the stage table plus reset/export controls"""
+    import streamlit as st
+
+    with st.sidebar.expander("Debug: stage timings", expanded=False):
+        rows = snapshot()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No timings recorded yet.")
+        col_reset, col_export = st.columns(2)
+        if col_reset.button("Reset", key="instrumentation_reset", use_container_width=True):
+            reset()
+        if col_export.button("Export", key="instrumentation_export", use_container_width=True):
+            os.makedirs(TIMINGS_DIR, exist_ok=True)
+            path = export(os.path.join(TIMINGS_DIR, f"timings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
+            st.caption(f"Saved to {path}")
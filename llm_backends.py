@@ -0,0 +1,329 @@
+"""
+LLM backends - one interface for every model the AI handler can talk to, chosen by config
+
+    backend = create_backend()                       # AI_BACKEND=gemini | local_api | mock
+    for chunk in backend.stream(prompt, temperature=0.7, max_tokens=512):
+        ...
+
+A backend turns a rendered prompt into text chunks. stream() yields the chunks and
+complete() returns the joined text. AIHandler does the rest (context packing, Streamlit
+output), so it is the same object whichever backend is configured. Register new backends
+with @register_backend("name").
+
+The mock backend needs no network. It streams deterministic tokens (the same prompt and
+seed always give the same text) after a configurable time to first token, at a
+configurable rate, and it fails a configurable fraction of requests. Caching, pooling and
+concurrency changes can therefore be measured offline and reproducibly:
+
+    AI_BACKEND=mock AI_MOCK_TTFT_MS=400 AI_MOCK_TOKENS_PER_S=40 streamlit run chatbot-ai.py
+    python llm_backends.py --backend mock --requests 64 --concurrency 4
+"""
+
+import abc
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+
+import numpy as np
+
+DEFAULT_BACKEND = os.getenv('AI_BACKEND', 'gemini')
+DEFAULT_LOCAL_API_URL = 'http://127.0.0.1:7860/api/v1/run/99354137-3d2e-402e-aba1-a954067bf60b'
+
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Class decorator: make a backend available to create_backend() under name"""
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def create_backend(name=None, **options):
+    """Backend instance for name (default: AI_BACKEND), options passed to its constructor"""
+    name = name or DEFAULT_BACKEND
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown AI backend {name!r} (use one of {', '.join(sorted(BACKENDS))})") from None
+    return cls(**options)
+
+
+@cache
+def _load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+class LLMBackend(abc.ABC):
+    """Interface: stream(prompt, temperature, max_tokens) yields text chunks"""
+
+    name = None
+    notice = None   # message for the user about a fallback the backend made (shown once by AIHandler)
+
+    @abc.abstractmethod
+    def stream(self, prompt, temperature=0.7, max_tokens=4096):
+        """Yield the response to prompt as text chunks"""
+
+    def complete(self, prompt, temperature=0.7, max_tokens=4096):
+        return "".join(self.stream(prompt, temperature, max_tokens))
+
+    def set_model(self, model):
+        pass
+
+
+@cache
+def _genai():
+    """Gemini SDK and .env, loaded on first use so pages that never call the AI start fast"""
+    _load_env()
+    import google.generativeai as genai
+    return genai
+
+
+@register_backend('gemini')
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google.generativeai"""
+
+    def __init__(self, model=None, api_key=None):
+        genai = _genai()
+        # Require Gemini key from environment only; no hardcoded fallback
+        api_key = api_key or os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY (or GOOGLE_API_KEY) is not set. "
+                               "Please add it to your environment or .env file.")
+        genai.configure(api_key=api_key)
+        # Default to a broadly available model; allow override via env
+        self.model_name = self._resolve_supported_model(model or os.getenv('GEMINI_MODEL', 'gemini-pro'))
+
+    def set_model(self, model):
+        self.model_name = model
+
+    def _generate(self, prompt, temperature, max_tokens, stream):
+        genai = _genai()
+        return genai.GenerativeModel(self.model_name).generate_content(
+            prompt,
+            generation_config=genai.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens),
+            stream=stream,
+        )
+
+    def stream(self, prompt, temperature=0.7, max_tokens=4096):
+        for chunk in self._generate(prompt, temperature, max_tokens, stream=True):
+            yield chunk.text
+
+    def complete(self, prompt, temperature=0.7, max_tokens=4096):
+        return self._generate(prompt, temperature, max_tokens, stream=False).text
+
+    def _resolve_supported_model(self, requested_model: str) -> str:
+        """Return a model name that exists and supports text generation.
+        Falls back through known-good defaults if needed.
+        """
+        try:
+            models = list(_genai().list_models())
+        except Exception:
+            # If listing fails, just return the requested (SDK may still work)
+            return requested_model
+
+        def is_text_model(m) -> bool:
+            methods = getattr(m, 'supported_generation_methods', None)
+            if not methods:
+                return False
+            return ('generateContent' in methods) or ('generate_content' in methods)
+
+        names = {m.name: m for m in models}
+        if requested_model in names and is_text_model(names[requested_model]):
+            return requested_model
+
+        # common fallbacks by availability (start with basic gemini-pro)
+        for candidate in ['gemini-pro', 'models/gemini-pro', 'gemini-1.5-flash', 'models/gemini-1.5-flash']:
+            if candidate in names and is_text_model(names[candidate]):
+                if candidate != requested_model:
+                    self.notice = f"Requested model '{requested_model}' not available. Falling back to '{candidate}'."
+                return candidate
+
+        # If nothing matched, return requested and let API raise a clear error
+        return requested_model
+
+
+@cache
+def _requests():
+    """requests and .env, loaded on first use"""
+    _load_env()
+    import requests
+    return requests
+
+
+@register_backend('local_api')
+class LocalAPIBackend(LLMBackend):
+    """Local flow API (LOCAL_API_URL); non-streaming, so the answer arrives as one chunk"""
+
+    def __init__(self, url=None, timeout_s=30.0):
+        _requests()
+        self.api_url = url or os.getenv('LOCAL_API_URL', DEFAULT_LOCAL_API_URL)
+        self.timeout_s = timeout_s
+
+    def stream(self, prompt, temperature=0.7, max_tokens=4096):
+        yield self.complete(prompt, temperature, max_tokens)
+
+    def complete(self, prompt, temperature=0.7, max_tokens=4096):
+        requests = _requests()
+        payload = {"input_value": prompt, "output_type": "chat", "input_type": "chat"}
+        try:
+            response = requests.post(self.api_url, json=payload, headers={"Content-Type": "application/json"},
+                                     timeout=self.timeout_s)
+            response.raise_for_status()
+            response_data = response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Local API request failed: {str(e)}")
+        except ValueError as e:
+            raise Exception(f"Failed to parse API response: {str(e)}")
+        # Extract text from response (adjust key based on your API response structure)
+        if isinstance(response_data, dict):
+            for key in ['text', 'response', 'output', 'result', 'content']:
+                if key in response_data:
+                    return str(response_data[key])
+        return str(response_data)
+
+    def test_connection(self):
+        """(ok, message) after sending a short test prompt"""
+        try:
+            self.complete("Hello, this is a test message.")
+            return True, "Connection successful"
+        except Exception as e:
+            return False, f"Connection failed: {str(e)}"
+
+
+class MockBackendError(RuntimeError):
+    """Injected failure from the mock backend"""
+
+
+_MOCK_WORDS = (
+    "signal heart rate rhythm muscle activity baseline noise filter electrode skin contact rest "
+    "breathing recovery training sleep hydration posture movement artifact amplitude frequency "
+    "steady elevated normal consider check try keep monitor reduce increase gently session "
+    "minutes today the your a and with after before during more less"
+).split()
+
+
+@register_backend('mock')
+class MockBackend(LLMBackend):
+    """Offline backend with injected latency and failures; the text depends only on prompt and seed.
+
+    ttft_s: delay before the first token
+    tokens_per_s: streaming rate after the first token
+    error_rate: fraction of requests that fail. Each failure happens either before the first
+        token or mid-stream, and the pattern repeats for the same seed and request order.
+    tokens: response length (capped by max_tokens)
+    """
+
+    def __init__(self, ttft_s=None, tokens_per_s=None, error_rate=None, tokens=None, seed=None,
+                 sleep=time.sleep, clock=time.monotonic):
+        env = os.getenv
+        self.ttft_s = float(env('AI_MOCK_TTFT_MS', '300')) / 1000.0 if ttft_s is None else ttft_s
+        self.tokens_per_s = float(env('AI_MOCK_TOKENS_PER_S', '50')) if tokens_per_s is None else tokens_per_s
+        self.error_rate = float(env('AI_MOCK_ERROR_RATE', '0')) if error_rate is None else error_rate
+        self.tokens = int(env('AI_MOCK_TOKENS', '64')) if tokens is None else tokens
+        self.seed = int(env('AI_MOCK_SEED', '0')) if seed is None else seed
+        self.model_name = 'mock'
+        self._sleep = sleep
+        self._clock = clock
+        self._faults = random.Random(self.seed)
+        self._faults_lock = threading.Lock()
+        self.requests = 0
+
+    def set_model(self, model):
+        self.model_name = model
+
+    def response_tokens(self, prompt, max_tokens=4096):
+        """The tokens stream() yields for this prompt (no delays)"""
+        digest = hashlib.blake2b(f"{self.seed}\0{prompt}".encode('utf-8'), digest_size=8).digest()
+        rng = np.random.default_rng(int.from_bytes(digest, 'little'))
+        n = max(min(self.tokens, max_tokens), 1)
+        words = [_MOCK_WORDS[i] for i in rng.integers(0, len(_MOCK_WORDS), n)]
+        return [w + (". " if (i + 1) % 12 == 0 or i == n - 1 else " ") for i, w in enumerate(words)]
+
+    def stream(self, prompt, temperature=0.7, max_tokens=4096):
+        tokens = self.response_tokens(prompt, max_tokens)
+        with self._faults_lock:
+            self.requests += 1
+            fail_at = self._faults.randrange(len(tokens)) if self._faults.random() < self.error_rate else None
+        # Absolute schedule, so slow consumers don't stretch the nominal rate
+        start = self._clock()
+        interval = 1.0 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        for i, token in enumerate(tokens):
+            delay = start + self.ttft_s + i * interval - self._clock()
+            if delay > 0:
+                self._sleep(delay)
+            if i == fail_at:
+                raise MockBackendError(f"injected failure after {i} tokens")
+            yield token
+
+
+def run_benchmark(backend, n_requests=32, concurrency=4, prompt_tokens=200):
+    """Send n_requests distinct prompts, concurrency at a time; latency percentiles and throughput"""
+    def one(i):
+        prompt = f"request {i}: " + " ".join(_MOCK_WORDS[(i + j) % len(_MOCK_WORDS)] for j in range(prompt_tokens))
+        start = time.perf_counter()
+        first, tokens = None, 0
+        try:
+            for chunk in backend.stream(prompt):
+                if first is None:
+                    first = time.perf_counter() - start
+                tokens += len(chunk.split())
+        except Exception:
+            return None
+        return first, time.perf_counter() - start, tokens
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - start
+    ok = [r for r in results if r is not None and r[0] is not None]
+    ttft = np.array([r[0] for r in ok]) * 1000.0
+    total = np.array([r[1] for r in ok]) * 1000.0
+
+    def pct(a, q):
+        return round(float(np.percentile(a, q)), 1) if a.size else 0.0
+
+    return {
+        "backend": backend.name,
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": n_requests - len(ok),
+        "ttft_p50_ms": pct(ttft, 50),
+        "ttft_p95_ms": pct(ttft, 95),
+        "latency_p50_ms": pct(total, 50),
+        "latency_p95_ms": pct(total, 95),
+        "tokens_per_s": round(sum(r[2] for r in ok) / wall, 1) if wall > 0 else 0.0,
+        "requests_per_s": round(len(ok) / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput of an LLM backend")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=sorted(BACKENDS))
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--ttft-ms", type=float, default=None, help="mock: time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=None, help="mock: streaming rate")
+    parser.add_argument("--error-rate", type=float, default=None, help="mock: fraction of failed requests")
+    parser.add_argument("--seed", type=int, default=None, help="mock: text and failure seed")
+    args = parser.parse_args()
+
+    options = {}
+    if args.backend == 'mock':
+        options = {"ttft_s": None if args.ttft_ms is None else args.ttft_ms / 1000.0,
+                   "tokens_per_s": args.tokens_per_s, "error_rate": args.error_rate, "seed": args.seed}
+    report = run_benchmark(create_backend(args.backend, **options), args.requests, args.concurrency)
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
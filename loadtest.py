@@ -0,0 +1,187 @@
+"""
+Load test - simulates many concurrent Signal Insights viewers headlessly
+
+Usage:
+    python loadtest.py --sessions 1,5,10,25,50 --duration 20
+
+For every session count N, N Streamlit AppTest sessions rerun pages/1_Signal_Insights.py at
+the page's refresh rate (10/s) while `simulation.py --stream` appends to a scratch JSONL
+file. AppTest executes the script in this process, so the CPU and RSS measured here are
+the "server" cost. The LLM is an AIHandler on the mock backend (llm_backends), seeded into
+each session's state so get_ai_handler() never builds a real client.
+
+AppTest swaps a process-global Runtime in and out around every run, so runs are
+serialised with a lock. That matches a single server process, where reruns are
+GIL-bound anyway; the reported latency includes time spent queued for the lock, which
+is what a viewer experiences as the load grows.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+PAGE_PATH = os.path.join("pages", "1_Signal_Insights.py")
+_RUN_LOCK = threading.Lock()
+
+
+def _mock_ai_handler():
+    """AIHandler on the offline mock backend: 20 tokens, 50 ms to the first, 20 tokens/s after"""
+    from ai_handler import AIHandler
+    from llm_backends import MockBackend
+
+    return AIHandler(MockBackend(ttft_s=0.05, tokens_per_s=20.0, error_rate=0.0, tokens=20))
+
+
+def _rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        # Linux fallback: resident pages from /proc
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _share_script_cache():
+    """Make every AppTest session reuse one compiled copy of the page.
+
+    AppTest builds a fresh ScriptCache per run and so recompiles the script each time,
+    while the real server shares one cache across sessions. Sharing it here keeps the
+    measured rerun cost realistic.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    shared = ScriptCache()
+    get_bytecode = ScriptCache.get_bytecode
+    ScriptCache.get_bytecode = lambda self, script_path: get_bytecode(shared, script_path)
+
+
+def _new_session():
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(PAGE_PATH, default_timeout=60)
+    app.session_state["ai_handler"] = _mock_ai_handler()
+    return app
+
+
+def _session_loop(app, period_s, stop_at, ai_every, stats):
+    """Rerun one session on a fixed schedule; ticks missed while a rerun overran count as dropped"""
+    latencies, dropped, errors = [], 0, 0
+    reruns = 0
+    next_tick = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if now >= stop_at:
+            break
+        if now < next_tick:
+            time.sleep(next_tick - now)
+        start = time.perf_counter()
+        try:
+            with _RUN_LOCK:
+                if ai_every and reruns and reruns % ai_every == 0:
+                    button = next(b for b in app.button if b.label == "Generate Suggestions")
+                    button.click().run()
+                else:
+                    app.run()
+            if app.exception:
+                errors += 1
+        except Exception:
+            errors += 1
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        reruns += 1
+        missed = max(int((min(time.perf_counter(), stop_at) - next_tick) // period_s), 0)
+        dropped += missed
+        next_tick += period_s * (missed + 1)
+    stats.append({"latencies": latencies, "dropped": dropped, "errors": errors})
+
+
+def run_level(n_sessions, duration_s, rate_hz, ai_every):
+    rss_before = _rss_mb()
+    sessions = [_new_session() for _ in range(n_sessions)]
+    for app in sessions:
+        app.run()  # warm up: imports, caches, first render
+    rss_after_warmup = _rss_mb()
+
+    stats = []
+    period_s = 1.0 / rate_hz
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    stop_at = wall_start + duration_s
+    threads = [
+        threading.Thread(target=_session_loop, args=(app, period_s, stop_at, ai_every, stats), daemon=True)
+        for app in sessions
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = np.array([lat for s in stats for lat in s["latencies"]]) * 1000.0
+    expected = n_sessions * duration_s * rate_hz
+    dropped = sum(s["dropped"] for s in stats)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies.size else (0.0, 0.0, 0.0)
+    return {
+        "sessions": n_sessions,
+        "reruns": int(latencies.size),
+        "expected_reruns": int(expected),
+        "dropped": int(dropped),
+        "dropped_pct": 100.0 * dropped / expected if expected else 0.0,
+        "errors": sum(s["errors"] for s in stats),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()) if latencies.size else 0.0,
+        "cpu_pct": 100.0 * cpu / wall,
+        "rss_mb": _rss_mb(),
+        "mb_per_session": (rss_after_warmup - rss_before) / n_sessions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load test for the Signal Insights page")
+    parser.add_argument("--sessions", default="1,5,10,25", help="Comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per level")
+    parser.add_argument("--rate", type=float, default=10.0, help="Reruns per second per session (page uses 10)")
+    parser.add_argument("--ai-every", type=int, default=0,
+                        help="Click 'Generate Suggestions' every N reruns per session (0 = never)")
+    parser.add_argument("--stream-interval", type=float, default=0.01,
+                        help="simulation.py --interval for the live feed")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="signal_loadtest_")
+    stream_path = os.path.join(workdir, "stream.jsonl")
+    os.environ["SIGNAL_STREAM_PATH"] = stream_path
+    os.environ["SIGNAL_INSIGHTS_REFRESH_S"] = "0"
+    feeder = subprocess.Popen(
+        [sys.executable, "simulation.py", "--stream", "--interval", str(args.stream_interval),
+         "--outfile", stream_path],
+        stdout=subprocess.DEVNULL,
+    )
+    _share_script_cache()
+    try:
+        time.sleep(1.0)  # let the feed write a first batch
+        _new_session().run()  # import everything once so MB/session measures sessions, not modules
+        print(f"{'sessions':>8s} {'reruns':>8s} {'dropped%':>9s} {'errors':>6s} {'p50 ms':>8s} {'p95 ms':>8s} "
+              f"{'p99 ms':>8s} {'max ms':>8s} {'cpu%':>6s} {'MB/sess':>8s} {'RSS MB':>8s}")
+        for n in [int(s) for s in args.sessions.split(",") if s.strip()]:
+            r = run_level(n, args.duration, args.rate, args.ai_every)
+            print(f"{r['sessions']:8d} {r['reruns']:8d} {r['dropped_pct']:9.1f} {r['errors']:6d} {r['p50_ms']:8.1f} "
+                  f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['max_ms']:8.1f} {r['cpu_pct']:6.0f} "
+                  f"{r['mb_per_session']:8.1f} {r['rss_mb']:8.0f}", flush=True)
+    finally:
+        feeder.terminate()
+        feeder.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,249 +1,108 @@
 import os
-import json
 import time
-from collections import deque
 import numpy as np
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timezone
 from ai_handler import get_ai_handler
-import pandas as pd
-import altair as alt
+from ai_worker import submit_ai_request
+from signal_summary import estimate_sample_rate, get_exg_digest, format_digest
+from beat_anomaly import format_anomalies, get_anomalies
+from cross_channel import format_coupling, get_coupling
+from signal_quality import format_quality, get_uniform_series, uniform_metrics
+from signal_data import (
+    format_metrics_text,
+    load_message_from_json,
+    load_signal1_from_json,
+    load_signal2_from_json,
+    load_signal3_from_json,
+)
+from segmented_output import load_last_n, tail_version
+from shared_ring import ExgRing
+import instrumentation
+from instrumentation import stage
+from exg_plot import exg_plot
+from spectrogram import get_spectrogram, render_image
+from stream_pipeline import render_status_panel
 
 
 st.set_page_config(page_title="Signal Insights", page_icon="📈", layout="wide")
 
-DATA_JSON_PATH = "Trible_EXG_Signal1.json"
-
-def generate_signal(sample_rate_hz: int, duration_s: float, freq_hz: float, noise_std: float) -> tuple[np.ndarray, np.ndarray]:
-    num_samples = int(sample_rate_hz * duration_s)
-    t = np.linspace(0, duration_s, num_samples, endpoint=False)
-    clean = np.sin(2 * np.pi * freq_hz * t)
-    noise = np.random.normal(0.0, noise_std, size=num_samples)
-    signal = clean + noise
-    return t, signal
-
-
-def compute_metrics(signal: np.ndarray, sample_rate_hz: int) -> dict:
-    mean_val = float(np.mean(signal))
-    std_val = float(np.std(signal))
-    peak_to_peak = float(np.max(signal) - np.min(signal))
-    rms = float(np.sqrt(np.mean(np.square(signal))))
-    # simple dominant freq via FFT
-    freqs = np.fft.rfftfreq(len(signal), d=1.0 / sample_rate_hz)
-    spectrum = np.abs(np.fft.rfft(signal))
-    dom_idx = int(np.argmax(spectrum[1:]) + 1) if len(spectrum) > 1 else 0
-    dominant_freq_hz = float(freqs[dom_idx]) if dom_idx < len(freqs) else 0.0
-    return {
-        "mean": mean_val,
-        "std": std_val,
-        "peak_to_peak": peak_to_peak,
-        "rms": rms,
-        "dominant_freq_hz": dominant_freq_hz,
-    }
-
-
-def format_metrics_text(metrics: dict) -> str:
-    return (
-        f"Signal Statistics\n"
-        f"- Mean: {metrics['mean']:.4f}\n"
-        f"- Std Dev: {metrics['std']:.4f}\n"
-        f"- Peak-to-Peak: {metrics['peak_to_peak']:.4f}\n"
-        f"- RMS: {metrics['rms']:.4f}\n"
-        f"- Dominant Freq: {metrics['dominant_freq_hz']:.2f} Hz\n"
-    )
-
-
-def load_first_n_jsonl(filepath: str, n: int = 100) -> tuple[list[datetime], list[float]]:
-    times: list[datetime] = []
-    values: list[float] = []
-    if not os.path.exists(filepath):
-        return times, values
-    count = 0
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            if count >= n:
-                break
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                ts_raw = obj.get("timestamp")
-                val_raw = obj.get("value")
-                if ts_raw is None or val_raw is None:
-                    continue
-                ts = datetime.fromisoformat(str(ts_raw).replace("Z", "+00:00"))
-                val = float(val_raw)
-                times.append(ts)
-                values.append(val)
-                count += 1
-            except (json.JSONDecodeError, ValueError, TypeError):
-                continue
-    return times, values
-
-
-def load_last_n_jsonl(filepath: str, n: int = 100) -> tuple[list[datetime], list[float]]:
-    times: list[datetime] = []
-    values: list[float] = []
-    if not os.path.exists(filepath) or n <= 0:
-        return times, values
-    buffer: deque[str] = deque(maxlen=n)
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    buffer.append(line)
-    except OSError:
-        return times, values
-    for line in buffer:
-        try:
-            obj = json.loads(line)
-            ts_raw = obj.get("timestamp")
-            val_raw = obj.get("value")
-            if ts_raw is None or val_raw is None:
-                continue
-            ts = datetime.fromisoformat(str(ts_raw).replace("Z", "+00:00"))
-            val = float(val_raw)
-            times.append(ts)
-            values.append(val)
-        except (json.JSONDecodeError, ValueError, TypeError):
-            continue
-    return times, values
-
-
-def load_signal1_from_json(filepath: str) -> tuple[list[float], list[float]]:
-    """Load Time and Signal1 arrays from a JSON file with structure:
-    {
-      "Segment": 1,
-      "Message": "...",
-      "Time": [ ... ],
-      "Signal1": [ ... ],
-      "Signal2": [ ... ],
-      "Signal3": [ ... ]
-    }
-
-    Returns (time_list, signal1_list). If Time is missing or invalid,
-    a simple index [0..N-1] will be used for the x-axis.
-    """
-    time_list: list[float] = []
-    signal_list: list[float] = []
-    if not os.path.exists(filepath):
-        return time_list, signal_list
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        raw_times = data.get("Time")
-        raw_values = data.get("Signal1")
-        if isinstance(raw_values, list):
-            # Convert to floats where possible
-            try:
-                signal_list = [float(v) for v in raw_values]
-            except (TypeError, ValueError):
-                signal_list = []
-        if isinstance(raw_times, list) and len(raw_times) == len(signal_list):
-            try:
-                time_list = [float(t) for t in raw_times]
-            except (TypeError, ValueError):
-                time_list = list(range(len(signal_list)))
-        else:
-            time_list = list(range(len(signal_list)))
-    except (OSError, json.JSONDecodeError):
-        return [], []
-    return time_list, signal_list
-
-def load_signal2_from_json(filepath: str) -> tuple[list[float], list[float]]:
-    """Load Time and Signal2 arrays from a JSON file with structure:
-    {
-      "Segment": 1,
-      "Message": "...",
-      "Time": [ ... ],
-      "Signal1": [ ... ],
-      "Signal2": [ ... ],
-      "Signal3": [ ... ]
-    }
-
-    Returns (time_list, signal2_list). If Time is missing or invalid,
-    a simple index [0..N-1] will be used for the x-axis.
-    """
-    time_list: list[float] = []
-    signal_list: list[float] = []
-    if not os.path.exists(filepath):
-        return time_list, signal_list
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        raw_times = data.get("Time")
-        raw_values = data.get("Signal2")
-        if isinstance(raw_values, list):
-            # Convert to floats where possible
-            try:
-                signal_list = [float(v) for v in raw_values]
-            except (TypeError, ValueError):
-                signal_list = []
-        if isinstance(raw_times, list) and len(raw_times) == len(signal_list):
-            try:
-                time_list = [float(t) for t in raw_times]
-            except (TypeError, ValueError):
-                time_list = list(range(len(signal_list)))
-        else:
-            time_list = list(range(len(signal_list)))
-    except (OSError, json.JSONDecodeError):
-        return [], []
-    return time_list, signal_list
-def load_signal3_from_json(filepath: str) -> tuple[list[float], list[float]]:
-    """Load Time and Signal1 arrays from a JSON file with structure:
-    {
-      "Segment": 1,
-      "Message": "...",
-      "Time": [ ... ],
-      "Signal1": [ ... ],
-      "Signal2": [ ... ],
-      "Signal3": [ ... ]
-    }
-
-    Returns (time_list, signal1_list). If Time is missing or invalid,
-    a simple index [0..N-1] will be used for the x-axis.
-    """
-    time_list: list[float] = []
-    signal_list: list[float] = []
-    if not os.path.exists(filepath):
-        return time_list, signal_list
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        raw_times = data.get("Time")
-        raw_values = data.get("Signal3")
-        if isinstance(raw_values, list):
-            # Convert to floats where possible
-            try:
-                signal_list = [float(v) for v in raw_values]
-            except (TypeError, ValueError):
-                signal_list = []
-        if isinstance(raw_times, list) and len(raw_times) == len(signal_list):
-            try:
-                time_list = [float(t) for t in raw_times]
-            except (TypeError, ValueError):
-                time_list = list(range(len(signal_list)))
-        else:
-            time_list = list(range(len(signal_list)))
-    except (OSError, json.JSONDecodeError):
-        return [], []
-    return time_list, signal_list
+DATA_JSON_PATH = os.getenv("EXG_DATA_PATH", "Trible_EXG_Signal1.json")
+STREAM_JSONL_PATH = os.getenv("SIGNAL_STREAM_PATH", "output.jsonl")
+# Seconds between automatic reruns; 0 disables them (benchmarks and load tests drive reruns themselves)
+REFRESH_INTERVAL_S = float(os.getenv("SIGNAL_INSIGHTS_REFRESH_S", "0.1"))
+# Optional shared-memory rings filled by `python shared_ring.py` (one decode for all viewers)
+SIGNAL_SHM_NAME = os.getenv("SIGNAL_SHM_NAME")
+EXG_SHM_NAME = os.getenv("EXG_SHM_NAME")
+# "canvas" (bundled exg_plot component, linked zoom, dense data) or "altair" (previous Vega charts)
+PLOT_BACKEND = os.getenv("SIGNAL_PLOT", "canvas")
+
 
+@st.cache_resource(show_spinner=False)
+def attach_shared_ring(name: str) -> ExgRing:
+    """One read-only attachment per server process, shared by every session"""
+    return ExgRing.attach(name)
 
-def load_message_from_json(filepath: str) -> str:
-    """Load the 'Message' field from the given JSON file. Returns empty string if missing."""
-    if not os.path.exists(filepath):
-        return ""
+
+def shared_ring(name: str | None) -> ExgRing | None:
+    if not name:
+        return None
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        msg = data.get("Message")
-        return str(msg) if msg is not None else ""
-    except (OSError, json.JSONDecodeError, UnicodeDecodeError):
-        return ""
+        ring = attach_shared_ring(name)
+        if ring.replaced():
+            # Ingest restarted and recreated the block (or stopped); drop the orphaned handle
+            attach_shared_ring.clear(name)
+            ring = attach_shared_ring(name)
+        return ring
+    except (FileNotFoundError, ValueError):
+        # Ingest process not started yet; fall back to reading the files
+        return None
+
+
+def render_canvas_plot(exg_time, exg_values1, exg_values2, exg_values3) -> None:
+    n = min(len(exg_values1), len(exg_values2), len(exg_values3))
+    if n == 0:
+        st.info(f"No data found in {DATA_JSON_PATH} or 'Signal1'/'Signal2'/'Signal3' missing.")
+        return
+    x_vals = exg_time if len(exg_time) >= n else np.arange(n)
+    with stage("exg_plot"):
+        exg_plot(
+            x_vals,
+            {"Signal1": exg_values1, "Signal2": exg_values2, "Signal3": exg_values3},
+            height=320,
+            colors=["#1f77b4", "#E28312", "#2ca02c"],
+            y_domains=[[2.4, 2.45], None, None],
+            key="exg_plot",
+        )
+
+
+def render_spectrogram(exg_time, channels: dict, exg_version) -> None:
+    """Live STFT image of one channel (frames computed only for new hops, cached per recording)"""
+    st.markdown("**Spectrogram**")
+    name = st.radio("Channel", list(channels), horizontal=True, key="spectrogram_channel",
+                    label_visibility="collapsed")
+    samples = channels[name]
+    if len(samples) < 256:
+        st.info("Not enough samples for a spectrogram yet.")
+        return
+    sample_rate = estimate_sample_rate(exg_time)
+    with stage("spectrogram"):
+        stft = get_spectrogram(
+            DATA_JSON_PATH, name, samples, sample_rate,
+            version=exg_version,
+            start_index=exg_version[1] - len(samples) if exg_version is not None else 0,
+        )
+        times, freqs, power = stft.frames()
+        # ECG/EOG energy sits well below 100 Hz; EMG spreads up to a few hundred Hz
+        max_freq = 500.0 if name == "Signal3" else 100.0
+        image = render_image(times, freqs, power, max_freq_hz=max_freq)
+    st.image(image, use_container_width=True, clamp=True,
+             caption=f"{name}: 0-{min(max_freq, sample_rate / 2):g} Hz (bottom to top), "
+                     f"{times[0]:.1f}-{times[-1]:.1f} s, {stft.nperseg}-sample window")
+
 
 def main() -> None:
+    rerun_start = time.perf_counter()
     st.markdown("#### Signal Insights")
 
     with st.sidebar:
@@ -254,7 +113,31 @@ def main() -> None:
         noise_std = st.slider("Noise Std Dev", 0.0, 1.0, 0.2, step=0.05)
 
     # Load latest data once (shared by chart and textual explanation)
-    times, values = load_last_n_jsonl("output.jsonl", n=100)
+    stream_ring = shared_ring(SIGNAL_SHM_NAME)
+    stream_version = None
+    if stream_ring is not None:
+        ring_times, ring_values, stream_version = stream_ring.latest(100, with_version=True)
+        times = [datetime.fromtimestamp(t, tz=timezone.utc) for t in ring_times.tolist()]
+        values = ring_values[:, 0].tolist()
+        stream_t = ring_times
+    else:
+        # Versioned before reading, so rows appended meanwhile only make the next rerun recompute
+        stream_version = tail_version(STREAM_JSONL_PATH)
+        times, values = load_last_n(STREAM_JSONL_PATH, n=100)
+        stream_t = np.array([t.timestamp() for t in times], dtype=float)
+
+    # Three EXG channels: a consistent copy from shared memory, or parsed from the JSON file.
+    # exg_version is the ring's (generation, total) for those rows; None for the file
+    exg_ring = shared_ring(EXG_SHM_NAME)
+    exg_version = None
+    if exg_ring is not None:
+        exg_time1, ring_signals, exg_version = exg_ring.latest(with_version=True)
+        exg_time2 = exg_time3 = exg_time1
+        exg_values1, exg_values2, exg_values3 = ring_signals.T
+    else:
+        exg_time1, exg_values1 = load_signal1_from_json(DATA_JSON_PATH)
+        exg_time2, exg_values2 = load_signal2_from_json(DATA_JSON_PATH)
+        exg_time3, exg_values3 = load_signal3_from_json(DATA_JSON_PATH)
 
     # layout: three columns
     col_chart, col_text, col_ai = st.columns([2, 1.2, 1.6], gap="large")
@@ -262,77 +145,89 @@ def main() -> None:
     # section 1: line chart
     with col_chart:
         st.markdown("**Signal Plot**")
-        exg_time1, exg_values1 = load_signal1_from_json(DATA_JSON_PATH)
-        if exg_values1:
-            # Use provided Time if valid; otherwise fallback to index
-            x_vals = exg_time1 if exg_time1 else list(range(len(exg_values1)))
-            df_plot = pd.DataFrame({"x": x_vals, "y": exg_values1})
-            chart = (
-                alt.Chart(df_plot)
-                .mark_line(color="#1f77b4")
-                .encode(
-                    x=alt.X("x:Q", title="Time"),
-                    y=alt.Y("y:Q", title="Signal1", scale=alt.Scale(domain=[2.4, 2.45])),
-                )
-                .properties(height=320)
-            )
-            st.altair_chart(chart, use_container_width=True)
+        if PLOT_BACKEND == "canvas":
+            render_canvas_plot(exg_time1, exg_values1, exg_values2, exg_values3)
         else:
-            st.info(f"No data found in {DATA_JSON_PATH} or 'Signal1' missing.")
+            import pandas as pd
+            import altair as alt
+
+            if len(exg_values1):
+                # Use provided Time if valid; otherwise fallback to index
+                x_vals = exg_time1 if len(exg_time1) else list(range(len(exg_values1)))
+                with stage("dataframe.signal1"):
+                    df_plot = pd.DataFrame({"x": x_vals, "y": exg_values1})
+                chart = (
+                    alt.Chart(df_plot)
+                    .mark_line(color="#1f77b4")
+                    .encode(
+                        x=alt.X("x:Q", title="Time"),
+                        y=alt.Y("y:Q", title="Signal1", scale=alt.Scale(domain=[2.4, 2.45])),
+                    )
+                    .properties(height=320)
+                )
+                with stage("altair_chart.signal1"):
+                    st.altair_chart(chart, use_container_width=True)
+            else:
+                st.info(f"No data found in {DATA_JSON_PATH} or 'Signal1' missing.")
             
-        # Add Signal2 chart under Signal1
-        # exg_time2, exg_values2 = load_signal2_from_json("Trible_EXG_Signal1.json")
-        # if exg_values2:
-        #     x2 = exg_time2 if exg_time2 else list(range(len(exg_values2)))
-        #     df2 = pd.DataFrame({"x": x2, "y": exg_values2})
-        #     chart2 = (
-        #         alt.Chart(df2)
-        #         .mark_line(color="#E28312")
-        #         .encode(
-        #             x=alt.X("x:Q", title="Time"),
-        #             y=alt.Y("y:Q", title="Signal2", scale=alt.Scale(domain=[2.0, 4.0])),
-        #         )
-        #         .properties(height=320)
-        #     )
-        #     st.altair_chart(chart2, use_container_width=True)
-        # else:
-        #     st.info("No data found in Trible_EXG_Signal1.json or 'Signal2' missing.")
-
-        # Add Signal2 chart under Signal1
-        exg_time2, exg_values2 = load_signal2_from_json(DATA_JSON_PATH)
-        if exg_values2:
-            x2 = exg_time2 if exg_time2 else list(range(len(exg_values2)))
-            df2 = pd.DataFrame({"x": x2, "y": exg_values2})
-            chart2 = (
-                alt.Chart(df2)
-                .mark_line(color="#E28312")
-                .encode(
-                    x=alt.X("x:Q", title="Time"),
-                    y=alt.Y("y:Q", title="Signal2"),
+            # Add Signal2 chart under Signal1
+            # exg_time2, exg_values2 = load_signal2_from_json("Trible_EXG_Signal1.json")
+            # if exg_values2:
+            #     x2 = exg_time2 if exg_time2 else list(range(len(exg_values2)))
+            #     df2 = pd.DataFrame({"x": x2, "y": exg_values2})
+            #     chart2 = (
+            #         alt.Chart(df2)
+            #         .mark_line(color="#E28312")
+            #         .encode(
+            #             x=alt.X("x:Q", title="Time"),
+            #             y=alt.Y("y:Q", title="Signal2", scale=alt.Scale(domain=[2.0, 4.0])),
+            #         )
+            #         .properties(height=320)
+            #     )
+            #     st.altair_chart(chart2, use_container_width=True)
+            # else:
+            #     st.info("No data found in Trible_EXG_Signal1.json or 'Signal2' missing.")
+
+            # Add Signal2 chart under Signal1
+            if len(exg_values2):
+                x2 = exg_time2 if len(exg_time2) else list(range(len(exg_values2)))
+                with stage("dataframe.signal2"):
+                    df2 = pd.DataFrame({"x": x2, "y": exg_values2})
+                chart2 = (
+                    alt.Chart(df2)
+                    .mark_line(color="#E28312")
+                    .encode(
+                        x=alt.X("x:Q", title="Time"),
+                        y=alt.Y("y:Q", title="Signal2"),
+                    )
+                    .properties(height=320)
                 )
-                .properties(height=320)
-            )
-            st.altair_chart(chart2, use_container_width=True)
-        else:
-            st.info(f"No data found in {DATA_JSON_PATH} or 'Signal2' missing.")
-
-        # Add Signal3 chart under Signal2
-        exg_time3, exg_values3 = load_signal3_from_json(DATA_JSON_PATH)
-        if exg_values3:
-            x3 = exg_time3 if exg_time3 else list(range(len(exg_values3)))
-            df3 = pd.DataFrame({"x": x3, "y": exg_values3})
-            chart3 = (
-                alt.Chart(df3)
-                .mark_line(color="#2ca02c")
-                .encode(
-                    x=alt.X("x:Q", title="Time"),
-                    y=alt.Y("y:Q", title="Signal3"),
+                with stage("altair_chart.signal2"):
+                    st.altair_chart(chart2, use_container_width=True)
+            else:
+                st.info(f"No data found in {DATA_JSON_PATH} or 'Signal2' missing.")
+
+            # Add Signal3 chart under Signal2
+            if len(exg_values3):
+                x3 = exg_time3 if len(exg_time3) else list(range(len(exg_values3)))
+                with stage("dataframe.signal3"):
+                    df3 = pd.DataFrame({"x": x3, "y": exg_values3})
+                chart3 = (
+                    alt.Chart(df3)
+                    .mark_line(color="#2ca02c")
+                    .encode(
+                        x=alt.X("x:Q", title="Time"),
+                        y=alt.Y("y:Q", title="Signal3"),
+                    )
+                    .properties(height=320)
                 )
-                .properties(height=320)
-            )
-            st.altair_chart(chart3, use_container_width=True)
-        else:
-            st.info(f"No data found in {DATA_JSON_PATH} or 'Signal3' missing.")
+                with stage("altair_chart.signal3"):
+                    st.altair_chart(chart3, use_container_width=True)
+            else:
+                st.info(f"No data found in {DATA_JSON_PATH} or 'Signal3' missing.")
+
+        render_spectrogram(exg_time1, {"Signal1": exg_values1, "Signal2": exg_values2, "Signal3": exg_values3},
+                           exg_version)
         
         
 
@@ -377,6 +272,36 @@ def main() -> None:
         msg = load_message_from_json(DATA_JSON_PATH)
         ai_explanation = msg if msg else f"No message found in {DATA_JSON_PATH}"
         st.markdown(ai_explanation)
+        # Live stream metrics on a uniform grid (simulation.py's sleep pacing jitters and drifts)
+        stream_metrics, stream_timing = {}, {}
+        if len(values) > 1:
+            with stage("uniform_metrics.stream"):
+                stream_metrics, stream_timing = uniform_metrics(
+                    STREAM_JSONL_PATH, stream_t, values,
+                    version=stream_version,
+                )
+            st.caption(f"Live stream - {format_quality(stream_timing)}")
+        # Abnormal ECG beats (scan cached per recording version and stored in ANOMALY_DB_PATH)
+        n_ecg = min(len(exg_time1), len(exg_values1))
+        anomalies = {}
+        if n_ecg > 1:
+            with stage("get_anomalies"):
+                anomalies = get_anomalies(DATA_JSON_PATH, exg_time1[:n_ecg], exg_values1[:n_ecg], version=exg_version)
+            st.caption(format_anomalies(anomalies, max_listed=3))
+            if anomalies["intervals"]:
+                with st.expander(f"Flagged ECG intervals ({len(anomalies['intervals'])})"):
+                    st.dataframe(anomalies["intervals"][:200], hide_index=True, use_container_width=True)
+        # ECG bleed into EMG and EMG leakage into EOG (per-window FFT cross-correlation, incremental)
+        coupling = {}
+        if exg_ring is not None or len(exg_values3):
+            with stage("get_coupling"):
+                coupling = get_coupling(
+                    DATA_JSON_PATH, exg_time1,
+                    {"Signal1": exg_values1, "Signal2": exg_values2, "Signal3": exg_values3},
+                    version=exg_version,
+                    start_index=exg_version[1] - len(exg_values1) if exg_version is not None else 0,
+                )
+            st.caption(format_coupling(coupling).replace("\n", "  \n"))
 
 
     # section 3: model recommendation
@@ -397,12 +322,31 @@ def main() -> None:
                 "Provide practical recommendations in a friendly tone."
             )
             
+            # Compact ECG/EOG/EMG feature digest (cached per recording version), computed on
+            # a uniform time grid if the recording has gaps or jitter
+            with stage("get_uniform_series.exg"):
+                n_exg = min(len(exg_values1), len(exg_values2), len(exg_values3))
+                exg_t, exg_v, exg_timing = get_uniform_series(
+                    DATA_JSON_PATH, exg_time1[:n_exg],
+                    np.column_stack([exg_values1[:n_exg], exg_values2[:n_exg], exg_values3[:n_exg]]),
+                    version=exg_version,
+                )
+            with stage("get_exg_digest"):
+                signal_digest = get_exg_digest(
+                    DATA_JSON_PATH, exg_t, *exg_v.T, version=exg_version,
+                    start_index=exg_version[1] - len(exg_t) if exg_version is not None else 0,
+                )
+
             # Use the predefined explanation and suggestions as context
             context_info = (
                 f"Current Health Status: {ai_explanation}\n"
                 # f"Current Recommendations: {ai_suggestions}\n"
-                f"Signal Data: {format_metrics_text(metrics) if 'metrics' in locals() and metrics else 'No signal data available'}\n"
-                f"User Question: {user_prompt.strip() if user_prompt else 'General health advice request'}"
+                f"Signal Data:\n{format_digest(signal_digest)}\n{format_quality(exg_timing)}\n"
+                + (f"{format_anomalies(anomalies)}\n" if anomalies else "")
+                + (f"{format_coupling(coupling)}\n" if coupling else "")
+                + (f"Live Stream:\n{format_metrics_text(stream_metrics)}{format_quality(stream_timing)}\n"
+                   if stream_metrics else "")
+                + f"User Question: {user_prompt.strip() if user_prompt else 'General health advice request'}"
             )
             
             messages = [
@@ -412,17 +356,48 @@ def main() -> None:
                     "content": context_info
                 },
             ]
-            # stream response via handler
-            ai_handler.get_ai_response(messages, stream=True)
+            # Run the request in the background so live plotting keeps refreshing
+            previous_job = st.session_state.get("ai_job")
+            if previous_job is not None:
+                previous_job.cancel()
+            st.session_state["ai_job"] = submit_ai_request(ai_handler, messages)
+
+        # Stream whatever the background job has produced so far into a placeholder
+        ai_job = st.session_state.get("ai_job")
+        if ai_job is not None:
+            placeholder = st.empty()
+            if not ai_job.done() and st.button("Cancel", key="cancel_ai_job"):
+                ai_job.cancel()
+            status = ai_job.status
+            if status == "error":
+                placeholder.error(f"AI call error: {str(ai_job.error)}")
+            elif ai_job.text():
+                suffix = " *(cancelled)*" if status == "cancelled" else ("" if ai_job.done() else " ▌")
+                placeholder.markdown(ai_job.text() + suffix)
+            elif status == "cancelled":
+                placeholder.caption("Cancelled.")
+            elif status == "queued":
+                placeholder.caption("Waiting for a free AI worker...")
+            elif status == "running":
+                placeholder.caption("Generating suggestions...")
 
     st.caption(f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
+    # Optional timing and acquisition-pipeline panels (SIGNAL_PROFILE=1 or ?debug=1)
+    if instrumentation.is_enabled():
+        instrumentation.record("rerun.total", time.perf_counter() - rerun_start)
+        instrumentation.render_debug_panel()
+        render_status_panel()
+
     # Auto-refresh every second to reflect new data points appended to output.jsonl
-    time.sleep(0.1)
-    st.rerun()
+    if REFRESH_INTERVAL_S > 0:
+        time.sleep(REFRESH_INTERVAL_S)
+        st.rerun()
 
 
 if __name__ == "__main__":
-    main()
+    # ?debug=1 profiles this session's runs only, from the first stage on
+    with instrumentation.profiling(st.query_params.get("debug") == "1"):
+        main()
 
 
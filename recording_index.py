@@ -0,0 +1,214 @@
+"""
+Recording index - time-range queries over JSONL and binary EXG recordings
+
+    times, values = read_range("output.jsonl", t0, t1)
+    times, values = read_range("recordings/live.exgbin", 2.0, 4.5, channels=["Signal1"])
+
+JSONL files get a sparse timestamp -> byte-offset index (one entry every INDEX_STRIDE
+lines) stored next to the file as <path>.idx.npz. It is built lazily on the first query
+and extended incrementally as the file grows, so a query seeks straight to the right
+neighbourhood: O(log n) to find it, then only the k matching lines (+ < one stride) are
+parsed. Binary stores (.exgbin) are fixed-width rows, so their time column is searched
+directly through a memmap without any index file. Archives (.exga, see exg_archive.py)
+carry their own chunk table and only inflate the chunks overlapping the range.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+INDEX_STRIDE = 256
+INDEX_SUFFIX = ".idx.npz"
+# Bytes hashed from the start of a file to notice it was rewritten rather than appended to
+_HEAD_BYTES = 256
+# The index file is rewritten once this many entries were added since it was last saved
+_SAVE_ENTRIES = 64
+
+
+def to_epoch_seconds(value) -> float:
+    """Accept epoch seconds, datetime or ISO-8601 strings (as written by simulation.py)"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    return float(value)
+
+
+def _parse_jsonl_timestamp(line: bytes):
+    try:
+        return to_epoch_seconds(json.loads(line)["timestamp"])
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class JsonlIndex:
+    """Sparse (timestamp, byte offset) samples of a JSONL recording"""
+
+    def __init__(self, path):
+        self.path = path
+        self.times = np.empty(0, dtype=np.float64)
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.indexed_bytes = 0   # index covers complete lines up to this offset
+        self.lines = 0
+        self.head = b""
+        self._saved_entries = None   # entries in the index file (None: no usable file)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _index_path(self):
+        return self.path + INDEX_SUFFIX
+
+    def _load(self):
+        try:
+            with np.load(self._index_path()) as z:
+                self.times, self.offsets = z["times"], z["offsets"]
+                self.indexed_bytes, self.lines = (int(v) for v in z["meta"])
+                self.head = bytes(z["head"])
+                self._saved_entries = self.times.size
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def _save(self):
+        tmp = self._index_path() + ".tmp.npz"
+        np.savez(tmp, times=self.times, offsets=self.offsets,
+                 meta=np.array([self.indexed_bytes, self.lines], dtype=np.int64),
+                 head=np.frombuffer(self.head, dtype=np.uint8))
+        os.replace(tmp, self._index_path())
+        self._saved_entries = self.times.size
+
+    def refresh(self):
+        """Index any lines appended since the last call; rebuild if the file was rewritten"""
+        with self._lock:
+            size = os.path.getsize(self.path)
+            with open(self.path, "rb") as f:
+                head = hashlib.blake2b(f.read(_HEAD_BYTES), digest_size=16).digest()
+                if size < self.indexed_bytes or (self.indexed_bytes and head != self.head):
+                    # Rewritten, not appended to: rebuild from scratch
+                    self.times = np.empty(0, dtype=np.float64)
+                    self.offsets = np.empty(0, dtype=np.int64)
+                    self.indexed_bytes = self.lines = 0
+                    self._saved_entries = None
+                if size == self.indexed_bytes:
+                    return
+                self.head = head
+                f.seek(self.indexed_bytes)
+                pos, lines = self.indexed_bytes, self.lines
+                new_times, new_offsets = [], []
+                need_entry = False
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partial line still being written
+                    if lines % INDEX_STRIDE == 0:
+                        need_entry = True
+                    if need_entry and line.strip():
+                        ts = _parse_jsonl_timestamp(line)
+                        if ts is not None:
+                            new_times.append(ts)
+                            new_offsets.append(pos)
+                            need_entry = False
+                    pos += len(line)
+                    lines += 1
+            if new_times:
+                self.times = np.concatenate((self.times, np.asarray(new_times, dtype=np.float64)))
+                self.offsets = np.concatenate((self.offsets, np.asarray(new_offsets, dtype=np.int64)))
+            self.indexed_bytes, self.lines = pos, lines
+            # A growing file is queried on every rerun: persist the first build, then only
+            # every _SAVE_ENTRIES new entries (a lost tail is simply indexed again)
+            if self._saved_entries is None or self.times.size - self._saved_entries >= _SAVE_ENTRIES:
+                self._save()
+
+    def start_offset(self, t0):
+        """Byte offset of the last indexed line before t0 (0 if none).
+
+        Strictly before: lines sharing t0 may precede the entry that carries t0.
+        """
+        i = int(np.searchsorted(self.times, t0, side="left")) - 1
+        return int(self.offsets[i]) if i >= 0 else 0
+
+
+_jsonl_indexes = {}
+_jsonl_lock = threading.Lock()
+
+
+def jsonl_index(path):
+    """Process-wide cached index for a JSONL file, brought up to date"""
+    path = os.path.abspath(path)
+    with _jsonl_lock:
+        index = _jsonl_indexes.get(path)
+        if index is None:
+            index = _jsonl_indexes[path] = JsonlIndex(path)
+    index.refresh()
+    return index
+
+
+def _read_range_jsonl(path, t0, t1):
+    index = jsonl_index(path)
+    times, values = [], []
+    with open(path, "rb") as f:
+        f.seek(index.start_offset(t0))
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                obj = json.loads(line)
+                ts = to_epoch_seconds(obj["timestamp"])
+                val = float(obj["value"])
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                continue
+            if ts > t1:
+                break
+            if ts >= t0:
+                times.append(ts)
+                values.append(val)
+    return np.asarray(times, dtype=np.float64), np.asarray(values, dtype=np.float64).reshape(-1, 1)
+
+
+def _read_range_store(path, t0, t1, channels):
+    from exg_store import open_store
+
+    columns, rows = open_store(path)
+    t = rows[:, 0]
+    i, j = int(np.searchsorted(t, t0, side="left")), int(np.searchsorted(t, t1, side="right"))
+    cols = _channel_indices(columns, channels)
+    return np.array(t[i:j]), np.array(rows[i:j][:, cols])
+
+
+def _channel_indices(columns, channels):
+    """Map channel names or 0-based channel numbers (time excluded) to column indices"""
+    if channels is None:
+        return list(range(1, len(columns)))
+    indices = []
+    for ch in channels:
+        if isinstance(ch, str):
+            if ch not in columns[1:]:
+                raise KeyError(f"unknown channel {ch!r}; available: {columns[1:]}")
+            indices.append(columns.index(ch))
+        else:
+            indices.append(int(ch) + 1)
+    return indices
+
+
+def read_range(path, t0, t1, channels=None):
+    """Samples with t0 <= time <= t1 as (times, values[k, n_channels]) NumPy arrays.
+
+    JSONL times are epoch seconds of the ISO timestamps and the single channel is
+    "value"; binary stores use their own time column and channel names.
+    """
+    t0, t1 = to_epoch_seconds(t0), to_epoch_seconds(t1)
+    if path.endswith(".exgbin"):
+        return _read_range_store(path, t0, t1, channels)
+    if path.endswith(".exga"):
+        from exg_archive import ExgArchive
+
+        with ExgArchive(path) as archive:
+            return archive.read_range(t0, t1, channels)
+    if path.endswith(".jsonl"):
+        times, values = _read_range_jsonl(path, t0, t1)
+        if channels is not None:
+            values = values[:, [i - 1 for i in _channel_indices(["time", "value"], channels)]]
+        return times, values
+    raise ValueError(f"unsupported recording type: {path}")
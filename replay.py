@@ -0,0 +1,214 @@
+"""
+Replay engine - streams a stored recording into the live pipeline at N x real time
+
+Usage:
+    python replay.py Trible_EXG_Signal1.json --speed 10 --to shm:exg_signals
+    python replay.py recordings/session1.exga --speed 100 --to tcp:127.0.0.1:5555
+    python replay.py output.jsonl --speed 1 --to jsonl:replayed.jsonl
+    python simulation.py --replay Trible_EXG_Signal1.json --channel Signal1 --speed 10
+
+The recording is cut into blocks of `block_s` recording seconds (searchsorted, no per-sample
+loop). Block k is due at start + (t_end(k) - t_first) / speed on the monotonic clock, so
+sleep overshoot never accumulates: a late block just shortens the next wait. Each block's
+lateness (finished writing - due) is recorded; when the 95th percentile exceeds one block
+length the sink (or the consumer behind it, e.g. a full socket) is not keeping up.
+"""
+
+import argparse
+import json
+import socket
+import sys
+import time
+
+import numpy as np
+
+from exg_archive import load_rows
+
+
+class JsonlSink:
+    """simulation.py record format: one {"timestamp", "value"} line per sample of one channel"""
+
+    def __init__(self, path, channel_index=0, fp=None):
+        # fp: any file-like writer instead of path, e.g. a segmented_output.SegmentedWriter
+        self.fp = fp if fp is not None else open(path, "w", encoding="utf-8")
+        self.channel_index = channel_index
+
+    def write(self, stamps, values):
+        ms = np.rint(stamps * 1000.0).astype("int64").astype("datetime64[ms]")
+        iso = np.datetime_as_string(ms, unit="ms")
+        self.fp.writelines(f'{{"timestamp": "{s}Z", "value": {v!r}}}\n'
+                           for s, v in zip(iso.tolist(), values[:, self.channel_index].tolist()))
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+
+class RingSink:
+    """Publish rows to a shared_ring.ExgRing that Signal Insights attaches to (EXG_SHM_NAME)"""
+
+    def __init__(self, name, columns, capacity=None):
+        from shared_ring import DEFAULT_CAPACITY, ExgRing
+
+        self.ring = ExgRing.create(name, columns, capacity or DEFAULT_CAPACITY)
+
+    def write(self, stamps, values):
+        self.ring.append(np.column_stack([stamps, values]))
+
+    def close(self):
+        self.ring.close()
+        self.ring.unlink()
+
+
+class BridgeSink:
+    """Send frames to a running acquisition_bridge.py serve (blocks when it falls behind)"""
+
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+
+    def write(self, stamps, values):
+        from acquisition_bridge import encode_frame
+
+        self.sock.sendall(encode_frame(np.column_stack([stamps, values])))
+
+    def close(self):
+        self.sock.close()
+
+
+def positive_speed(text):
+    """argparse type for --speed: a finite number above zero"""
+    try:
+        speed = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid speed {text!r}") from None
+    if not np.isfinite(speed) or speed <= 0:
+        raise argparse.ArgumentTypeError(f"speed must be greater than 0 (got {text})")
+    return speed
+
+
+def replay(times, values, sink, speed=1.0, block_s=0.05, wall_clock=False, loop=False, clock=time.monotonic):
+    """Stream (times [n], values [n, channels]) into sink.write(stamps, values) at speed x real time.
+
+    Stamps passed to the sink are the recording times, or with wall_clock=True the same
+    times shifted to start at the current epoch time (so live readers see a plausible
+    timeline). Either way the recording's sample spacing is kept: only the delivery
+    schedule runs at speed x, so rates, RR intervals and frequencies stay correct.
+    Returns the keep-up report.
+    """
+    if not np.isfinite(speed) or speed <= 0:
+        raise ValueError(f"speed must be greater than 0, got {speed}")
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(times.size, -1)
+    if times.size == 0:
+        return {"blocks": 0, "samples": 0}
+    t_first = times[0]
+    edges = np.searchsorted(times, np.arange(t_first, times[-1] + block_s, block_s)[1:], side="left")
+    edges = np.unique(np.concatenate(([0], edges, [times.size])))
+    block_wall_s = block_s / speed
+    # Recording time of one pass, plus one sample step so looped passes do not overlap
+    pass_s = times[-1] - t_first + (float(np.median(np.diff(times))) if times.size > 1 else block_s)
+    lateness = []
+    samples = 0
+    replayed_s = 0.0
+    start = clock()
+    epoch_start = time.time()
+    offset = 0.0
+    try:
+        while True:
+            for a, b in zip(edges[:-1], edges[1:]):
+                due = start + (offset + times[b - 1] - t_first) / speed
+                delay = due - clock()
+                if delay > 0:
+                    time.sleep(delay)
+                stamps = times[a:b]
+                if wall_clock:
+                    stamps = epoch_start + offset + stamps - t_first
+                sink.write(stamps, values[a:b])
+                lateness.append(clock() - due)
+                samples += int(b - a)
+                replayed_s = offset + times[b - 1] - t_first
+            if not loop:
+                break
+            offset += pass_s
+    except KeyboardInterrupt:
+        pass
+    elapsed = clock() - start
+    lateness = np.asarray(lateness) * 1000.0
+    behind = int(np.count_nonzero(lateness > block_wall_s * 1000.0))
+    return {
+        "blocks": int(lateness.size),
+        "samples": samples,
+        "recording_s": round(float(replayed_s), 3),
+        "elapsed_s": round(elapsed, 3),
+        "target_speed": speed,
+        "achieved_speed": round(replayed_s / elapsed, 3) if elapsed > 0 else None,
+        "lateness_p50_ms": round(float(np.percentile(lateness, 50)), 3) if lateness.size else 0.0,
+        "lateness_p95_ms": round(float(np.percentile(lateness, 95)), 3) if lateness.size else 0.0,
+        "lateness_max_ms": round(float(lateness.max()), 3) if lateness.size else 0.0,
+        "blocks_behind": behind,
+        # Isolated late blocks (scheduler hiccups) are caught up on; sustained lateness is not
+        "keeps_up": bool(lateness.size == 0 or np.percentile(lateness, 95) <= block_wall_s * 1000.0),
+    }
+
+
+def format_report(report):
+    if not report.get("blocks"):
+        return "nothing replayed"
+    verdict = "consumer kept up" if report["keeps_up"] else \
+        f"FELL BEHIND ({report['blocks_behind']} of {report['blocks']} blocks late by more than a block)"
+    return (f"replayed {report['samples']:,} samples in {report['blocks']} blocks at {report['achieved_speed']}x (target {report['target_speed']}x); "
+            f"lateness p50 {report['lateness_p50_ms']} ms, p95 {report['lateness_p95_ms']} ms, "
+            f"max {report['lateness_max_ms']} ms - {verdict}")
+
+
+def channel_index(columns, channel=None):
+    """Index of channel among the value columns (first one if None); ValueError names the choices"""
+    if channel is None:
+        return 0
+    if channel not in columns[1:]:
+        raise ValueError(f"unknown channel {channel!r} (recording has {', '.join(columns[1:])})")
+    return columns[1:].index(channel)
+
+
+def open_sink(target, columns, channel=None):
+    """jsonl:PATH, shm:NAME or tcp:HOST:PORT"""
+    kind, _, where = target.partition(":")
+    if kind == "jsonl":
+        return JsonlSink(where, channel_index(columns, channel))
+    if kind == "shm":
+        return RingSink(where, columns)
+    if kind == "tcp":
+        host, _, port = where.rpartition(":")
+        return BridgeSink(host or "127.0.0.1", int(port))
+    raise ValueError(f"unknown replay target {target!r} (use jsonl:PATH, shm:NAME or tcp:HOST:PORT)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a stored recording into the live pipeline")
+    parser.add_argument("recording", help=".json (Trible_EXG), .jsonl, .exgbin or .exga")
+    parser.add_argument("--to", default="shm:exg_signals", help="jsonl:PATH, shm:NAME or tcp:HOST:PORT")
+    parser.add_argument("--speed", type=positive_speed, default=1.0, help="Replay speed (10 = ten times real time)")
+    parser.add_argument("--block-ms", type=float, default=50.0, help="Recording time per block")
+    parser.add_argument("--channel", default=None, help="Channel written by jsonl targets (default: first)")
+    parser.add_argument("--loop", action="store_true", help="Start over at the end until interrupted")
+    args = parser.parse_args()
+
+    columns, rows = load_rows(args.recording)
+    try:
+        sink = open_sink(args.to, columns, args.channel)
+    except ValueError as e:
+        parser.error(str(e))
+    # Live readers (the page, ring consumers) expect current epoch timestamps
+    wall_clock = not args.to.startswith("tcp:")
+    print(f"replaying {rows.shape[0]:,} samples x {columns[1:]} at {args.speed:g}x into {args.to}")
+    try:
+        report = replay(rows[:, 0], rows[:, 1:], sink, args.speed, args.block_ms / 1000.0, wall_clock, args.loop)
+    finally:
+        sink.close()
+    print(format_report(report))
+    print(json.dumps(report))
+    return 0 if report.get("keeps_up", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Segmented output - rotating JSONL segments with an atomic manifest and retention limits
+
+    python simulation.py --stream --segment-mb 16 --keep-mb 512 --outfile output.jsonl
+
+A segmented stream for output.jsonl is written as output.000001.jsonl, output.000002.jsonl, ...
+next to output.manifest.json. A new segment starts when the current one reaches max_bytes or
+max_age_s. The manifest is rewritten (tmp + os.replace) whenever the segment list changes:
+at start, at each rotation and on close. Readers therefore always see a complete list in
+which every closed segment carries its first/last timestamps. Retention drops the oldest
+closed segments once there are more than keep_segments of them or they add up to more than
+keep_bytes. A restart appends a new segment instead of truncating the history.
+
+Readers use the manifest so their cost does not grow with the length of the run:
+load_last_n() reads only the tail of the newest segment(s), and read_range() opens only the
+segments whose time span overlaps the query (through recording_index).
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from file_tail import tail_lines
+from recording_index import _parse_jsonl_timestamp, to_epoch_seconds
+
+MANIFEST_VERSION = 1
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+
+
+def manifest_path(path: str) -> str:
+    stem, _ = os.path.splitext(path)
+    return stem + ".manifest.json"
+
+
+def _segment_path(path: str, seq: int) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{seq:06d}{ext or '.jsonl'}"
+
+
+def read_manifest(path: str) -> dict | None:
+    """Manifest for the segmented stream at path, or None if it is a plain file"""
+    try:
+        with open(manifest_path(path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # A plain file written after the segmented run (e.g. simulation.py without --segment-*) wins
+    try:
+        if os.path.getmtime(path) > os.path.getmtime(manifest_path(path)) and not manifest.get("active"):
+            return None
+    except OSError:
+        pass
+    return manifest
+
+
+def _write_manifest(path: str, manifest: dict) -> None:
+    target = manifest_path(path)
+    tmp = target + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, target)
+
+
+class SegmentedWriter:
+    """File-like (write/writelines/flush/close) JSONL writer that rotates into segments"""
+
+    def __init__(self, path: str, max_bytes: int | None = DEFAULT_SEGMENT_BYTES, max_age_s: float | None = None,
+                 keep_segments: int | None = None, keep_bytes: int | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.keep_segments = keep_segments
+        self.keep_bytes = keep_bytes
+        self.manifest = read_manifest(path) or {"version": MANIFEST_VERSION, "segments": [], "active": None}
+        self.manifest["version"] = MANIFEST_VERSION
+        if self.manifest.get("active"):
+            # Previous writer did not close cleanly: seal its segment from what is on disk
+            self._seal(self.manifest["segments"][-1])
+        self.fp = None
+        self._open_next()
+
+    def _seal(self, segment: dict) -> None:
+        file = os.path.join(os.path.dirname(self.path), segment["file"])
+        try:
+            segment["bytes"] = os.path.getsize(file)
+        except OSError:
+            segment["bytes"] = 0
+        last = tail_lines(file, 1)
+        segment["last"] = _parse_jsonl_timestamp(last[0]) if last else segment.get("first")
+        segment["closed"] = True
+        self.manifest["active"] = None
+
+    def _open_next(self) -> None:
+        segments = self.manifest["segments"]
+        seq = segments[-1]["seq"] + 1 if segments else 1
+        file = _segment_path(self.path, seq)
+        self.fp = open(file, "w", encoding="utf-8")
+        segments.append({"seq": seq, "file": os.path.basename(file), "first": None, "last": None,
+                         "lines": 0, "bytes": 0, "closed": False})
+        self.manifest["active"] = os.path.basename(file)
+        self._opened = time.monotonic()
+        self._bytes = 0
+        self._lines = 0
+        self._enforce_retention()
+        _write_manifest(self.path, self.manifest)
+
+    def _rotate(self) -> None:
+        self.fp.close()
+        segment = self.manifest["segments"][-1]
+        segment.update(lines=self._lines)
+        self._seal(segment)
+        self._open_next()
+
+    def _enforce_retention(self) -> None:
+        segments = self.manifest["segments"]
+        drop = 0
+        closed = [s for s in segments if s["closed"]]
+        total = sum(s["bytes"] for s in closed)
+        for segment in closed:
+            over_count = self.keep_segments is not None and len(closed) - drop > self.keep_segments
+            over_bytes = self.keep_bytes is not None and total > self.keep_bytes
+            if not (over_count or over_bytes):
+                break
+            total -= segment["bytes"]
+            drop += 1
+        if not drop:
+            return
+        dropped, self.manifest["segments"] = segments[:drop], segments[drop:]
+        # Publish the shorter list before deleting, so a reader never sees a listed file vanish
+        _write_manifest(self.path, self.manifest)
+        directory = os.path.dirname(self.path)
+        for segment in dropped:
+            for file in (segment["file"], segment["file"] + ".idx.npz"):
+                try:
+                    os.remove(os.path.join(directory, file))
+                except OSError:
+                    pass
+
+    def write(self, text: str) -> int:
+        if self._lines == 0 and text:
+            # Recorded at the next manifest write; readers take it from the file until then
+            self.manifest["segments"][-1]["first"] = _parse_jsonl_timestamp(text.split("\n", 1)[0].encode("utf-8"))
+        written = self.fp.write(text)
+        self._bytes += len(text)
+        self._lines += text.count("\n")
+        if (self.max_bytes is not None and self._bytes >= self.max_bytes) or \
+                (self.max_age_s is not None and time.monotonic() - self._opened >= self.max_age_s):
+            self._rotate()
+        return written
+
+    def writelines(self, lines) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+    def close(self) -> None:
+        if self.fp is None:
+            return
+        self.fp.close()
+        self.fp = None
+        segment = self.manifest["segments"][-1]
+        segment.update(lines=self._lines)
+        self._seal(segment)
+        _write_manifest(self.path, self.manifest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def segment_files(path: str) -> list[str]:
+    """Segment paths oldest first (just [path] for a plain file)"""
+    manifest = read_manifest(path)
+    if manifest is None:
+        return [path]
+    directory = os.path.dirname(path)
+    return [os.path.join(directory, s["file"]) for s in manifest["segments"]]
+
+
+def live_segment(path: str) -> str:
+    """The file a live tail should read: the active segment, or path itself"""
+    return segment_files(path)[-1]
+
+
+def tail_version(path: str):
+    """Cache version of a plain or segmented stream: (live segment, mtime_ns, size), None if absent.
+
+    In segmented mode path itself no longer changes, so its own stat is not a usable version.
+    """
+    file = live_segment(path)
+    try:
+        st_ = os.stat(file)
+    except OSError:
+        return None
+    return file, st_.st_mtime_ns, st_.st_size
+
+
+def load_last_n(path: str, n: int = 100):
+    """load_last_n_jsonl for plain or segmented streams, reading only the tail bytes.
+
+    Returns (datetimes, values) like signal_data.load_last_n_jsonl; spills into older
+    segments when the newest one holds fewer than n lines (just after a rotation).
+    """
+    from datetime import datetime
+
+    lines: list[bytes] = []
+    for file in reversed(segment_files(path)):
+        lines = tail_lines(file, n - len(lines)) + lines
+        if len(lines) >= n:
+            break
+    times, values = [], []
+    for line in lines:
+        try:
+            obj = json.loads(line)
+            ts = datetime.fromisoformat(str(obj["timestamp"]).replace("Z", "+00:00"))
+            values.append(float(obj["value"]))
+            times.append(ts)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            continue
+    return times, values
+
+
+def read_range(path: str, t0, t1, channels=None):
+    """recording_index.read_range across the segments overlapping [t0, t1]"""
+    from recording_index import read_range as read_file_range
+
+    manifest = read_manifest(path)
+    if manifest is None:
+        return read_file_range(path, t0, t1, channels)
+    t0, t1 = to_epoch_seconds(t0), to_epoch_seconds(t1)
+    directory = os.path.dirname(path)
+    times, values = [], []
+    for segment in manifest["segments"]:
+        first, last = segment.get("first"), segment.get("last")
+        if first is None and not segment["closed"]:
+            try:
+                with open(os.path.join(directory, segment["file"]), "rb") as f:
+                    first = _parse_jsonl_timestamp(f.readline())
+            except OSError:
+                continue
+        if first is None or first > t1 or (segment["closed"] and last is not None and last < t0):
+            continue
+        try:
+            t, v = read_file_range(os.path.join(directory, segment["file"]), t0, t1, channels)
+        except OSError:
+            continue  # removed by retention after the manifest was read
+        times.append(t)
+        values.append(v)
+    if not times:
+        return np.empty(0, dtype=np.float64), np.empty((0, 1), dtype=np.float64)
+    return np.concatenate(times), np.concatenate(values)
@@ -0,0 +1,292 @@
+"""
+Shared ring buffer - one ingest process decodes recordings into shared memory, viewers attach read-only
+
+Usage:
+    python shared_ring.py --jsonl output.jsonl --name exg_stream          # tail simulation.py output
+    python shared_ring.py --exg-json Trible_EXG_Signal1.json --name exg_signals
+
+Then start Streamlit with SIGNAL_SHM_NAME=exg_stream and/or EXG_SHM_NAME=exg_signals and
+every session reads the decoded samples from shared memory instead of re-reading and
+re-parsing the files itself.
+
+Layout: a small int64 header, a JSON column-name block and a float64 [capacity, columns]
+ring (column 0 is time). The writer brackets each append with a sequence counter
+(odd while writing), so readers can detect and retry a torn read without locks.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = 0x45584752494E4731  # "EXGRING1"
+HEADER_SLOTS = 8            # magic, capacity, n_columns, seq, total_written, generation, creation id, reserved
+NAMES_BYTES = 512
+_SEQ, _TOTAL, _GENERATION, _CREATION_ID = 3, 4, 5, 6
+DEFAULT_CAPACITY = 1_000_000
+# A reader whose ring has not advanced for this long checks that the name still refers to it
+IDLE_CHECK_S = 2.0
+
+
+class ExgRing:
+    """Fixed-capacity ring of float64 rows in a named shared-memory block"""
+
+    def __init__(self, shm, readonly):
+        self._shm = shm
+        self.readonly = readonly
+        self._header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        if int(self._header[0]) != MAGIC:
+            raise ValueError(f"shared memory block '{shm.name}' is not an ExgRing")
+        self.capacity = int(self._header[1])
+        self.creation_id = int(self._header[_CREATION_ID])
+        self._seen_seq, self._seen_at = None, time.monotonic()
+        n_columns = int(self._header[2])
+        names_raw = bytes(shm.buf[HEADER_SLOTS * 8:HEADER_SLOTS * 8 + NAMES_BYTES]).rstrip(b"\0")
+        self.columns = json.loads(names_raw.decode("utf-8"))
+        self._data = np.ndarray((self.capacity, n_columns), dtype=np.float64, buffer=shm.buf,
+                                offset=HEADER_SLOTS * 8 + NAMES_BYTES)
+        if readonly:
+            self._data.flags.writeable = False
+
+    @classmethod
+    def create(cls, name, columns, capacity=DEFAULT_CAPACITY):
+        """Create (or replace) the named block; the caller becomes its only writer"""
+        names_raw = json.dumps(list(columns)).encode("utf-8")
+        if len(names_raw) > NAMES_BYTES:
+            raise ValueError("too many / too long column names")
+        size = HEADER_SLOTS * 8 + NAMES_BYTES + capacity * len(columns) * 8
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[1], header[2] = capacity, len(columns)
+        # Tells readers of an older block with this name that it has been replaced
+        header[_CREATION_ID] = int.from_bytes(os.urandom(7), "little") or 1
+        shm.buf[HEADER_SLOTS * 8:HEADER_SLOTS * 8 + len(names_raw)] = names_raw
+        header[0] = MAGIC
+        return cls(shm, readonly=False)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach read-only to an existing block (raises FileNotFoundError if absent)"""
+        return cls(_open_untracked(name), readonly=True)
+
+    def replaced(self, idle_s=IDLE_CHECK_S):
+        """True if this block is no longer the one under its name (ingest restarted or stopped).
+
+        While the writer keeps appending the ring is live and nothing is checked. Once it has
+        been idle for idle_s, the named block's creation id is compared (at most every idle_s).
+        """
+        seq, now = self.seq, time.monotonic()
+        if seq != self._seen_seq:
+            self._seen_seq, self._seen_at = seq, now
+            return False
+        if now - self._seen_at < idle_s:
+            return False
+        self._seen_at = now
+        try:
+            shm = _open_untracked(self._shm.name)
+        except FileNotFoundError:
+            return True
+        try:
+            header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+            current = int(header[_CREATION_ID])
+            del header
+        finally:
+            shm.close()
+        return current != self.creation_id
+
+    @property
+    def seq(self):
+        return int(self._header[_SEQ])
+
+    @property
+    def total(self):
+        """Rows written since creation (or the last reset)"""
+        return int(self._header[_TOTAL])
+
+    @property
+    def version(self):
+        """(generation, total): changes on every append and on every reset, even to the same total"""
+        return int(self._header[_GENERATION]), int(self._header[_TOTAL])
+
+    def append(self, rows):
+        """Append rows (shape [k, n_columns]); only the newest `capacity` rows are kept"""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows[None, :]
+        if rows.shape[0] == 0:
+            return
+        header = self._header
+        total = int(header[_TOTAL])
+        if rows.shape[0] > self.capacity:
+            total += rows.shape[0] - self.capacity
+            rows = rows[-self.capacity:]
+        k = rows.shape[0]
+        start = total % self.capacity
+        first = min(k, self.capacity - start)
+        header[_SEQ] += 1
+        self._data[start:start + first] = rows[:first]
+        if first < k:
+            self._data[:k - first] = rows[first:]
+        header[_TOTAL] = total + k
+        header[_SEQ] += 1
+
+    def reset(self):
+        """Forget all rows (used when the source file is rewritten)"""
+        self._header[_SEQ] += 1
+        self._header[_TOTAL] = 0
+        self._header[_GENERATION] += 1
+        self._header[_SEQ] += 1
+
+    def latest(self, n=None, retries=100, with_version=False):
+        """Return (times, values) for the newest n rows (all buffered rows if n is None).
+
+        The rows are copied out of shared memory between two reads of the sequence counter
+        and the copy is retried if the writer touched the ring meanwhile, so the result is
+        consistent and stays valid however long the caller keeps it. With with_version the
+        ring version (generation, total) the rows belong to is returned as a third item.
+        """
+        for _ in range(retries):
+            seq = self.seq
+            if seq & 1:
+                time.sleep(0)
+                continue
+            version = self.version
+            total = version[1]
+            count = min(total, self.capacity) if n is None else min(n, total, self.capacity)
+            end = total % self.capacity
+            start = end - count
+            if start >= 0:
+                window = self._data[start:end].copy()
+            else:
+                window = np.concatenate((self._data[start:], self._data[:end]))
+            if self.seq == seq:
+                times, values = window[:, 0], window[:, 1:]
+                return (times, values, version) if with_version else (times, values)
+        raise TimeoutError("ring is being rewritten too fast to read a consistent window")
+
+    def close(self):
+        self._header = self._data = None
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+def _open_untracked(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attachments with the resource tracker, which would
+        # unlink the writer's block when this process exits
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _parse_jsonl_rows(lines):
+    """Decode simulation.py records into [time, value] rows (bad lines are skipped)"""
+    rows = []
+    for line in lines:
+        try:
+            obj = json.loads(line)
+            ts = datetime.fromisoformat(str(obj["timestamp"]).replace("Z", "+00:00"))
+            rows.append((ts.timestamp(), float(obj["value"])))
+        except (json.JSONDecodeError, KeyError, ValueError, TypeError):
+            continue
+    return np.asarray(rows, dtype=np.float64).reshape(-1, 2)
+
+
+def ingest_jsonl(path, ring, poll_s=0.02):
+    """Tail a JSONL file forever, appending each batch of complete lines to the ring"""
+    position, inode, pending = 0, None, b""
+    while True:
+        try:
+            st_ = os.stat(path)
+        except FileNotFoundError:
+            time.sleep(poll_s)
+            continue
+        if st_.st_ino != inode or st_.st_size < position:
+            # New or truncated file (simulation.py opens with "w"): start over
+            position, inode, pending = 0, st_.st_ino, b""
+            ring.reset()
+        if st_.st_size > position:
+            with open(path, "rb") as f:
+                f.seek(position)
+                chunk = f.read(st_.st_size - position)
+            position += len(chunk)
+            pending += chunk
+            complete, _, pending = pending.rpartition(b"\n")
+            if complete:
+                ring.append(_parse_jsonl_rows(complete.decode("utf-8", errors="replace").splitlines()))
+        time.sleep(poll_s)
+
+
+def ingest_exg_json(path, ring, poll_s=0.5):
+    """Load a Trible_EXG_Signal-style JSON file, reloading whenever it is rewritten"""
+    version = None
+    while True:
+        try:
+            st_ = os.stat(path)
+        except FileNotFoundError:
+            time.sleep(poll_s)
+            continue
+        if (st_.st_mtime_ns, st_.st_size) != version:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                columns = [np.asarray(data[key], dtype=np.float64) for key in ring.columns[1:]]
+                n = min(c.size for c in columns)
+                times = data.get("Time")
+                t = np.asarray(times, dtype=np.float64)[:n] if isinstance(times, list) and len(times) >= n \
+                    else np.arange(n, dtype=np.float64)
+                ring.reset()
+                ring.append(np.column_stack([t] + [c[:n] for c in columns]))
+                version = (st_.st_mtime_ns, st_.st_size)
+            except (OSError, ValueError, KeyError, TypeError):
+                pass  # partially written file; retry on the next poll
+        time.sleep(poll_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a recording once into a shared-memory ring")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jsonl", help="simulation.py output to tail (timestamp/value records)")
+    source.add_argument("--exg-json", help="Trible_EXG_Signal-style JSON with Time/Signal1..3")
+    parser.add_argument("--name", required=True, help="Shared memory block name")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Rows kept in the ring")
+    args = parser.parse_args()
+
+    if args.jsonl:
+        ring = ExgRing.create(args.name, ["time", "value"], args.capacity)
+    else:
+        ring = ExgRing.create(args.name, ["time", "Signal1", "Signal2", "Signal3"], args.capacity)
+    # Unlink the block on SIGTERM too, not only on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"shared ring '{args.name}' ready ({args.capacity:,} rows x {len(ring.columns)} columns)")
+    try:
+        if args.jsonl:
+            ingest_jsonl(args.jsonl, ring)
+        else:
+            ingest_exg_json(args.exg_json, ring)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+if __name__ == "__main__":
+    main()
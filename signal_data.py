@@ -0,0 +1,250 @@
+"""
+Signal data module - loaders and metrics for EXG recordings (shared by the pages, benchmarks and tools)
+"""
+
+import os
+import json
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from instrumentation import timed
+
+
+def generate_signal(sample_rate_hz: int, duration_s: float, freq_hz: float, noise_std: float) -> tuple[np.ndarray, np.ndarray]:
+    num_samples = int(sample_rate_hz * duration_s)
+    t = np.linspace(0, duration_s, num_samples, endpoint=False)
+    clean = np.sin(2 * np.pi * freq_hz * t)
+    noise = np.random.normal(0.0, noise_std, size=num_samples)
+    signal = clean + noise
+    return t, signal
+
+
+@timed("compute_metrics")
+def compute_metrics(signal: np.ndarray, sample_rate_hz: int) -> dict:
+    mean_val = float(np.mean(signal))
+    std_val = float(np.std(signal))
+    peak_to_peak = float(np.max(signal) - np.min(signal))
+    rms = float(np.sqrt(np.mean(np.square(signal))))
+    # simple dominant freq via FFT
+    freqs = np.fft.rfftfreq(len(signal), d=1.0 / sample_rate_hz)
+    spectrum = np.abs(np.fft.rfft(signal))
+    dom_idx = int(np.argmax(spectrum[1:]) + 1) if len(spectrum) > 1 else 0
+    dominant_freq_hz = float(freqs[dom_idx]) if dom_idx < len(freqs) else 0.0
+    return {
+        "mean": mean_val,
+        "std": std_val,
+        "peak_to_peak": peak_to_peak,
+        "rms": rms,
+        "dominant_freq_hz": dominant_freq_hz,
+    }
+
+
+def format_metrics_text(metrics: dict) -> str:
+    return (
+        f"Signal Statistics\n"
+        f"- Mean: {metrics['mean']:.4f}\n"
+        f"- Std Dev: {metrics['std']:.4f}\n"
+        f"- Peak-to-Peak: {metrics['peak_to_peak']:.4f}\n"
+        f"- RMS: {metrics['rms']:.4f}\n"
+        f"- Dominant Freq: {metrics['dominant_freq_hz']:.2f} Hz\n"
+    )
+
+
+@timed("load_first_n_jsonl")
+def load_first_n_jsonl(filepath: str, n: int = 100) -> tuple[list[datetime], list[float]]:
+    times: list[datetime] = []
+    values: list[float] = []
+    if not os.path.exists(filepath):
+        return times, values
+    count = 0
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            if count >= n:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+                ts_raw = obj.get("timestamp")
+                val_raw = obj.get("value")
+                if ts_raw is None or val_raw is None:
+                    continue
+                ts = datetime.fromisoformat(str(ts_raw).replace("Z", "+00:00"))
+                val = float(val_raw)
+                times.append(ts)
+                values.append(val)
+                count += 1
+            except (json.JSONDecodeError, ValueError, TypeError):
+                continue
+    return times, values
+
+
+@timed("load_last_n_jsonl")
+def load_last_n_jsonl(filepath: str, n: int = 100) -> tuple[list[datetime], list[float]]:
+    times: list[datetime] = []
+    values: list[float] = []
+    if not os.path.exists(filepath) or n <= 0:
+        return times, values
+    buffer: deque[str] = deque(maxlen=n)
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    buffer.append(line)
+    except OSError:
+        return times, values
+    for line in buffer:
+        try:
+            obj = json.loads(line)
+            ts_raw = obj.get("timestamp")
+            val_raw = obj.get("value")
+            if ts_raw is None or val_raw is None:
+                continue
+            ts = datetime.fromisoformat(str(ts_raw).replace("Z", "+00:00"))
+            val = float(val_raw)
+            times.append(ts)
+            values.append(val)
+        except (json.JSONDecodeError, ValueError, TypeError):
+            continue
+    return times, values
+
+
+@timed("load_signal1_from_json")
+def load_signal1_from_json(filepath: str) -> tuple[list[float], list[float]]:
+    """Load Time and Signal1 arrays from a JSON file with structure:
+    {
+      "Segment": 1,
+      "Message": "...",
+      "Time": [ ... ],
+      "Signal1": [ ... ],
+      "Signal2": [ ... ],
+      "Signal3": [ ... ]
+    }
+
+    Returns (time_list, signal1_list). If Time is missing or invalid,
+    a simple index [0..N-1] will be used for the x-axis.
+    """
+    time_list: list[float] = []
+    signal_list: list[float] = []
+    if not os.path.exists(filepath):
+        return time_list, signal_list
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        raw_times = data.get("Time")
+        raw_values = data.get("Signal1")
+        if isinstance(raw_values, list):
+            # Convert to floats where possible
+            try:
+                signal_list = [float(v) for v in raw_values]
+            except (TypeError, ValueError):
+                signal_list = []
+        if isinstance(raw_times, list) and len(raw_times) == len(signal_list):
+            try:
+                time_list = [float(t) for t in raw_times]
+            except (TypeError, ValueError):
+                time_list = list(range(len(signal_list)))
+        else:
+            time_list = list(range(len(signal_list)))
+    except (OSError, json.JSONDecodeError):
+        return [], []
+    return time_list, signal_list
+
+@timed("load_signal2_from_json")
+def load_signal2_from_json(filepath: str) -> tuple[list[float], list[float]]:
+    """Load Time and Signal2 arrays from a JSON file with structure:
+    {
+      "Segment": 1,
+      "Message": "...",
+      "Time": [ ... ],
+      "Signal1": [ ... ],
+      "Signal2": [ ... ],
+      "Signal3": [ ... ]
+    }
+
+    Returns (time_list, signal2_list). If Time is missing or invalid,
+    a simple index [0..N-1] will be used for the x-axis.
+    """
+    time_list: list[float] = []
+    signal_list: list[float] = []
+    if not os.path.exists(filepath):
+        return time_list, signal_list
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        raw_times = data.get("Time")
+        raw_values = data.get("Signal2")
+        if isinstance(raw_values, list):
+            # Convert to floats where possible
+            try:
+                signal_list = [float(v) for v in raw_values]
+            except (TypeError, ValueError):
+                signal_list = []
+        if isinstance(raw_times, list) and len(raw_times) == len(signal_list):
+            try:
+                time_list = [float(t) for t in raw_times]
+            except (TypeError, ValueError):
+                time_list = list(range(len(signal_list)))
+        else:
+            time_list = list(range(len(signal_list)))
+    except (OSError, json.JSONDecodeError):
+        return [], []
+    return time_list, signal_list
+
+@timed("load_signal3_from_json")
+def load_signal3_from_json(filepath: str) -> tuple[list[float], list[float]]:
+    """Load Time and Signal1 arrays from a JSON file with structure:
+    {
+      "Segment": 1,
+      "Message": "...",
+      "Time": [ ... ],
+      "Signal1": [ ... ],
+      "Signal2": [ ... ],
+      "Signal3": [ ... ]
+    }
+
+    Returns (time_list, signal1_list). If Time is missing or invalid,
+    a simple index [0..N-1] will be used for the x-axis.
+    """
+    time_list: list[float] = []
+    signal_list: list[float] = []
+    if not os.path.exists(filepath):
+        return time_list, signal_list
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        raw_times = data.get("Time")
+        raw_values = data.get("Signal3")
+        if isinstance(raw_values, list):
+            # Convert to floats where possible
+            try:
+                signal_list = [float(v) for v in raw_values]
+            except (TypeError, ValueError):
+                signal_list = []
+        if isinstance(raw_times, list) and len(raw_times) == len(signal_list):
+            try:
+                time_list = [float(t) for t in raw_times]
+            except (TypeError, ValueError):
+                time_list = list(range(len(signal_list)))
+        else:
+            time_list = list(range(len(signal_list)))
+    except (OSError, json.JSONDecodeError):
+        return [], []
+    return time_list, signal_list
+
+
+@timed("load_message_from_json")
+def load_message_from_json(filepath: str) -> str:
+    """Load the 'Message' field from the given JSON file. Returns empty string if missing."""
+    if not os.path.exists(filepath):
+        return ""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        msg = data.get("Message")
+        return str(msg) if msg is not None else ""
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+        return ""
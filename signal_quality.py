@@ -0,0 +1,169 @@
+"""
+Signal quality module - sample timing analysis (rate, jitter, gaps, duplicates) and uniform resampling
+
+simulation.py paces with time.sleep, so its intervals drift and jitter, and a DAQ link can
+drop whole blocks. FFT-based metrics assume one fixed sample rate, so they are computed on
+a series resampled to a uniform grid whenever the timing report says it is not uniform.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from signal_data import compute_metrics
+
+# An interval longer than GAP_FACTOR nominal steps counts as a gap (dropped samples)
+GAP_FACTOR = 1.5
+# Timing counts as uniform if the 95th percentile jitter stays within this fraction of a step
+UNIFORM_JITTER = 0.01
+MAX_REPORTED_GAPS = 5
+
+
+def analyze_timing(times, expected_rate_hz: float | None = None, gap_factor: float = GAP_FACTOR) -> dict:
+    """Sample-rate statistics, jitter, gaps, duplicate and out-of-order timestamps (seconds in)"""
+    t = np.asarray(times, dtype=float)
+    if t.size < 2:
+        return {"samples": int(t.size), "uniform": True}
+    dt = np.diff(t)
+    positive = dt[dt > 0]
+    if positive.size == 0:
+        return {"samples": int(t.size), "duplicates": int(dt.size), "uniform": False}
+    nominal_dt = 1.0 / expected_rate_hz if expected_rate_hz else float(np.median(positive))
+
+    gap_idx = np.flatnonzero(dt > gap_factor * nominal_dt)
+    regular = dt[(dt > 0) & (dt <= gap_factor * nominal_dt)]
+    jitter = np.abs(regular - nominal_dt)
+    missing = np.rint(dt[gap_idx] / nominal_dt) - 1
+    largest = gap_idx[np.argsort(-dt[gap_idx], kind="stable")[:MAX_REPORTED_GAPS]]
+    jitter_p95 = float(np.percentile(jitter, 95)) if jitter.size else 0.0
+    duplicates = int(np.count_nonzero(dt == 0))
+    out_of_order = int(np.count_nonzero(dt < 0))
+
+    mean_dt = float(np.mean(regular)) if regular.size else nominal_dt
+    return {
+        "samples": int(t.size),
+        "duration_s": round(float(t.max() - t.min()), 3),
+        "nominal_rate_hz": round(1.0 / nominal_dt, 3),
+        "measured_rate_hz": round(1.0 / mean_dt, 3),
+        "drift_ppm": round((mean_dt - nominal_dt) / nominal_dt * 1e6, 1),
+        "median_dt_ms": round(float(np.median(positive)) * 1000.0, 3),
+        "jitter_std_ms": round(float(np.std(regular)) * 1000.0, 3) if regular.size else 0.0,
+        "jitter_p95_ms": round(jitter_p95 * 1000.0, 3),
+        "max_dt_ms": round(float(dt.max()) * 1000.0, 3),
+        "gaps": int(gap_idx.size),
+        "gap_total_s": round(float(np.sum(dt[gap_idx])), 3),
+        "missing_samples": int(np.sum(missing)),
+        "largest_gaps": [(round(float(t[i]), 3), round(float(dt[i]), 3)) for i in largest],
+        "duplicates": duplicates,
+        "out_of_order": out_of_order,
+        "uniform": bool(gap_idx.size == 0 and duplicates == 0 and out_of_order == 0
+                        and jitter_p95 <= UNIFORM_JITTER * nominal_dt),
+    }
+
+
+def resample_uniform(times, values, rate_hz: float, max_gap_s: float | None = None):
+    """Linear interpolation of values ([n] or [n, channels]) onto a uniform grid at rate_hz.
+
+    Samples are sorted and duplicate timestamps dropped (first kept) first. With max_gap_s,
+    grid points inside gaps longer than that are NaN instead of interpolated.
+    """
+    t = np.asarray(times, dtype=float)
+    v = np.asarray(values, dtype=float)
+    if t.size < 2:
+        return t.copy(), v.copy()
+    order = np.argsort(t, kind="stable")
+    t, v = t[order], v[order]
+    t, first = np.unique(t, return_index=True)
+    v = v[first]
+    grid = t[0] + np.arange(int(np.floor((t[-1] - t[0]) * rate_hz)) + 1) / rate_hz
+    if v.ndim == 1:
+        out = np.interp(grid, t, v)
+    else:
+        out = np.column_stack([np.interp(grid, t, v[:, c]) for c in range(v.shape[1])])
+    if max_gap_s is not None:
+        gap = np.flatnonzero(np.diff(t) > max_gap_s)
+        if gap.size:
+            starts = np.searchsorted(grid, t[gap], side="right")
+            ends = np.searchsorted(grid, t[gap + 1], side="left")
+            mask = np.zeros(grid.size + 1, dtype=np.int64)
+            np.add.at(mask, starts, 1)
+            np.add.at(mask, ends, -1)
+            out[np.cumsum(mask[:-1]) > 0] = np.nan
+    return grid, out
+
+
+# Report / resampled-series cache, keyed by recording path and invalidated by (mtime, size)
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def _file_version(filepath: str):
+    try:
+        st_ = os.stat(filepath)
+        return (st_.st_mtime_ns, st_.st_size)
+    except OSError:
+        return None
+
+
+def get_uniform_series(filepath: str, times, values, version=None, expected_rate_hz: float | None = None):
+    """(grid, values, report) for a recording, with timing fixed if needed; cached per version.
+
+    `version` overrides the file's (mtime, size), as for signal_summary.get_exg_digest.
+    Uniform recordings are passed through unchanged.
+    """
+    if version is None:
+        version = _file_version(filepath)
+    key = (filepath, "series")
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and version is not None and entry[0] == version:
+            return entry[1]
+    report = analyze_timing(times, expected_rate_hz)
+    t, v = np.asarray(times, dtype=float), np.asarray(values, dtype=float)
+    if not report["uniform"] and "nominal_rate_hz" in report:
+        t, v = resample_uniform(t, v, report["nominal_rate_hz"])
+    result = (t, v, report)
+    with _cache_lock:
+        _cache[key] = (version, result)
+    return result
+
+
+def get_quality_report(filepath: str, times, version=None, expected_rate_hz: float | None = None) -> dict:
+    """Timing report only (cached like get_uniform_series)"""
+    if version is None:
+        version = _file_version(filepath)
+    key = (filepath, "report")
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and version is not None and entry[0] == version:
+            return entry[1]
+    report = analyze_timing(times, expected_rate_hz)
+    with _cache_lock:
+        _cache[key] = (version, report)
+    return report
+
+
+def uniform_metrics(filepath: str, times, values, version=None) -> tuple[dict, dict]:
+    """compute_metrics on the uniformly resampled series at its true rate, plus the timing report"""
+    t, v, report = get_uniform_series(filepath, times, values, version)
+    rate = report.get("nominal_rate_hz") or 1.0
+    if v.size == 0:
+        return {}, report
+    return compute_metrics(v, rate), report
+
+
+def format_quality(report: dict) -> str:
+    """One-line timing summary for captions and LLM context"""
+    if "nominal_rate_hz" not in report:
+        return f"Timing: {report.get('samples', 0)} samples, not enough to estimate a rate"
+    parts = [
+        f"Timing: {report['measured_rate_hz']:g} Hz measured (nominal {report['nominal_rate_hz']:g} Hz)",
+        f"jitter p95 {report['jitter_p95_ms']:g} ms",
+        f"{report['gaps']} gaps ({report['missing_samples']} samples missing)",
+    ]
+    if report["duplicates"] or report["out_of_order"]:
+        parts.append(f"{report['duplicates']} duplicate / {report['out_of_order']} out-of-order stamps")
+    if not report["uniform"]:
+        parts.append("resampled to a uniform grid for spectral metrics")
+    return ", ".join(parts)
@@ -0,0 +1,333 @@
+"""
+Signal summary module - compact, fixed-size feature digest of the three EXG channels for LLM prompts
+"""
+
+import bisect
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+# Channel roles as wired in GirlHacks_ECG_EMG_EOG.m (ai0, ai1, ai2)
+CHANNEL_ROLES = {"Signal1": "ECG", "Signal2": "EOG", "Signal3": "EMG"}
+WINDOW_S = 5.0
+BANDS_HZ = ((0.5, 4.0), (4.0, 15.0), (15.0, 40.0), (40.0, 150.0), (150.0, 500.0))
+EMG_ENVELOPE_SAMPLES = 150
+# SourceGuard hashes GUARD_PROBES runs of GUARD_SAMPLES samples spread over the data seen
+GUARD_SAMPLES = 32
+GUARD_PROBES = 16
+
+
+def estimate_sample_rate(time, default: float = 1000.0) -> float:
+    """Sample rate from the median positive time step (robust to jitter and gaps)"""
+    t = np.asarray(time, dtype=float)
+    if t.size < 2:
+        return default
+    dt = np.diff(t)
+    dt = dt[dt > 0]
+    if dt.size == 0:
+        return default
+    return float(1.0 / np.median(dt))
+
+
+def find_peaks(x: np.ndarray, min_height: float, min_distance: int) -> np.ndarray:
+    """Indices of local maxima above min_height, at least min_distance samples apart.
+
+    Candidates are found vectorised; the refractory pass keeps the tallest peak of
+    each cluster and only loops over candidates (a few per beat), not samples.
+    """
+    if x.size < 3:
+        return np.empty(0, dtype=np.int64)
+    mid = x[1:-1]
+    cand = np.flatnonzero((mid > x[:-2]) & (mid >= x[2:]) & (mid >= min_height)) + 1
+    if cand.size < 2 or min_distance <= 1:
+        return cand
+    keep: list[int] = []
+    for i in cand[np.argsort(-x[cand], kind="stable")].tolist():
+        pos = bisect.bisect_left(keep, i)
+        if (pos > 0 and i - keep[pos - 1] < min_distance) or (pos < len(keep) and keep[pos] - i < min_distance):
+            continue
+        keep.insert(pos, i)
+    return np.asarray(keep, dtype=np.int64)
+
+
+def rms_envelope(x: np.ndarray, win: int) -> np.ndarray:
+    """Moving RMS over win samples (same length as x), via cumulative sums"""
+    if x.size == 0:
+        return x.astype(float)
+    win = max(1, min(win, x.size))
+    c = np.concatenate(([0.0], np.cumsum(np.square(x, dtype=float))))
+    env = np.sqrt(np.maximum((c[win:] - c[:-win]) / win, 0.0))
+    pad = win - 1
+    return np.concatenate((np.full(pad // 2, env[0]), env, np.full(pad - pad // 2, env[-1])))
+
+
+def band_powers(x: np.ndarray, sample_rate_hz: float, bands=BANDS_HZ) -> np.ndarray:
+    """Relative spectral power per band (sums to <= 1; DC excluded)"""
+    if x.size < 4:
+        return np.zeros(len(bands))
+    spectrum = np.square(np.abs(np.fft.rfft(x - np.mean(x))))
+    freqs = np.fft.rfftfreq(x.size, d=1.0 / sample_rate_hz)
+    total = float(np.sum(spectrum[1:]))
+    if total <= 0:
+        return np.zeros(len(bands))
+    return np.array([float(np.sum(spectrum[(freqs >= lo) & (freqs < hi)])) / total for lo, hi in bands])
+
+
+class ExgSummarizer:
+    """Incremental digest of an ECG/EOG/EMG recording.
+
+    Samples are processed in fixed windows; each completed window is reduced to a handful
+    of numbers once and never revisited, so updating after new data arrives only costs
+    the new windows plus the (bounded) unfinished tail.
+    """
+
+    def __init__(self, sample_rate_hz: float, window_s: float = WINDOW_S):
+        self.sample_rate_hz = float(sample_rate_hz)
+        self.window = max(int(round(window_s * self.sample_rate_hz)), 8)
+        self.cursor = 0
+        self.windows: list[dict] = []
+        # HRV running sums (beats bridge window boundaries through last_peak/last_rr)
+        self._last_peak = None
+        self._last_rr = None
+        self._rr = np.zeros(3)        # count, sum, sum of squares
+        self._rr_diff = np.zeros(2)   # count, sum of squared successive differences
+
+    def update(self, ecg, eog, emg, start_index: int = 0) -> None:
+        """Consume all complete windows past the cursor.
+
+        The arrays hold samples start_index onwards (0 for a whole recording; a ring window
+        that has slid forward starts later). Windows overwritten before they were consumed
+        are skipped.
+        """
+        ecg, eog, emg = (np.asarray(a, dtype=float) for a in (ecg, eog, emg))
+        end = start_index + min(ecg.size, eog.size, emg.size)
+        if self.cursor < start_index:
+            self.cursor += -(-(start_index - self.cursor) // self.window) * self.window
+            self._last_peak = self._last_rr = None   # no RR interval across the gap
+        while self.cursor + self.window <= end:
+            s = slice(self.cursor - start_index, self.cursor - start_index + self.window)
+            self.windows.append(self._window_features(ecg[s], eog[s], emg[s], self.cursor, commit=True))
+            self.cursor += self.window
+
+    def digest(self, ecg=None, eog=None, emg=None, start_index: int = 0) -> dict:
+        """Fixed-size digest over all completed windows plus the current tail, if given"""
+        windows = list(self.windows)
+        if ecg is not None:
+            tail = slice(max(self.cursor - start_index, 0), min(len(ecg), len(eog), len(emg)))
+            if tail.stop - tail.start >= self.window // 4:
+                arrays = (np.asarray(a[tail], dtype=float) for a in (ecg, eog, emg))
+                windows.append(self._window_features(*arrays, start_index + tail.start, commit=False))
+        if not windows:
+            return {}
+
+        fs = self.sample_rate_hz
+        duration_s = sum(w["n"] for w in windows) / fs
+        minutes = duration_s / 60.0
+        beats = sum(w["beats"] for w in windows)
+        blinks = sum(w["blinks"] for w in windows)
+        activations = sum(w["activations"] for w in windows)
+        n_rr, sum_rr, sum_rr2 = self._rr
+        hr_bpm = 60.0 * n_rr / sum_rr if sum_rr > 0 else beats / minutes if minutes > 0 else 0.0
+        sdnn = np.sqrt(max(sum_rr2 / n_rr - (sum_rr / n_rr) ** 2, 0.0)) if n_rr > 1 else 0.0
+        rmssd = np.sqrt(self._rr_diff[1] / self._rr_diff[0]) if self._rr_diff[0] > 0 else 0.0
+        weights = np.array([w["n"] for w in windows], dtype=float)
+        bands = {}
+        for role in CHANNEL_ROLES.values():
+            per_window = np.array([w["bands"][role] for w in windows])
+            bands[role] = [round(float(v), 3) for v in weights @ per_window / weights.sum()]
+
+        return {
+            "duration_s": round(duration_s, 1),
+            "sample_rate_hz": round(fs, 1),
+            "windows": len(windows),
+            "ecg": {
+                "beats": int(beats),
+                "hr_bpm": round(float(hr_bpm), 1),
+                "sdnn_ms": round(float(sdnn) * 1000.0, 1),
+                "rmssd_ms": round(float(rmssd) * 1000.0, 1),
+            },
+            "eog": {
+                "blinks": int(blinks),
+                "blink_rate_per_min": round(blinks / minutes, 1) if minutes > 0 else 0.0,
+            },
+            "emg": {
+                "activations": int(activations),
+                "activation_rate_per_min": round(activations / minutes, 1) if minutes > 0 else 0.0,
+                "rms_mean": round(float(np.average([w["emg_rms"] for w in windows], weights=weights)), 4),
+                "rms_max": round(float(max(w["emg_rms_max"] for w in windows)), 4),
+            },
+            "bands": bands,
+            "trends": {
+                "hr_bpm_per_min": _slope_per_min(windows, "hr_bpm", fs),
+                "blinks_per_min_per_min": _slope_per_min(windows, "blink_rate", fs),
+                "emg_rms_per_min": _slope_per_min(windows, "emg_rms", fs),
+            },
+        }
+
+    def _window_features(self, ecg, eog, emg, start: int, commit: bool) -> dict:
+        fs = self.sample_rate_hz
+        minutes = ecg.size / fs / 60.0
+
+        # ECG: R peaks above mean + 0.5 std (as in the MATLAB script), <= 180 bpm
+        peaks = find_peaks(ecg, float(np.mean(ecg) + 0.5 * np.std(ecg)), int(0.33 * fs))
+        if commit and peaks.size:
+            self._accumulate_rr(peaks + start)
+        rr = np.diff(peaks) / fs
+        rr = rr[(rr > 0.3) & (rr < 2.0)]
+        hr_bpm = 60.0 / float(np.mean(rr)) if rr.size else 0.0
+
+        # EOG: blinks above mean + 0.9 std, >= 0.7 s apart (as in the MATLAB script)
+        blinks = find_peaks(eog, float(np.mean(eog) + 0.9 * np.std(eog)), int(0.7 * fs)).size
+
+        # EMG: rising edges of the RMS envelope through mean + 1 std, held >= 100 ms
+        env = rms_envelope(emg - np.mean(emg), EMG_ENVELOPE_SAMPLES)
+        active = env > float(np.mean(env) + np.std(env))
+        onsets = np.flatnonzero(active[1:] & ~active[:-1]) + 1
+        offsets = np.flatnonzero(~active[1:] & active[:-1]) + 1
+        idx = np.searchsorted(offsets, onsets, side="right")
+        ends = np.full(onsets.size, active.size)
+        has_end = idx < offsets.size
+        ends[has_end] = offsets[idx[has_end]]
+        activations = int(np.count_nonzero(ends - onsets >= int(0.1 * fs)))
+
+        bands = {
+            "ECG": band_powers(ecg, fs),
+            "EOG": band_powers(eog, fs),
+            "EMG": band_powers(emg, fs),
+        }
+        return {
+            "start": start,
+            "n": ecg.size,
+            "beats": int(peaks.size),
+            "hr_bpm": hr_bpm,
+            "blinks": int(blinks),
+            "blink_rate": blinks / minutes if minutes > 0 else 0.0,
+            "activations": activations,
+            "emg_rms": float(np.mean(env)),
+            "emg_rms_max": float(np.max(env)) if env.size else 0.0,
+            "bands": bands,
+        }
+
+    def _accumulate_rr(self, peaks: np.ndarray) -> None:
+        if self._last_peak is not None:
+            peaks = np.concatenate(([self._last_peak], peaks))
+        self._last_peak = int(peaks[-1])
+        rr = np.diff(peaks) / self.sample_rate_hz
+        rr = rr[(rr > 0.3) & (rr < 2.0)]
+        if rr.size == 0:
+            return
+        self._rr += (rr.size, rr.sum(), np.square(rr).sum())
+        chained = np.concatenate(([self._last_rr], rr)) if self._last_rr is not None else rr
+        diffs = np.diff(chained)
+        self._rr_diff += (diffs.size, np.square(diffs).sum())
+        self._last_rr = float(rr[-1])
+
+
+def _slope_per_min(windows: list[dict], key: str, sample_rate_hz: float) -> float:
+    """Least-squares trend of a per-window feature, in units per minute"""
+    if len(windows) < 2:
+        return 0.0
+    x = np.array([w["start"] for w in windows], dtype=float) / sample_rate_hz / 60.0
+    y = np.array([w[key] for w in windows], dtype=float)
+    return round(float(np.polyfit(x, y, 1)[0]), 3)
+
+
+def _hash_samples(arrays, lo: int, hi: int) -> bytes:
+    h = hashlib.blake2b(digest_size=8)
+    for a in arrays:
+        h.update(np.ascontiguousarray(a[lo:hi], dtype=np.float64).tobytes())
+    return h.digest()
+
+
+class SourceGuard:
+    """Tells data that was appended to from data that was rewritten, between two calls.
+
+    remember() hashes a few short runs of samples: the first ones the arrays hold, the last
+    ones seen and some evenly spaced in between. Indices are absolute, so a ring window that
+    slid forward still lines up. The cost does not depend on the length of the data, at the
+    price of missing a rewrite that leaves every probed run unchanged. appended() is True only
+    if the source did not get shorter and every remembered range it still holds hashes the
+    same. Caches that continue from a cursor start over otherwise. This catches a
+    same-length rewrite (GirlHacks_ECG_EMG_EOG.m rewrites the JSON file segment by segment)
+    as well as a ring that was reset and reloaded.
+    """
+
+    def __init__(self):
+        self.ranges: list[tuple[int, int, bytes]] = []
+        self.end = 0
+
+    def appended(self, arrays, start_index: int = 0) -> bool:
+        end = start_index + min(len(a) for a in arrays)
+        if end < self.end:
+            return False
+        for lo, hi, digest in self.ranges:
+            if lo >= start_index and hi <= end and _hash_samples(arrays, lo - start_index, hi - start_index) != digest:
+                return False
+        return True
+
+    def remember(self, arrays, start_index: int = 0) -> None:
+        n = min(len(a) for a in arrays)
+        starts = np.unique(np.linspace(0, max(n - GUARD_SAMPLES, 0), GUARD_PROBES).astype(int))
+        self.ranges = [(start_index + lo, start_index + min(lo + GUARD_SAMPLES, n),
+                        _hash_samples(arrays, lo, min(lo + GUARD_SAMPLES, n))) for lo in starts.tolist()]
+        self.end = start_index + n
+
+
+# Digest cache, keyed by recording path and invalidated by (mtime, size)
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def get_exg_digest(filepath: str, time, ecg, eog, emg, version=None, start_index: int = 0) -> dict:
+    """Digest for a recording, recomputed only for data added since the last call.
+
+    If the file changed but samples were only appended, the cached summarizer continues
+    from its cursor. If it was rewritten (shorter, or the samples already seen differ) it
+    starts over. `version` overrides the file's (mtime, size) for sources that are not
+    files, such as a shared-memory ring, whose arrays then start at sample start_index.
+    """
+    if version is None:
+        try:
+            st_ = os.stat(filepath)
+            version = (st_.st_mtime_ns, st_.st_size)
+        except OSError:
+            version = None
+    n = min(len(ecg), len(eog), len(emg))
+    signals = (ecg[:n], eog[:n], emg[:n])
+    # Timestamps are part of what must stay unchanged, when there is one per sample
+    arrays = signals + (time[:n],) if len(time) >= n else signals
+    with _cache_lock:
+        entry = _cache.get(filepath)
+        if entry is not None and version is not None and entry["version"] == version:
+            return entry["digest"]
+        if entry is None or not entry["guard"].appended(arrays, start_index):
+            entry = {"summarizer": ExgSummarizer(estimate_sample_rate(time)), "guard": SourceGuard()}
+            _cache[filepath] = entry
+        summarizer = entry["summarizer"]
+        summarizer.update(*signals, start_index)
+        entry["digest"] = summarizer.digest(*signals, start_index)
+        entry["guard"].remember(arrays, start_index)
+        entry["version"] = version
+        return entry["digest"]
+
+
+def format_digest(digest: dict) -> str:
+    """Render a digest as a few compact lines (size does not depend on recording length)"""
+    if not digest:
+        return "No signal data available"
+    ecg, eog, emg, trends = digest["ecg"], digest["eog"], digest["emg"], digest["trends"]
+    band_names = ", ".join(f"{lo:g}-{hi:g}" for lo, hi in BANDS_HZ)
+    lines = [
+        f"Recording: {digest['duration_s']} s at {digest['sample_rate_hz']} Hz ({digest['windows']} windows)",
+        f"- ECG: HR {ecg['hr_bpm']} bpm, SDNN {ecg['sdnn_ms']} ms, RMSSD {ecg['rmssd_ms']} ms, {ecg['beats']} beats",
+        f"- EOG: {eog['blinks']} blinks ({eog['blink_rate_per_min']}/min)",
+        f"- EMG: {emg['activations']} activations ({emg['activation_rate_per_min']}/min), "
+        f"RMS mean {emg['rms_mean']}, max {emg['rms_max']}",
+        f"- Relative band power ({band_names} Hz): "
+        + "; ".join(f"{role} {values}" for role, values in digest["bands"].items()),
+        f"- Trends per minute: HR {trends['hr_bpm_per_min']:+} bpm, blinks {trends['blinks_per_min_per_min']:+}/min, "
+        f"EMG RMS {trends['emg_rms_per_min']:+}",
+    ]
+    return "\n".join(lines)
@@ -3,6 +3,7 @@ import time
 import json  # for JSON serialization
 import argparse  # CLI arguments
 from datetime import datetime, timezone  # ISO timestamp generation
+from replay import positive_speed  # --speed validation
 
 # Generate example signal (sine + noise)
 fs = 1000  # sample rate Hz (one-off demo mode only)
@@ -24,17 +25,57 @@ def main():
     parser.add_argument("--interval", type=float, default=0.05, help="Output interval seconds, default 0.05s")
     parser.add_argument("--duration", type=float, default=None, help="Total streaming duration in seconds (stream mode only). If omitted, infinite")
     parser.add_argument("--outfile", type=str, default="output.jsonl", help="Output file path, default output.jsonl")
+    parser.add_argument("--replay", type=str, default=None, help="Stream a stored recording (.json/.jsonl/.exgbin/.exga) instead of a sine")
+    parser.add_argument("--speed", type=positive_speed, default=1.0, help="Replay speed multiple, e.g. 10 or 100 (replay mode only)")
+    parser.add_argument("--channel", type=str, default=None, help="Recording channel to write (replay mode only), default first")
+    parser.add_argument("--segment-mb", type=float, default=None, help="Rotate output into segments of this size (MB), with a manifest")
+    parser.add_argument("--segment-minutes", type=float, default=None, help="Rotate output into segments of this duration")
+    parser.add_argument("--keep-segments", type=int, default=None, help="Delete the oldest segments beyond this many (segmented output)")
+    parser.add_argument("--keep-mb", type=float, default=None, help="Delete the oldest segments beyond this total size (segmented output)")
     args = parser.parse_args()
 
     output_path = args.outfile
 
+    def open_output():
+        """Plain file (truncated), or a rotating segmented stream when --segment-* is given"""
+        if args.segment_mb is None and args.segment_minutes is None:
+            return open(output_path, "w", encoding="utf-8")
+        from segmented_output import SegmentedWriter
+
+        return SegmentedWriter(
+            output_path,
+            max_bytes=int(args.segment_mb * 1024 * 1024) if args.segment_mb else None,
+            max_age_s=args.segment_minutes * 60.0 if args.segment_minutes else None,
+            keep_segments=args.keep_segments,
+            keep_bytes=int(args.keep_mb * 1024 * 1024) if args.keep_mb else None,
+        )
+
+    if args.replay:
+        # Replay: recorded samples at N x real time, stamped with the wall clock like stream mode
+        from exg_archive import load_rows
+        from replay import JsonlSink, channel_index, format_report, replay
+
+        columns, rows = load_rows(args.replay)
+        try:
+            index = channel_index(columns, args.channel)
+        except ValueError as e:
+            parser.error(str(e))
+        sink = JsonlSink(output_path, index, fp=open_output())
+        try:
+            report = replay(rows[:, 0], rows[:, 1:], sink, args.speed, wall_clock=True)
+        finally:
+            sink.close()
+        print(format_report(report))
+        print(f"saved json lines to {output_path}")
+        return
+
     if args.stream:
         # Streaming: generate sine + noise samples in real time
         freq_hz = 5.0
         phase = 0.0
         start_ts = time.time()
         two_pi = 2.0 * np.pi
-        with open(output_path, "w", encoding="utf-8") as fp:
+        with open_output() as fp:
             try:
                 while True:
                     if args.duration is not None and (time.time() - start_ts) >= args.duration:
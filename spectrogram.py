@@ -0,0 +1,194 @@
+"""
+Spectrogram module - incremental STFT per channel, kept as a bounded ring of frames and rendered as an image
+
+Each update only transforms the hops that arrived since the last one, so a live view costs
+O(new samples) per rerun. Frames for recordings read from files are also saved under
+SPECTROGRAM_CACHE_DIR, keyed by path, file version and STFT parameters, so a new server
+process (or a reopened session) loads them instead of recomputing.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from instrumentation import timed
+from signal_summary import SourceGuard
+
+NPERSEG = 256
+HOP = 64
+MAX_FRAMES = 600
+DYNAMIC_RANGE_DB = 60.0
+CACHE_DIR = os.getenv("SPECTROGRAM_CACHE_DIR", os.path.join(".cache", "spectrograms"))
+
+# Perceptually ordered colour ramp (viridis anchors), expanded to a 256-entry lookup table
+_ANCHORS = np.array([
+    [68, 1, 84], [72, 40, 120], [62, 74, 137], [49, 104, 142], [38, 130, 142],
+    [31, 158, 137], [53, 183, 121], [109, 205, 89], [180, 222, 44], [253, 231, 37],
+], dtype=float)
+_LUT = np.stack([np.interp(np.linspace(0, 1, 256), np.linspace(0, 1, len(_ANCHORS)), _ANCHORS[:, c])
+                 for c in range(3)], axis=1).astype(np.uint8)
+
+
+class IncrementalStft:
+    """Hann-windowed STFT frames in a fixed-size ring (oldest frames dropped first)"""
+
+    def __init__(self, sample_rate_hz: float, nperseg: int = NPERSEG, hop: int = HOP, max_frames: int = MAX_FRAMES):
+        self.sample_rate_hz = float(sample_rate_hz)
+        self.nperseg = nperseg
+        self.hop = hop
+        self.max_frames = max_frames
+        self.window = np.hanning(nperseg).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(nperseg, d=1.0 / self.sample_rate_hz)
+        self._power = np.zeros((max_frames, self.freqs.size), dtype=np.float32)  # dB
+        self._starts = np.zeros(max_frames, dtype=np.int64)   # absolute sample index of each frame
+        self.count = 0        # frames ever computed (ring position = count % max_frames)
+        self.cursor = 0       # absolute sample index of the next frame start
+
+    def update(self, x, start_index: int = 0) -> int:
+        """Add frames for hops that became complete; x[0] is absolute sample start_index.
+
+        Returns the number of new frames. If samples before the cursor were dropped (ring
+        buffers) the cursor skips ahead to the first hop still available.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        end = start_index + x.size
+        if self.cursor < start_index:
+            self.cursor += -(-(start_index - self.cursor) // self.hop) * self.hop
+        n_new = (end - self.cursor - self.nperseg) // self.hop + 1 if end - self.cursor >= self.nperseg else 0
+        if n_new <= 0:
+            return 0
+        # Only the newest max_frames can survive in the ring; skip computing the rest
+        skip = max(0, n_new - self.max_frames)
+        first = self.cursor + skip * self.hop
+        n_compute = n_new - skip
+        local = first - start_index
+        segment = x[local:local + (n_compute - 1) * self.hop + self.nperseg]
+        frames = np.lib.stride_tricks.sliding_window_view(segment, self.nperseg)[::self.hop]
+        spectrum = np.fft.rfft((frames - frames.mean(axis=1, keepdims=True)) * self.window, axis=1)
+        power_db = (10.0 * np.log10(np.square(np.abs(spectrum)) + 1e-12)).astype(np.float32)
+        starts = first + np.arange(n_compute, dtype=np.int64) * self.hop
+        slots = (self.count + skip + np.arange(n_compute)) % self.max_frames
+        self._power[slots] = power_db
+        self._starts[slots] = starts
+        self.count += n_new
+        self.cursor += n_new * self.hop
+        return n_new
+
+    def frames(self):
+        """(frame centre times in s, freqs, power dB [frames, freqs]) in time order"""
+        n = min(self.count, self.max_frames)
+        order = (np.arange(self.count - n, self.count)) % self.max_frames
+        times = (self._starts[order] + self.nperseg / 2) / self.sample_rate_hz
+        return times, self.freqs, self._power[order]
+
+    def state(self) -> dict:
+        times, _, power = self.frames()
+        n = times.size
+        return {
+            "params": np.array([self.sample_rate_hz, self.nperseg, self.hop, self.max_frames], dtype=np.float64),
+            "starts": self._starts[(np.arange(self.count - n, self.count)) % self.max_frames],
+            "power": power,
+            "counters": np.array([self.count, self.cursor], dtype=np.int64),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        fs, nperseg, hop, max_frames = state["params"]
+        stft = cls(fs, int(nperseg), int(hop), int(max_frames))
+        stft.count, stft.cursor = (int(v) for v in state["counters"])
+        n = state["power"].shape[0]
+        slots = (np.arange(stft.count - n, stft.count)) % stft.max_frames
+        stft._power[slots] = state["power"]
+        stft._starts[slots] = state["starts"]
+        return stft
+
+
+def render_image(times, freqs, power_db, max_freq_hz: float | None = None,
+                 dynamic_range_db: float = DYNAMIC_RANGE_DB) -> np.ndarray:
+    """RGB uint8 image [freq bins, frames, 3] with low frequencies at the bottom"""
+    if power_db.size == 0:
+        return np.zeros((1, 1, 3), dtype=np.uint8)
+    if max_freq_hz is not None:
+        power_db = power_db[:, freqs <= max_freq_hz]
+    top = float(power_db.max())
+    scaled = np.clip((power_db - (top - dynamic_range_db)) / dynamic_range_db, 0.0, 1.0)
+    return _LUT[(scaled.T[::-1] * 255).astype(np.uint8)]
+
+
+def _cache_file(filepath: str, channel: str, version, params) -> str:
+    key = json.dumps([os.path.abspath(filepath), channel, list(version), list(params)])
+    return os.path.join(CACHE_DIR, hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest() + ".npz")
+
+
+def _save(path: str, stft: IncrementalStft) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **stft.state())
+        os.replace(tmp, path)
+    except OSError:
+        pass  # read-only checkout: the in-process cache still works
+
+
+# In-process cache: (path, channel, params) -> {"stft", "version"}
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+@timed("get_spectrogram")
+def get_spectrogram(filepath: str, channel: str, samples, sample_rate_hz: float, version=None,
+                    start_index: int = 0, nperseg: int = NPERSEG, hop: int = HOP,
+                    max_frames: int = MAX_FRAMES) -> IncrementalStft:
+    """Up-to-date STFT for one channel of a recording.
+
+    Same caching contract as signal_summary.get_exg_digest: `version` defaults to the file's
+    (mtime, size) and only then are frames persisted to disk; pass an explicit version
+    (e.g. a shared ring's total) for live sources, with start_index = absolute index of
+    samples[0] when older samples have been dropped.
+    """
+    persist = version is None
+    if version is None:
+        try:
+            st_ = os.stat(filepath)
+            version = (st_.st_mtime_ns, st_.st_size)
+        except OSError:
+            version, persist = None, False
+    params = (float(sample_rate_hz), nperseg, hop, max_frames)
+    key = (filepath, channel, params)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and version is not None and entry["version"] == version:
+            return entry["stft"]
+        if entry is None and persist:
+            try:
+                path = _cache_file(filepath, channel, version, params)
+                with np.load(path) as z:
+                    entry = {"stft": IncrementalStft.from_state(z), "version": version, "file": path}
+                _cache[key] = entry
+                return entry["stft"]
+            except (OSError, KeyError, ValueError):
+                pass
+        # Frames loaded from disk carry no guard, so a later version of that file starts over
+        if entry is None or "guard" not in entry or not entry["guard"].appended((samples,), start_index):
+            # New, or the source was rewritten rather than appended to: start over
+            entry = {"stft": IncrementalStft(sample_rate_hz, nperseg, hop, max_frames), "guard": SourceGuard(),
+                     "file": entry.get("file") if entry else None}
+            _cache[key] = entry
+        stft = entry["stft"]
+        stft.update(samples, start_index)
+        entry["guard"].remember((samples,), start_index)
+        entry["version"] = version
+        previous_file = entry.get("file")
+        if persist:
+            entry["file"] = _cache_file(filepath, channel, version, params)
+    if persist:
+        _save(entry["file"], stft)
+        if previous_file and previous_file != entry["file"]:
+            try:
+                os.remove(previous_file)  # frames for an older version of the file
+            except OSError:
+                pass
+    return stft
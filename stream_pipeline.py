@@ -0,0 +1,335 @@
+"""
+Stream pipeline - in-process stages connected by bounded queues with an explicit overflow policy
+
+    pipe = Pipeline([Stage("filter", BaselineFilter()), Stage("features", block_features)],
+                    capacity=64, policy="drop_oldest")
+    pipe.start()
+    pipe.ingest(rows)                 # [n, 1 + channels] float64 blocks, time first
+    rows, features = pipe.snapshot()  # what the UI shows
+    pipe.stats()                      # per-stage depth, lag and drop counters
+
+Every queue holds at most `capacity` blocks, so a slow stage can never grow memory or
+latency without bound. What happens when a queue is full is the policy:
+  block        the producer waits (for a socket reader this becomes TCP backpressure)
+  drop_oldest  the oldest queued block is discarded (freshest data wins, gaps appear)
+  decimate     the two oldest queued blocks are merged at half resolution (coverage kept,
+               detail lost)
+The last stage feeds a snapshot: a fixed-size ring of the newest rows plus the newest features.
+acquisition_bridge --pipeline runs publish -> filter -> features -> snapshot and saves
+write_status() to STATUS_PATH, which the Signal Insights debug panel renders.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+POLICIES = ("block", "drop_oldest", "decimate")
+DEFAULT_CAPACITY = 64
+DEFAULT_SNAPSHOT_ROWS = 20_000
+# Recent lag samples kept per stage for the percentiles in stats()
+_LAG_WINDOW = 512
+# Stats + newest features written by acquisition_bridge, read by the page's debug panel
+STATUS_PATH = os.getenv("BRIDGE_STATUS_PATH", os.path.join(".cache", "bridge_status.json"))
+
+
+class Block:
+    """Rows travelling through the pipeline, stamped with their ingest time (monotonic)"""
+
+    __slots__ = ("rows", "ingested", "features")
+
+    def __init__(self, rows, ingested=None, features=None):
+        self.rows = rows
+        self.ingested = time.monotonic() if ingested is None else ingested
+        self.features = features
+
+
+class BoundedQueue:
+    """Thread-safe FIFO of Blocks with a fixed capacity and an overflow policy"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, policy: str = "block"):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy {policy!r} (use one of {', '.join(POLICIES)})")
+        self.capacity = max(1, int(capacity))
+        self.policy = policy
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self.closed = False
+        self.put_blocks = 0
+        self.dropped_blocks = 0
+        self.dropped_samples = 0
+        self.decimated_samples = 0
+        self.blocked_s = 0.0
+        self.max_depth = 0
+
+    def put(self, block: Block, timeout: float | None = None) -> bool:
+        """Enqueue according to the policy; False if closed (or timed out under "block")"""
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._items) >= self.capacity:
+                if self.policy == "block":
+                    start = time.monotonic()
+                    ok = self._cond.wait_for(lambda: len(self._items) < self.capacity or self.closed, timeout)
+                    self.blocked_s += time.monotonic() - start
+                    if not ok or self.closed:
+                        return False
+                elif self.policy == "drop_oldest":
+                    old = self._items.popleft()
+                    self.dropped_blocks += 1
+                    self.dropped_samples += len(old.rows)
+                elif len(self._items) >= 2:
+                    first = self._items.popleft()
+                    self._items[0] = self._halve(first, self._items[0])
+                else:
+                    block = self._halve(self._items.popleft(), block)
+            self._items.append(block)
+            self.put_blocks += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def _halve(self, older: Block, newer: Block) -> Block:
+        rows = np.concatenate((older.rows, newer.rows))
+        kept = rows[::2]
+        self.decimated_samples += len(rows) - len(kept)
+        return Block(kept, older.ingested, newer.features)
+
+    def get(self, timeout: float | None = None):
+        """Next Block, or None once closed and drained (or on timeout)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                return None
+            if not self._items:
+                return None
+            block = self._items.popleft()
+            self._cond.notify_all()
+            return block
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Stage:
+    """Named processing step: fn(Block) -> Block (or None to drop it), run on its own thread"""
+
+    def __init__(self, name: str, fn, capacity: int | None = None, policy: str | None = None):
+        self.name = name
+        self.fn = fn
+        self.capacity = capacity
+        self.policy = policy
+        self.queue = None
+        self.processed = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.lags = deque(maxlen=_LAG_WINDOW)   # seconds from ingest to this stage picking it up
+        self.last_error = None
+
+
+class Snapshot:
+    """Newest rows (fixed-size ring) and newest features, read by the UI"""
+
+    def __init__(self, rows: int = DEFAULT_SNAPSHOT_ROWS):
+        self.capacity = rows
+        self._rows = None
+        self._total = 0
+        self.features = None
+        self.updated = None
+        self.lags = deque(maxlen=_LAG_WINDOW)   # end-to-end seconds, ingest -> snapshot
+        self._lock = threading.Lock()
+
+    def update(self, block: Block) -> None:
+        rows = np.asarray(block.rows, dtype=np.float64)[-self.capacity:]
+        with self._lock:
+            if self._rows is None or self._rows.shape[1] != rows.shape[1]:
+                self._rows, self._total = np.zeros((self.capacity, rows.shape[1])), 0
+            slots = (self._total + np.arange(len(rows))) % self.capacity
+            self._rows[slots] = rows
+            self._total += len(rows)
+            if block.features is not None:
+                self.features = block.features
+            self.updated = time.monotonic()
+            self.lags.append(self.updated - block.ingested)
+
+    def latest(self, n: int | None = None):
+        """(rows [k, columns] oldest first, features) - copies, safe to keep"""
+        with self._lock:
+            if self._rows is None:
+                return np.empty((0, 0)), self.features
+            k = min(self._total, self.capacity, n or self.capacity)
+            order = (self._total - k + np.arange(k)) % self.capacity
+            return self._rows[order].copy(), self.features
+
+
+class Pipeline:
+    """ingest -> stages... -> snapshot, one thread per stage, bounded queues in between"""
+
+    def __init__(self, stages, capacity: int = DEFAULT_CAPACITY, policy: str = "drop_oldest",
+                 snapshot_rows: int = DEFAULT_SNAPSHOT_ROWS):
+        self.stages = list(stages)
+        for stage in self.stages:
+            stage.queue = BoundedQueue(stage.capacity or capacity, stage.policy or policy)
+        self.output = Stage("snapshot", None)
+        self.output.queue = BoundedQueue(capacity, policy)
+        self.snapshot_buffer = Snapshot(snapshot_rows)
+        self.ingested_blocks = 0
+        self.ingested_samples = 0
+        self._threads = []
+
+    def start(self):
+        chain = self.stages + [self.output]
+        for stage, downstream in zip(chain, chain[1:] + [None]):
+            thread = threading.Thread(target=self._run, args=(stage, downstream),
+                                      name=f"pipeline-{stage.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _run(self, stage: Stage, downstream: Stage | None):
+        while True:
+            block = stage.queue.get()
+            if block is None:
+                break
+            stage.lags.append(time.monotonic() - block.ingested)
+            start = time.perf_counter()
+            try:
+                if downstream is None:
+                    self.snapshot_buffer.update(block)
+                    out = None
+                else:
+                    out = stage.fn(block)
+            except Exception as e:  # a bad block must not stop the stream
+                stage.errors += 1
+                stage.last_error = repr(e)
+                out = None
+            stage.busy_s += time.perf_counter() - start
+            stage.processed += 1
+            if out is not None:
+                downstream.queue.put(out)
+        if downstream is not None:
+            downstream.queue.close()
+
+    def ingest(self, rows, timeout: float | None = None) -> bool:
+        """Feed one block into the first stage (may wait under the "block" policy)"""
+        rows = np.asarray(rows, dtype=np.float64)
+        first = self.stages[0] if self.stages else self.output
+        ok = first.queue.put(Block(rows), timeout)
+        if ok:
+            self.ingested_blocks += 1
+            self.ingested_samples += len(rows)
+        return ok
+
+    def snapshot(self, n: int | None = None):
+        return self.snapshot_buffer.latest(n)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Stop accepting input, let the stages drain, join the threads"""
+        (self.stages[0] if self.stages else self.output).queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> list[dict]:
+        """Per-stage counters: queue depth, lag (ms from ingest), drops, decimation, back-pressure"""
+        rows = []
+        for stage in self.stages + [self.output]:
+            q = stage.queue
+            lags = np.fromiter(stage.lags, dtype=float) * 1000.0
+            rows.append({
+                "stage": stage.name,
+                "policy": q.policy,
+                "depth": len(q),
+                "capacity": q.capacity,
+                "max_depth": q.max_depth,
+                "processed": stage.processed,
+                "lag_p50_ms": round(float(np.percentile(lags, 50)), 3) if lags.size else 0.0,
+                "lag_p95_ms": round(float(np.percentile(lags, 95)), 3) if lags.size else 0.0,
+                "lag_max_ms": round(float(lags.max()), 3) if lags.size else 0.0,
+                "dropped_blocks": q.dropped_blocks,
+                "dropped_samples": q.dropped_samples,
+                "decimated_samples": q.decimated_samples,
+                "blocked_s": round(q.blocked_s, 3),
+                "busy_s": round(stage.busy_s, 3),
+                "errors": stage.errors,
+            })
+        return rows
+
+
+def format_stats(stats: list[dict]) -> str:
+    """One line per stage for logs"""
+    return "\n".join(
+        f"{s['stage']:>10}: depth {s['depth']}/{s['capacity']} (max {s['max_depth']}), "
+        f"lag p95 {s['lag_p95_ms']:g} ms, dropped {s['dropped_samples']} samples, "
+        f"decimated {s['decimated_samples']}, blocked {s['blocked_s']:g} s"
+        for s in stats)
+
+
+def write_status(path: str, pipeline: Pipeline) -> None:
+    """Stats and newest features as JSON (tmp + os.replace), for readers in other processes"""
+    _, features = pipeline.snapshot(1)
+    status = {"updated": time.time(), "stats": pipeline.stats(), "features": features}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp, path)
+
+
+def render_status_panel(path: str = STATUS_PATH) -> None:
+    """Sidebar panel with the acquisition bridge's stage stats and newest features, if it runs"""
+    import streamlit as st
+
+    status = read_status(path)
+    if status is None:
+        return
+    with st.sidebar.expander("Debug: acquisition pipeline", expanded=False):
+        st.caption(f"Updated {time.time() - status['updated']:.0f} s ago")
+        st.code(format_stats(status["stats"]), language=None)
+        if status.get("features"):
+            st.json(status["features"], expanded=False)
+
+
+def read_status(path: str = STATUS_PATH):
+    """Status written by write_status(), or None if there is none (or it is being replaced)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class BaselineFilter:
+    """Removes each channel's slowly varying baseline (EMA of block means); time column untouched"""
+
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
+        self.baseline = None
+
+    def __call__(self, block: Block) -> Block:
+        rows = block.rows
+        if len(rows) == 0:
+            return block
+        means = rows[:, 1:].mean(axis=0)
+        self.baseline = means if self.baseline is None else self.baseline + self.alpha * (means - self.baseline)
+        out = rows.copy()
+        out[:, 1:] -= self.baseline
+        return Block(out, block.ingested, block.features)
+
+
+def block_features(block: Block) -> Block:
+    """Per-channel RMS and peak-to-peak of the block, attached as block.features"""
+    values = block.rows[:, 1:]
+    if len(values):
+        block.features = {
+            "time": float(block.rows[-1, 0]),
+            "rms": np.sqrt(np.mean(np.square(values), axis=0)).round(6).tolist(),
+            "peak_to_peak": np.ptp(values, axis=0).round(6).tolist(),
+        }
+    return block
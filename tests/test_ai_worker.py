@@ -0,0 +1,39 @@
+import threading
+import time
+
+import ai_worker
+from ai_worker import MAX_INFLIGHT, MAX_PENDING, submit_ai_request
+
+
+class _BlockingHandler:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def iter_response(self, messages):
+        self.release.wait(5)
+        yield "ok"
+
+
+def test_pending_requests_are_bounded_and_cancel_frees_a_slot():
+    handler = _BlockingHandler()
+    running = [submit_ai_request(handler, []) for _ in range(MAX_INFLIGHT)]
+    deadline = time.monotonic() + 5
+    while any(job.status != "running" for job in running) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    try:
+        pending = [submit_ai_request(handler, []) for _ in range(MAX_PENDING)]
+        assert all(job.status == "queued" for job in pending)
+
+        rejected = submit_ai_request(handler, [])
+        assert rejected.status == "error" and rejected.done()
+
+        pending[0].cancel()
+        assert pending[0].status == "cancelled"
+        replacement = submit_ai_request(handler, [])
+        assert replacement.status == "queued"
+    finally:
+        handler.release.set()
+    for job in running + pending[1:] + [replacement]:
+        job._future.result(timeout=5)
+        assert job.text() == "ok"
+    assert not ai_worker._pending
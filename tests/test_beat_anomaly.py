@@ -0,0 +1,38 @@
+import numpy as np
+
+from beat_anomaly import analyze_ecg
+
+FS = 500.0
+
+
+def _wave(t, centre, sigma, amplitude):
+    return amplitude * np.exp(-0.5 * ((t - centre) / sigma) ** 2)
+
+
+def _synthetic_ecg(ectopic, seconds=120.0, seed=7):
+    """~60 bpm ECG with strong baseline wander; beats in `ectopic` get a wide, inverted-T shape"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0.0, seconds, 1.0 / FS)
+    x = 0.8 * np.sin(2 * np.pi * 0.25 * t) + 0.5 * np.sin(2 * np.pi * 0.07 * t + 1.0)
+    beat_times = 0.5 + np.cumsum(np.full(int(seconds) - 1, 1.0) + rng.uniform(-0.03, 0.03, int(seconds) - 1))
+    for i, r in enumerate(beat_times):
+        near = np.abs(t - r) < 0.6
+        tt = t[near]
+        if i in ectopic:
+            x[near] += _wave(tt, r, 0.03, 1.2) + _wave(tt, r + 0.28, 0.05, -0.5)
+        else:
+            x[near] += (_wave(tt, r - 0.16, 0.025, 0.15) + _wave(tt, r, 0.01, 1.0)
+                        + _wave(tt, r + 0.25, 0.04, 0.3))
+    return t, x + 0.01 * rng.standard_normal(t.size), beat_times
+
+
+def test_only_the_injected_ectopic_beats_are_flagged():
+    ectopic = {20, 55, 90}
+    t, x, beat_times = _synthetic_ecg(ectopic)
+    result = analyze_ecg(t, x, FS)
+    assert result["beats"] == len(beat_times)
+    assert result["flagged_beats"] == len(ectopic)
+    flagged_times = sorted(r["t_start"] + 0.2 for r in result["intervals"])
+    assert np.allclose(flagged_times, sorted(beat_times[i] for i in ectopic), atol=0.01)
+    assert {r["kind"] for r in result["intervals"]} == {"morphology"}
+    assert result["ncc_median"] > 0.95
@@ -0,0 +1,56 @@
+import json
+
+import chat_log
+from chat_log import append_chat, load_chat
+
+
+def _chat(n, tag="m"):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{tag} {i}"} for i in range(n)]
+
+
+def _records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_appends_only_new_messages_and_tail_reads_match(tmp_path):
+    messages = _chat(40)
+    path = append_chat("Long", messages[:25], directory=str(tmp_path))
+    append_chat("Long", messages, directory=str(tmp_path))
+    assert [r["t"] for r in _records(path)] == ["meta"] + ["msg"] * 40
+    assert load_chat(path)[1] == messages
+    meta, recent = load_chat(path, last_n=3)
+    assert meta["name"] == "Long" and recent == messages[-3:]
+    assert load_chat(path, last_n=100)[1] == messages
+
+
+def test_rewritten_history_is_truncated_then_compacted(tmp_path):
+    path = append_chat("Edit", _chat(4), directory=str(tmp_path))
+    edited = _chat(4, tag="edited")
+    append_chat("Edit", edited, directory=str(tmp_path))
+    assert any(r["t"] == "truncate" for r in _records(path))
+    assert load_chat(path)[1] == edited
+    assert load_chat(path, last_n=2)[1] == edited[-2:]
+
+    # A second rewrite leaves more dead records than live ones: the log is compacted
+    again = _chat(4, tag="again")
+    append_chat("Edit", again, directory=str(tmp_path))
+    assert [r["t"] for r in _records(path)] == ["meta"] + ["msg"] * 4
+    assert load_chat(path)[1] == again
+    assert load_chat(path, last_n=3)[1] == again[-3:]
+
+
+def test_torn_final_line_is_ignored_and_cut_before_the_next_append(tmp_path):
+    messages = _chat(6)
+    path = append_chat("Crash", messages, directory=str(tmp_path))
+    with open(path, "ab") as f:
+        f.write(b'{"t": "msg", "i": 6, "role": "user", "cont')   # crash mid-write
+    assert load_chat(path)[1] == messages
+    assert load_chat(path, last_n=2)[1] == messages[-2:]
+
+    chat_log._state.pop(path)   # as in a new process after the crash
+    more = messages + _chat(2, tag="after")
+    append_chat("Crash", more, directory=str(tmp_path))
+    assert load_chat(path)[1] == more
+    assert load_chat(path, last_n=3)[1] == more[-3:]
+    assert len(_records(path)) == 1 + len(more)
@@ -0,0 +1,36 @@
+from chat_log import append_chat
+from chat_retrieval import ChatIndex
+from context_packer import RETRIEVAL_HEADER, ContextPacker
+
+RUN_CHAT = [
+    {"role": "user", "content": "why is my heart rate so high after running intervals"},
+    {"role": "assistant", "content": "interval running raises heart rate recovery time considerably"},
+]
+
+
+def test_saved_chats_are_indexed_on_first_use(tmp_path):
+    # Chats saved before the index existed are picked up, and unchanged ones are not re-read
+    append_chat("Morning run", RUN_CHAT, directory=str(tmp_path / "chats"))
+    index = ChatIndex(str(tmp_path / "index.jsonl"))
+    assert index.index_saved_chats(str(tmp_path / "chats")) == 2
+    assert index.search("heart rate running", k=1)[0]["chat"] == "Morning run"
+    reopened = ChatIndex(str(tmp_path / "index.jsonl"))
+    assert reopened.index_saved_chats(str(tmp_path / "chats")) == 0
+    assert len(reopened.chats["Morning run"]) == 2
+
+
+def test_retrieval_only_when_asked(tmp_path):
+    index = ChatIndex(str(tmp_path / "index.jsonl"))
+    index.index_chat("Morning run", RUN_CHAT)
+    packer = ContextPacker(token_budget=400, retrieval_k=2, retriever=index)
+    messages = [{"role": "system", "content": "signal context"},
+                {"role": "user", "content": "heart rate running question"}]
+    assert RETRIEVAL_HEADER not in packer.build_prompt(messages)
+    assert RETRIEVAL_HEADER in packer.build_prompt(messages, retrieve=True)
+
+
+def test_empty_index_leaves_the_budget_to_the_history(tmp_path):
+    packer = ContextPacker(token_budget=200, retrieval_k=4, retriever=ChatIndex(None))
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * 30}
+               for i in range(12)]
+    assert packer.pack(history, retrieve=True) == packer.pack(history)
@@ -0,0 +1,49 @@
+import numpy as np
+
+from cross_channel import StreamingCoupling, _fast_len, correlate_windows
+
+
+def _delayed_pair(n, delay, seed=5):
+    """x is white noise; y is x arriving `delay` samples later, plus a little noise"""
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal(n)
+    y = np.concatenate((np.zeros(delay), x[:-delay])) + 0.2 * rng.standard_normal(n)
+    return x, y
+
+
+def _reference(xw, yw, max_lag):
+    """np.correlate over the valid lags, normalised by the y energy under each shift"""
+    out = []
+    for x, y in zip(xw, yw):
+        x, y = x - x.mean(), y - y.mean()
+        corr = np.correlate(y, x, mode="valid")
+        energy = np.array([np.sum(np.square(y[k:k + x.size])) for k in range(2 * max_lag + 1)])
+        out.append(corr / np.sqrt(np.sum(np.square(x)) * energy))
+    return np.array(out)
+
+
+def test_correlate_windows_matches_np_correlate():
+    window, max_lag, delay, count = 400, 25, 9, 6
+    x, y = _delayed_pair(count * window + 2 * max_lag, delay)
+    starts = max_lag + np.arange(count) * window
+    xw = x[starts[:, None] + np.arange(window)]
+    yw = y[starts[:, None] - max_lag + np.arange(window + 2 * max_lag)]
+
+    corr = correlate_windows(xw, yw, window, max_lag, _fast_len(window + 2 * max_lag))
+    assert corr.shape == (count, 2 * max_lag + 1)
+    assert np.allclose(corr, _reference(xw, yw, max_lag), atol=1e-9)
+    assert np.all(np.argmax(np.abs(corr), axis=1) - max_lag == delay)
+    assert np.all(corr.max(axis=1) > 0.9)
+
+
+def test_streaming_coupling_reports_the_lag_across_updates():
+    fs, delay = 500.0, 12   # 24 ms
+    x, y = _delayed_pair(30 * int(fs), delay, seed=8)
+    coupling = StreamingCoupling(fs, band=(1.0, 100.0))
+    for end in (*range(1500, x.size, 1500), x.size):   # blocks that windows straddle
+        coupling.update(x[:end], y[:end])
+    windows = list(coupling.windows)
+    assert len(windows) == (x.size - 2 * coupling.max_lag) // coupling.window
+    assert all(w["lag_ms"] == delay / fs * 1000.0 for w in windows)
+    assert [w["start_s"] for w in windows] == [(coupling.max_lag + i * coupling.window) / fs
+                                               for i in range(len(windows))]
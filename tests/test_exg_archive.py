@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from exg_archive import ExgArchive, ExgArchiveWriter
+
+COLUMNS = ["time", "Signal1", "Signal2", "Signal3"]
+
+
+def _rows(n=10_000, fs=1000.0):
+    rng = np.random.default_rng(3)
+    t = np.arange(n) / fs
+    values = np.column_stack([2.4 + 0.01 * np.sin(2 * np.pi * 1.2 * t),
+                              np.cumsum(rng.standard_normal(n)) * 0.01,
+                              rng.standard_normal(n)])
+    return np.column_stack([t, values])
+
+
+@pytest.mark.parametrize("encoding", ["float32", "int16"])
+def test_round_trip_and_range_reads(tmp_path, encoding):
+    rows = _rows()
+    path = str(tmp_path / f"session_{encoding}.exga")
+    with ExgArchiveWriter(path, COLUMNS, values=encoding, chunk_rows=1024) as writer:
+        for offset in range(0, len(rows), 700):   # blocks that straddle chunk boundaries
+            writer.append(rows[offset:offset + 700])
+
+    # float32 is exact to float32; int16 quantises each chunk's range to 65536 steps
+    chunk_ranges = [np.ptp(rows[i:i + 1024, 1:], axis=0) for i in range(0, len(rows), 1024)]
+    tolerance = 1e-6 if encoding == "float32" else max(r.max() for r in chunk_ranges) / 65535.0
+    with ExgArchive(path) as archive:
+        assert archive.rows == len(rows) and len(archive.chunks) == 10
+        times, values = archive.read_all()
+        assert np.allclose(times, rows[:, 0], atol=1e-6)
+        if encoding == "float32":
+            assert np.array_equal(values, rows[:, 1:].astype(np.float32).astype(np.float64))
+        assert np.abs(values - rows[:, 1:]).max() <= tolerance
+
+        read, inflate = [], archive.chunk
+        archive.chunk = lambda i: read.append(i) or inflate(i)
+        times, values = archive.read_range(2.0, 4.5, channels=["Signal2"])
+        want = (rows[:, 0] >= 2.0 - 1e-9) & (rows[:, 0] <= 4.5 + 1e-9)
+        assert np.allclose(times, rows[want, 0], atol=1e-6)
+        assert values.shape == (want.sum(), 1)
+        assert np.abs(values[:, 0] - rows[want, 2]).max() <= tolerance
+        assert read == [1, 2, 3, 4]   # only the chunks overlapping 2.0-4.5 s are inflated
@@ -0,0 +1,41 @@
+import numpy as np
+
+from feature_index import FEATURE_NAMES, FeatureIndex
+
+
+def _clustered(n, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 3, (40, len(FEATURE_NAMES)))
+    return centres[rng.integers(0, 40, n)] + rng.normal(0, 1, (n, len(FEATURE_NAMES)))
+
+
+def _assert_same(index, queries, nprobe):
+    exact_rows, exact_d = index.search(queries, 10, exact=True)
+    ivf_rows, ivf_d = index.search(queries, 10, exact=False, nprobe=nprobe)
+    assert np.array_equal(ivf_rows, exact_rows)
+    assert np.allclose(ivf_d, exact_d, rtol=1e-4, atol=1e-3)
+
+
+def test_ivf_search_with_every_list_probed_matches_exact(tmp_path):
+    data = _clustered(4000, seed=1)
+    index = FeatureIndex(path=str(tmp_path / "index.npz"))
+    index.add("a", data, np.arange(len(data), dtype=float))
+    index.train()
+    n_lists = len(index.centroids)
+    queries = data[::97] + np.random.default_rng(2).normal(0, 0.1, data[::97].shape)
+    _assert_same(index, queries, nprobe=n_lists)
+
+    # Rows added after training sit in the tail, which every IVF query also scans
+    extra = _clustered(300, seed=3)
+    index.add("b", extra, np.arange(len(extra), dtype=float))
+    assert index.trained_rows == len(data)
+    _assert_same(index, extra[::13], nprobe=n_lists)
+    assert set(index.search(extra[:5], 1, exact=False, nprobe=1)[0][:, 0]) == set(range(4000, 4005))
+
+    # A reloaded index searches the same lists
+    index.save()
+    reloaded = FeatureIndex(path=index.path)
+    assert reloaded.trained_rows == index.trained_rows
+    _assert_same(reloaded, queries, nprobe=n_lists)
+    assert np.array_equal(reloaded.search(queries, 10, exact=False, nprobe=2)[0],
+                          index.search(queries, 10, exact=False, nprobe=2)[0])
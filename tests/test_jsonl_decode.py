@@ -0,0 +1,50 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import jsonl_decode
+from jsonl_decode import load_jsonl_arrays, split_ranges
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _write(path, n=5000):
+    rng = np.random.default_rng(11)
+    lines = []
+    for i in range(n):
+        ts = (START + timedelta(microseconds=2000 * i)).isoformat().replace("+00:00", "Z")
+        lines.append(json.dumps({"timestamp": ts, "value": float(rng.standard_normal())}))
+    # Records the fast path does not take, scattered so only some ranges fall back
+    lines[700] = '{"timestamp": "2025-01-01T00:00:01.400000+00:00", "value": 7.5}'
+    lines[1900] = '{"timestamp": "2025-01-01T00:00:03.8Z", "value": NaN}'
+    lines[2600] = '{"timestamp": "2025-01-01T00:00:05.2Z", "val'
+    lines[4100] = ""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_ranges_start_on_line_starts_and_cover_the_file(tmp_path):
+    path = tmp_path / "stream.jsonl"
+    _write(path)
+    data = path.read_bytes()
+    for n_ranges in (1, 3, 7, 64):
+        ranges = split_ranges(str(path), n_ranges)
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        assert all(data[start - 1:start] == b"\n" for start, _ in ranges[1:])
+
+
+def test_parallel_decode_matches_serial(tmp_path, monkeypatch):
+    path = str(tmp_path / "stream.jsonl")
+    _write(path)
+    serial_t, serial_v = load_jsonl_arrays(path, workers=1)
+    assert serial_t.size == 4998   # the torn and blank lines are skipped
+
+    monkeypatch.setattr(jsonl_decode, "MIN_PARALLEL_BYTES", 0)
+    monkeypatch.setattr(jsonl_decode, "RANGE_BYTES", 16 << 10)
+    parallel_t, parallel_v = load_jsonl_arrays(path, workers=3)
+    assert np.array_equal(parallel_t, serial_t)
+    assert np.array_equal(parallel_v, serial_v, equal_nan=True)
+    assert np.all(np.diff(parallel_t) > 0)
+    assert np.isnan(parallel_v).sum() == 1
@@ -0,0 +1,20 @@
+from llm_backends import MockBackend, MockBackendError
+
+
+def _outcomes(backend, n):
+    failed = []
+    for i in range(n):
+        try:
+            list(backend.stream(f"prompt {i}"))
+            failed.append(False)
+        except MockBackendError:
+            failed.append(True)
+    return failed
+
+
+def test_mock_failure_fraction_matches_error_rate():
+    # Short responses make an off-by-one in the failure position visible (2 tokens: 0.3 -> 0.2)
+    options = dict(ttft_s=0.0, tokens_per_s=0.0, error_rate=0.3, tokens=2, seed=11, sleep=lambda s: None)
+    failed = _outcomes(MockBackend(**options), 4000)
+    assert abs(sum(failed) / len(failed) - 0.3) < 0.025
+    assert _outcomes(MockBackend(**options), 4000) == failed   # same seed, same pattern
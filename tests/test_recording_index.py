@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+
+import recording_index
+from recording_index import INDEX_STRIDE, read_range
+
+
+def _write(path, stamps):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, ts in enumerate(stamps):
+            f.write(json.dumps({"timestamp": ts, "value": float(i)}) + "\n")
+
+
+def test_duplicate_timestamps_across_an_index_entry(tmp_path):
+    # 10 lines per timestamp, so index entries (every INDEX_STRIDE lines) fall mid-group
+    stamps = np.repeat(1000.0 + 0.25 * np.arange(4 * INDEX_STRIDE // 10), 10)
+    path = str(tmp_path / "dup.jsonl")
+    _write(path, stamps.tolist())
+    for t in np.unique(stamps):
+        times, values = read_range(path, t, t)
+        assert times.size == 10
+        assert np.all(times == t)
+
+
+def test_index_is_not_rewritten_on_every_query(tmp_path, monkeypatch):
+    path = str(tmp_path / "grow.jsonl")
+    _write(path, (1000.0 + np.arange(INDEX_STRIDE * 4) * 0.01).tolist())
+    saves = []
+    save = recording_index.JsonlIndex._save
+    monkeypatch.setattr(recording_index.JsonlIndex, "_save", lambda self: (saves.append(1), save(self)))
+    read_range(path, 1000.0, 1000.5)
+    assert len(saves) == 1
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"timestamp": 2000.0, "value": 1.0}) + "\n")
+    times, _ = read_range(path, 2000.0, 2000.0)
+    assert times.size == 1
+    assert len(saves) == 1
@@ -0,0 +1,23 @@
+import argparse
+
+import numpy as np
+import pytest
+
+from replay import positive_speed, replay
+
+
+class _Sink:
+    def write(self, stamps, values):
+        pass
+
+
+@pytest.mark.parametrize("speed", [0.0, -2.0, float("nan")])
+def test_non_positive_speed_is_rejected(speed):
+    with pytest.raises(ValueError):
+        replay(np.arange(10.0), np.zeros(10), _Sink(), speed=speed)
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_speed(str(speed))
+
+
+def test_positive_speed_parses():
+    assert positive_speed("10") == 10.0
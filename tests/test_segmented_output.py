@@ -0,0 +1,41 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from segmented_output import SegmentedWriter, load_last_n, tail_version
+from signal_quality import uniform_metrics
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _lines(first, values, interval_s=0.1):
+    return [json.dumps({"timestamp": (START + timedelta(seconds=(first + i) * interval_s)).isoformat(),
+                        "value": float(v)}) + "\n" for i, v in enumerate(values)]
+
+
+def _metrics(path):
+    version = tail_version(path)
+    times, values = load_last_n(path, n=100)
+    stream_t = np.array([t.timestamp() for t in times])
+    return uniform_metrics(path, stream_t, values, version=version)[0]
+
+
+def test_segmented_stream_metrics_follow_new_segments(tmp_path):
+    # A stale plain file sits at the stream path, as output.jsonl does in the repo
+    path = str(tmp_path / "output.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(_lines(0, np.full(100, -5.0)))
+    stale = os.stat(path).st_mtime_ns
+
+    writer = SegmentedWriter(path, max_bytes=4096)
+    writer.writelines(_lines(0, np.full(100, 1.0)))
+    writer.flush()
+    assert _metrics(path)["mean"] == 1.0
+
+    writer.writelines(_lines(100, np.full(100, 3.0)))   # rotates into new segments
+    writer.flush()
+    assert os.stat(path).st_mtime_ns == stale
+    assert _metrics(path)["mean"] == 3.0
+    writer.close()
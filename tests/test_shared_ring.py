@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+from shared_ring import ExgRing
+
+
+def test_reader_notices_the_block_was_recreated():
+    name = f"test_ring_{os.getpid()}"
+    writer = ExgRing.create(name, ["time", "value"], capacity=16)
+    reader = ExgRing.attach(name)
+    try:
+        writer.append(np.array([[0.0, 1.0], [1.0, 2.0]]))
+        assert not reader.replaced(idle_s=0)   # seq moved: live, nothing checked
+        assert not reader.replaced(idle_s=0)   # idle, but still the named block
+        assert not reader.replaced(idle_s=60)  # idle, not for long enough to check
+
+        # Ingest restarts: same name, new block; the old reader must not stay on the orphan
+        restarted = ExgRing.create(name, ["time", "value"], capacity=16)
+        assert restarted.creation_id != reader.creation_id
+        assert reader.replaced(idle_s=0)
+        fresh = ExgRing.attach(name)
+        assert not fresh.replaced(idle_s=0) and not fresh.replaced(idle_s=0)
+        fresh.close()
+
+        # Ingest stops: the block is gone
+        restarted.close()
+        restarted.unlink()
+        assert reader.replaced(idle_s=0)
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,49 @@
+import numpy as np
+
+from signal_summary import ExgSummarizer, estimate_sample_rate, get_exg_digest
+
+FS = 250.0
+
+
+def _recording(bpm, seconds=20.0):
+    t = np.arange(int(seconds * FS)) / FS
+    ecg = np.zeros_like(t)
+    ecg[(np.arange(0.2, seconds, 60.0 / bpm) * FS).astype(int)] = 1.0
+    rng = np.random.default_rng(0)
+    return t, ecg, rng.normal(size=t.size), rng.normal(size=t.size)
+
+
+def _fresh(t, ecg, eog, emg):
+    summarizer = ExgSummarizer(estimate_sample_rate(t))
+    summarizer.update(ecg, eog, emg)
+    return summarizer.digest(ecg, eog, emg)
+
+
+def test_same_length_rewrite_restarts_digest():
+    path = "rewrite-test.json"
+    first = get_exg_digest(path, *_recording(60), version=(1,))
+    assert first["ecg"]["beats"] == 20
+
+    rewritten = _recording(120)
+    digest = get_exg_digest(path, *rewritten, version=(2,))
+    assert digest == _fresh(*rewritten)
+    assert digest["ecg"]["beats"] == 40
+    assert abs(digest["ecg"]["hr_bpm"] - 120.0) < 1.0
+
+
+def test_appended_data_continues_from_cursor():
+    path = "append-test.json"
+    t, ecg, eog, emg = _recording(60, seconds=30.0)
+    get_exg_digest(path, t[:5000], ecg[:5000], eog[:5000], emg[:5000], version=(1,))
+    digest = get_exg_digest(path, t, ecg, eog, emg, version=(2,))
+    assert digest == _fresh(t, ecg, eog, emg)
+
+
+def test_ring_window_that_slid_forward():
+    path = "ring-test"
+    t, ecg, eog, emg = _recording(60, seconds=40.0)
+    get_exg_digest(path, t[:5000], ecg[:5000], eog[:5000], emg[:5000], version=(0, 5000))
+    # The ring now holds samples 4000..10000 only
+    digest = get_exg_digest(path, t[4000:], ecg[4000:], eog[4000:], emg[4000:], version=(0, 10000), start_index=4000)
+    assert digest["duration_s"] == 40.0
+    assert digest["ecg"]["beats"] == 40
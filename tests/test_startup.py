@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_page_cold_start_within_budget(monkeypatch, capsys):
+    monkeypatch.chdir(ROOT)
+    assert benchmark.startup_report(budget_ms=1500.0, repeat=1) == 0, capsys.readouterr().out
+
+
+def test_page_imports_leave_the_ai_sdks_unloaded():
+    modules = benchmark.page_imports(os.path.join(ROOT, benchmark.PAGE_PATH))
+    code = (f"import sys; import {', '.join(modules)}; "
+            f"print(','.join(m for m in {benchmark.LAZY_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, check=True)
+    assert out.stdout.strip() == ""
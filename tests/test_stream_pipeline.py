@@ -0,0 +1,81 @@
+import time
+
+import numpy as np
+
+from acquisition_bridge import BridgeServer
+from stream_pipeline import Block, BoundedQueue, read_status, write_status
+
+
+def _block(start, n=10):
+    return Block(np.column_stack([np.arange(start, start + n, dtype=float), np.ones(n)]))
+
+
+def test_block_policy_waits_and_drops_nothing():
+    q = BoundedQueue(2, "block")
+    assert q.put(_block(0)) and q.put(_block(10))
+    assert not q.put(_block(20), timeout=0.05)   # full: the producer waits, then gives up
+    assert q.blocked_s >= 0.04
+    assert (q.dropped_blocks, q.dropped_samples, q.decimated_samples) == (0, 0, 0)
+    assert len(q) == 2
+
+
+def test_drop_oldest_counts_the_discarded_blocks():
+    q = BoundedQueue(2, "drop_oldest")
+    for i in range(5):
+        q.put(_block(10 * i))
+    assert (q.dropped_blocks, q.dropped_samples) == (3, 30)
+    assert [q.get().rows[0, 0] for _ in range(2)] == [30.0, 40.0]
+
+
+def test_decimate_keeps_coverage_at_half_resolution():
+    q = BoundedQueue(2, "decimate")
+    for i in range(4):
+        q.put(_block(10 * i))
+    # Each overflow merges the two oldest blocks (20 rows) into 10
+    assert q.decimated_samples == 20
+    assert q.dropped_blocks == 0
+    first = q.get().rows[:, 0]
+    assert first[0] == 0.0 and first[-1] >= 20.0
+    assert len(first) + len(q.get().rows) == 40 - q.decimated_samples
+
+
+class _Store:
+    columns = ["time", "Signal1", "Signal2", "Signal3"]
+
+    def __init__(self):
+        self.rows = 0
+
+    def append(self, rows):
+        self.rows += len(rows)
+
+    def flush(self):
+        pass
+
+
+def test_bridge_pipeline_stores_everything_while_monitoring_drops(tmp_path, monkeypatch):
+    import stream_pipeline
+
+    # A slow feature stage must not cost the recording a single sample
+    block_features = stream_pipeline.block_features
+
+    def slow_features(block):
+        time.sleep(0.01)
+        return block_features(block)
+
+    monkeypatch.setattr(stream_pipeline, "block_features", slow_features)
+    bridge = BridgeServer(_Store())
+    pipe = bridge.start_pipeline(capacity=2, ui_policy="drop_oldest")
+    for i in range(50):
+        assert pipe.ingest(np.column_stack([np.arange(i * 20, (i + 1) * 20, dtype=float)] + [np.ones(20)] * 3))
+    pipe.close()
+    assert bridge.store.rows == 1000
+    stats = {s["stage"]: s for s in pipe.stats()}
+    assert stats["publish"]["dropped_samples"] == 0
+    assert sum(s["dropped_samples"] for s in stats.values()) > 0
+
+    path = str(tmp_path / "status.json")
+    write_status(path, pipe)
+    status = read_status(path)
+    assert [s["stage"] for s in status["stats"]] == ["publish", "filter", "features", "snapshot"]
+    assert status["features"]["time"] <= 999.0
+    assert time.time() - status["updated"] < 60